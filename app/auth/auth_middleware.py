@@ -1,12 +1,14 @@
 from fastapi import Request, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from .jwt_handler import verify_token
+import time
 
 class JWTBearer(HTTPBearer):
     def __init__(self, auto_error: bool = True):
         super(JWTBearer, self).__init__(auto_error=auto_error)
 
     async def __call__(self, request: Request):
+        start = time.perf_counter()
         credentials: HTTPAuthorizationCredentials = await super(JWTBearer, self).__call__(request)
         
         if not credentials:
@@ -30,6 +32,7 @@ class JWTBearer(HTTPBearer):
                 )
                 
             request.state.user = payload
+            request.state.auth_ms = (time.perf_counter() - start) * 1000
             return credentials.credentials
         except Exception as e:
             print(f"Token verification failed: {str(e)}")
@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from functools import lru_cache
+from typing import Dict, Optional
 
 class Settings(BaseSettings):
     # Database settings
@@ -19,6 +20,81 @@ class Settings(BaseSettings):
     embedding_model: str = "all-MiniLM-L6-v2"
     vector_dim: int = 384
 
+    # Retrieval settings
+    retrieval_index_ttl: int = 300  # Seconds before a company index is reloaded from the database
+    chunk_cache_max_bytes: int = 512 * 1024 * 1024  # Memory budget for in-process tenant corpora
+    retrieval_mode: str = "hybrid"  # "lexical" (BM25), "vector" or "hybrid"
+    hybrid_candidates: int = 20  # Candidates fetched per leg before rank fusion
+    rrf_k: int = 60
+    rerank_enabled: bool = False  # Re-rank and diversify (MMR) a deeper candidate list
+    rerank_candidates: int = 30
+    mmr_lambda: float = 0.7  # 1.0 = pure relevance, lower values favour diversity
+    ann_min_chunks: int = 50000  # Tenants at or above this size get an IVF index instead of brute force
+    ann_nlist: int = 0  # IVF lists; 0 = sqrt(chunk count)
+    ann_nprobe: int = 16
+    ann_train_iterations: int = 10
+    ann_train_sample: int = 100000
+    ann_retrain_drift: float = 1.0  # Retrain once rows added + removed since training exceed this share of the trained size
+    vector_quantization: str = "none"  # "none", "int8" or "binary" (in-memory backend, tenants below ann_min_chunks only)
+    quantization_rescore_factor: int = 4  # Shortlist size per result for exact float rescoring
+    vector_disk_dir: Optional[str] = None  # Where float vectors are memory-mapped; defaults to the temp dir
+    vector_shard_dir: str = "data/vector_shards"  # Per-company .npy shards for the "mmap" backend
+    vector_delta_max_rows: int = 5000  # Delta rows or tombstones before a shard is compacted
+    answer_cache_ttl: int = 3600  # Seconds a cached RAG answer stays valid
+    answer_cache_max_entries: int = 10000
+    semantic_cache_enabled: bool = True  # Ignored (off) when embeddings use the hashing fallback
+    semantic_cache_threshold: float = 0.95  # Minimum cosine similarity to reuse an answer
+    semantic_cache_max_entries: int = 500  # Cached queries per company
+    lexical_backend: str = "memory"  # "memory" (in-process BM25) or "postgres" (search_chunks RPC)
+    query_embedding_cache_size: int = 10000  # Query embeddings kept in memory (LRU)
+    query_embedding_cache_path: Optional[str] = None  # SQLite file for an on-disk tier, e.g. "data/query_embeddings.db"
+    query_embedding_cache_disk_max_rows: int = 200000  # Rows kept in the on-disk tier; the oldest writes are evicted
+
+    # Vector store settings
+    vector_store_backend: str = "memory"  # "memory", "mmap" (shared .npy shards) or "qdrant"
+    qdrant_url: Optional[str] = None  # Server mode; local mode when unset
+    qdrant_path: Optional[str] = None  # Local on-disk storage; in-memory when unset
+    qdrant_api_key: Optional[str] = None
+    qdrant_hnsw_m: int = 16
+    qdrant_hnsw_ef_construct: int = 100
+    qdrant_hnsw_ef: int = 128
+
+    # LLM settings
+    llm_provider: str = "gemini"  # "gemini", "http" (see scripts/stub_llm_server.py) or "mock"
+    llm_model: str = "gemini-1.5-flash"
+    llm_http_url: Optional[str] = None
+    llm_hedge_enabled: bool = True
+    llm_hedge_provider: Optional[str] = None  # Provider for hedged requests; defaults to the primary
+    llm_hedge_percentile: float = 95  # Hedge once the primary is slower than this latency percentile
+    llm_hedge_min_samples: int = 50  # Latency samples needed before hedging kicks in
+    llm_hedge_delay_ms: Optional[float] = None  # Fixed hedge delay instead of the percentile
+    llm_max_concurrency: int = 8  # Concurrent Gemini calls per process
+    llm_timeout: float = 30.0  # Seconds per call (per chunk gap when streaming)
+    llm_max_retries: int = 2
+    llm_retry_base_delay: float = 0.5  # Seconds; doubled per attempt with full jitter
+    context_cache_enabled: bool = False  # Register small, busy corpora as a provider-side cached prompt prefix
+    context_cache_min_queries: int = 20  # Queries against one corpus version before it is cached
+    context_cache_min_tokens: int = 4096  # Providers reject (or don't discount) smaller cached contents
+    context_cache_max_tokens: int = 200000  # Larger corpora go through retrieval only
+    context_cache_ttl: int = 3600  # Seconds the provider keeps a cached context
+    context_cache_retry_after: int = 60  # Seconds before retrying a failed registration; doubles per failure up to the TTL
+    rag_batch_max_queries: int = 500
+    rag_batch_concurrency: int = 4  # Gemini calls in flight per batch request
+    rag_default_deadline_ms: int = 20000  # Latency budget for /rag/query; 0 disables it
+    rag_plan_deadline_ms: Dict[str, int] = {"free": 10000, "pro": 20000, "enterprise": 30000}
+    plan_cache_ttl: int = 300  # Seconds a company's plan type is cached
+    company_settings_ttl: int = 300  # Seconds per-company switches (companies table) are cached
+    extractive_min_coverage: float = 0.7  # Share of query terms the extracted span must contain
+    extractive_min_margin: float = 0.15  # Relative lead of the best chunk over the runner-up
+    extractive_max_query_terms: int = 12  # Longer queries always go to the LLM
+    extractive_max_answer_chars: int = 300  # Longer spans aren't short answers
+    extractive_context_sentences: int = 0  # Neighbouring sentences kept on each side of the match
+    context_token_budget: int = 3000  # Estimated tokens of chunk context per prompt
+    context_dedup_threshold: float = 0.8  # Shingle containment above which a chunk is a duplicate
+    query_log_batch_size: int = 200  # Rows per bulk insert into query_logs
+    query_log_flush_interval: float = 2.0  # Seconds between background flushes
+    query_log_max_backlog: int = 50000  # Oldest buffered rows are dropped past this
+
     model_config = SettingsConfigDict(
         env_file='.env',
         env_file_encoding='utf-8',
@@ -0,0 +1,130 @@
+from typing import Dict, Any, Callable, Optional
+from collections import deque
+from contextlib import contextmanager
+import threading
+import time
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: int = 1):
+        with self._lock:
+            self.value += amount
+
+class Histogram:
+    """Count/sum plus a window of recent samples for percentile estimates"""
+
+    def __init__(self, window: int = 1024):
+        self.count = 0
+        self.total = 0.0
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self.count += 1
+            self.total += value
+            self._samples.append(value)
+
+    def percentile(self, q: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        index = min(len(samples) - 1, max(0, int(round(q / 100 * (len(samples) - 1)))))
+        return samples[index]
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else None,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99)
+        }
+
+class MetricsRegistry:
+    """
+    Minimal in-process metrics registry.
+
+    Counters are incremented in place; gauges are callbacks evaluated
+    when a snapshot is taken, so components export live state for free.
+    Histograms report count, mean and p50/p95/p99 over recent samples.
+    """
+
+    def __init__(self):
+        self._counters: Dict[str, Counter] = {}
+        self._histograms: Dict[str, Histogram] = {}
+        self._gauges: Dict[str, Callable[[], Any]] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str) -> Counter:
+        with self._lock:
+            if name not in self._counters:
+                self._counters[name] = Counter()
+            return self._counters[name]
+
+    def histogram(self, name: str) -> Histogram:
+        with self._lock:
+            if name not in self._histograms:
+                self._histograms[name] = Histogram()
+            return self._histograms[name]
+
+    def gauge(self, name: str, callback: Callable[[], Any]):
+        with self._lock:
+            self._gauges[name] = callback
+
+    def snapshot(self) -> Dict[str, Any]:
+        data: Dict[str, Any] = {name: counter.value for name, counter in self._counters.items()}
+        for name, histogram in self._histograms.items():
+            data[name] = histogram.summary()
+        for name, callback in self._gauges.items():
+            try:
+                data[name] = callback()
+            except Exception as e:
+                data[name] = f"error: {str(e)}"
+        return data
+
+# Singleton instance
+metrics = MetricsRegistry()
+
+class StageTimer:
+    """Monotonic per-stage timings (ms) for a single request"""
+
+    def __init__(self, start: Optional[float] = None):
+        self._start = start if start is not None else time.perf_counter()
+        self.stages: Dict[str, float] = {}
+
+    @property
+    def started(self) -> float:
+        return self._start
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, (time.perf_counter() - start) * 1000)
+
+    def add(self, name: str, elapsed_ms: float):
+        self.stages[name] = self.stages.get(name, 0.0) + elapsed_ms
+
+    def merge(self, stages: Dict[str, float]):
+        for name, elapsed_ms in stages.items():
+            if name != "total":
+                self.add(name, elapsed_ms)
+
+    def summary(self) -> Dict[str, float]:
+        data = {name: round(elapsed_ms, 2) for name, elapsed_ms in self.stages.items()}
+        data["total"] = round((time.perf_counter() - self.started) * 1000, 2)
+        return data
+
+    def observe(self, prefix: str, registry: MetricsRegistry = metrics):
+        """Feed every stage and the total into `{prefix}.{stage}_ms` histograms"""
+        for name, elapsed_ms in self.summary().items():
+            registry.histogram(f"{prefix}.{name}_ms").observe(elapsed_ms)
+
+__all__ = ['metrics', 'MetricsRegistry', 'Counter', 'Histogram', 'StageTimer']
@@ -0,0 +1,185 @@
+from typing import Any, Callable, Dict, List, Optional
+import asyncio
+import threading
+import time
+from ..config import settings
+from ..core.metrics import metrics
+from ..retrieval import retriever
+from .context_packer import estimate_tokens
+from .providers import LLMProvider
+
+class ContextCacheEntry:
+    def __init__(
+        self,
+        version: int,
+        provider: LLMProvider,
+        handle: Optional[str],
+        expires_at: float,
+        loop: Optional[asyncio.AbstractEventLoop] = None,
+        failures: int = 0
+    ):
+        self.version = version
+        self.provider = provider
+        # None marks a corpus version that isn't worth caching, or whose
+        # registration failed and shouldn't be retried until expires_at
+        self.handle = handle
+        self.expires_at = expires_at
+        # Loop the handle was created on; deletions are sent back to it
+        self.loop = loop
+        # Consecutive failed registrations, for the retry backoff
+        self.failures = failures
+
+class ContextCacheManager:
+    """
+    Registers a company's whole corpus as a cached prompt prefix with the
+    LLM provider, so busy tenants with small corpora stop resending the
+    same context on every call.
+
+    A corpus version is cached once it has served `min_queries` queries
+    and its size is within the token bounds. Creation runs in the
+    background; until it finishes queries go out with their retrieved
+    context as usual. Handles are tied to the corpus version and dropped
+    (and deleted at the provider) as soon as the company's documents change.
+    A failed registration is remembered too, and retried only after
+    `retry_after` seconds, doubling with every further failure.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = settings.context_cache_enabled,
+        min_queries: int = settings.context_cache_min_queries,
+        min_tokens: int = settings.context_cache_min_tokens,
+        max_tokens: int = settings.context_cache_max_tokens,
+        ttl: int = settings.context_cache_ttl,
+        retry_after: int = settings.context_cache_retry_after
+    ):
+        self.enabled = enabled
+        self.min_queries = min_queries
+        self.min_tokens = min_tokens
+        self.max_tokens = max_tokens
+        self.ttl = ttl
+        self.retry_after = retry_after
+        self._entries: Dict[str, ContextCacheEntry] = {}
+        # company_id -> (corpus version, queries seen against it)
+        self._query_counts: Dict[str, List[int]] = {}
+        # Bumped on invalidation so creations racing a document change are discarded
+        self._generations: Dict[str, int] = {}
+        self._creating: Dict[str, asyncio.Task] = {}
+        self._lock = threading.Lock()
+
+        self.hits = metrics.counter("context_cache.hits")
+        self.created = metrics.counter("context_cache.created")
+        self.invalidations = metrics.counter("context_cache.invalidations")
+        self.errors = metrics.counter("context_cache.errors")
+        metrics.gauge("context_cache.entries", lambda: sum(1 for e in self._entries.values() if e.handle))
+
+    def handle_for(
+        self,
+        company_id: str,
+        version: int,
+        provider: LLMProvider,
+        load_corpus: Callable[[], List[Dict[str, Any]]]
+    ) -> Optional[str]:
+        """
+        Cached-context handle for the company's current corpus, or None.
+        Counts the query and starts registering the corpus once it is busy
+        enough; needs a running event loop for that.
+        """
+        if not self.enabled or not provider.supports_context_cache:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(company_id)
+            failures = 0
+            if entry is not None and entry.version == version and entry.provider is provider:
+                if entry.expires_at > time.monotonic():
+                    if entry.handle is None:
+                        return None
+                    self.hits.inc()
+                    return entry.handle
+                # Expired at the provider, or a failed registration is due a retry
+                failures = entry.failures
+                del self._entries[company_id]
+
+            counts = self._query_counts.get(company_id)
+            if counts is None or counts[0] != version:
+                counts = self._query_counts[company_id] = [version, 0]
+            counts[1] += 1
+            if counts[1] < self.min_queries or company_id in self._creating:
+                return None
+            generation = self._generations.get(company_id, 0)
+            task = asyncio.ensure_future(self._create(company_id, version, generation, provider, load_corpus, failures))
+            self._creating[company_id] = task
+        return None
+
+    async def _create(
+        self,
+        company_id: str,
+        version: int,
+        generation: int,
+        provider: LLMProvider,
+        load_corpus: Callable[[], List[Dict[str, Any]]],
+        failures: int = 0
+    ):
+        handle = None
+        # Versions that aren't worth caching stay that way until the corpus changes
+        expires_at = float("inf")
+        try:
+            chunks = await asyncio.to_thread(load_corpus)
+            context = "\n\n".join(chunk["content"] for chunk in chunks)
+            tokens = estimate_tokens(context)
+            if self.min_tokens <= tokens <= self.max_tokens:
+                handle = await provider.create_context_cache(
+                    f"company-{company_id}-v{version}",
+                    context,
+                    self.ttl
+                )
+                self.created.inc()
+                # Leave a margin so a handle isn't used right as the provider expires it
+                expires_at = time.monotonic() + self.ttl * 0.9
+            failures = 0
+        except Exception as e:
+            print(f"Error creating context cache: {str(e)}")
+            self.errors.inc()
+            # Without an entry every following query would start another creation
+            failures += 1
+            expires_at = time.monotonic() + min(self.retry_after * 2 ** (failures - 1), self.ttl)
+
+        with self._lock:
+            self._creating.pop(company_id, None)
+            current = self._generations.get(company_id, 0) == generation
+            if current:
+                self._entries[company_id] = ContextCacheEntry(
+                    version, provider, handle, expires_at, asyncio.get_running_loop(), failures
+                )
+        if not current and handle is not None:
+            await self._delete(provider, handle)
+
+    async def _delete(self, provider: LLMProvider, handle: str):
+        try:
+            await provider.delete_context_cache(handle)
+        except Exception as e:
+            print(f"Error deleting context cache: {str(e)}")
+            self.errors.inc()
+
+    def invalidate(self, company_id: str):
+        with self._lock:
+            self._generations[company_id] = self._generations.get(company_id, 0) + 1
+            self._query_counts.pop(company_id, None)
+            entry = self._entries.pop(company_id, None)
+        if entry is None or entry.handle is None:
+            return
+        self.invalidations.inc()
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # Index updates run in worker threads; hand the deletion to the loop
+            # that owns the handle, or let the provider drop it after its TTL
+            if entry.loop is not None and entry.loop.is_running():
+                asyncio.run_coroutine_threadsafe(self._delete(entry.provider, entry.handle), entry.loop)
+            return
+        asyncio.ensure_future(self._delete(entry.provider, entry.handle))
+
+# Singleton instance, invalidated whenever a company's corpus version changes
+context_cache = ContextCacheManager()
+retriever.cache.add_listener(context_cache.invalidate)
@@ -0,0 +1,78 @@
+from typing import List, Dict, Any, Set
+import math
+from ..config import settings
+from ..retrieval.text import tokenize
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for Gemini models)"""
+    return math.ceil(len(text) / 4)
+
+def _shingles(text: str, size: int = 3) -> Set[str]:
+    tokens = tokenize(text)
+    if len(tokens) < size:
+        return {" ".join(tokens)} if tokens else set()
+    return {" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+
+class PackedContext:
+    def __init__(self, chunks: List[Dict[str, Any]], context_tokens: int, dropped_duplicates: int, dropped_budget: int):
+        self.chunks = chunks
+        self.context_tokens = context_tokens
+        self.dropped_duplicates = dropped_duplicates
+        self.dropped_budget = dropped_budget
+
+class ContextPacker:
+    """
+    Selects which retrieved chunks go into the LLM prompt.
+
+    Chunks are taken in the order the retriever ranked them (re-ranked and
+    MMR-diversified when enabled), passages that are mostly contained
+    in an already selected one are skipped, and selection stops adding
+    chunks once the token budget is spent.
+    """
+
+    def __init__(self, token_budget: int = settings.context_token_budget, dedup_threshold: float = settings.context_dedup_threshold):
+        self.token_budget = token_budget
+        self.dedup_threshold = dedup_threshold
+
+    def _is_duplicate(self, shingles: Set[str], selected: List[Set[str]]) -> bool:
+        if not shingles:
+            return True
+        for other in selected:
+            if not other:
+                continue
+            # Containment catches both near-copies and overlapping passages
+            overlap = len(shingles & other) / min(len(shingles), len(other))
+            if overlap >= self.dedup_threshold:
+                return True
+        return False
+
+    def pack(self, chunks: List[Dict[str, Any]]) -> PackedContext:
+        selected: List[Dict[str, Any]] = []
+        selected_shingles: List[Set[str]] = []
+        used = 0
+        dropped_duplicates = 0
+        dropped_budget = 0
+
+        for chunk in chunks:
+            shingles = _shingles(chunk["content"])
+            if self._is_duplicate(shingles, selected_shingles):
+                dropped_duplicates += 1
+                continue
+
+            tokens = estimate_tokens(chunk["content"])
+            if used + tokens > self.token_budget:
+                if selected:
+                    dropped_budget += 1
+                    continue
+                # Always keep the best chunk, truncated to the budget
+                chunk = {**chunk, "content": chunk["content"][:self.token_budget * 4]}
+                tokens = estimate_tokens(chunk["content"])
+
+            selected.append(chunk)
+            selected_shingles.append(shingles)
+            used += tokens
+
+        return PackedContext(selected, used, dropped_duplicates, dropped_budget)
+
+# Singleton instance
+context_packer = ContextPacker()
@@ -0,0 +1,78 @@
+from typing import List, Dict, Any, Optional, Tuple
+import re
+from ..config import settings
+from ..retrieval.text import tokenize
+
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+|\n+")
+
+def split_sentences(text: str) -> List[str]:
+    return [sentence.strip() for sentence in SENTENCE_PATTERN.split(text) if sentence.strip()]
+
+def rank_sentences(query: str, chunks: List[Dict[str, Any]]) -> List[Tuple[float, int, int, str]]:
+    """
+    Score every sentence of the chunks by the share of query terms it
+    contains, discounted by its chunk's rank. Returns
+    (score, chunk rank, position, sentence), best first.
+    """
+    query_terms = set(tokenize(query))
+    ranked = []
+    for rank, chunk in enumerate(chunks):
+        for position, sentence in enumerate(split_sentences(chunk["content"])):
+            terms = set(tokenize(sentence))
+            coverage = len(query_terms & terms) / len(query_terms) if query_terms else 0.0
+            ranked.append((coverage / (1 + 0.25 * rank), rank, position, sentence))
+    ranked.sort(key=lambda item: (-item[0], item[1], item[2]))
+    return ranked
+
+def extractive_answer(query: str, chunks: List[Dict[str, Any]], max_sentences: int = 3) -> str:
+    """Answer with the retrieved sentences that best cover the query, in document order"""
+    ranked = [item for item in rank_sentences(query, chunks) if item[0] > 0][:max_sentences]
+    if not ranked:
+        # Nothing overlaps the query; the top chunk's opening is the best we have
+        ranked = rank_sentences(query, chunks[:1])[:1]
+    ranked.sort(key=lambda item: (item[1], item[2]))
+    return " ".join(sentence for _, _, _, sentence in ranked)
+
+def answer_span(query: str, content: str, context_sentences: int = 0) -> Tuple[float, str]:
+    """
+    The sentence of `content` covering the most query terms, with
+    `context_sentences` neighbours on each side, and its query-term coverage
+    """
+    query_terms = set(tokenize(query))
+    sentences = split_sentences(content)
+    if not query_terms or not sentences:
+        return 0.0, ""
+    best = max(range(len(sentences)), key=lambda i: len(query_terms & set(tokenize(sentences[i]))))
+    span = sentences[max(0, best - context_sentences):best + context_sentences + 1]
+    covered = query_terms & set(tokenize(" ".join(span)))
+    return len(covered) / len(query_terms), " ".join(span)
+
+def is_confident_match(chunks: List[Dict[str, Any]], mode: str) -> bool:
+    """
+    Whether retrieval clearly singled out one chunk: first in both legs for
+    hybrid (fused scores are too flat for a margin), otherwise ahead of the
+    runner-up by `extractive_min_margin` of its score
+    """
+    scores = sorted((chunk["score"] for chunk in chunks), reverse=True)
+    if not scores or scores[0] <= 0:
+        return False
+    if mode == "hybrid":
+        return scores[0] >= 2 / (settings.rrf_k + 1) - 1e-9
+    if len(scores) == 1:
+        return True
+    return (scores[0] - scores[1]) / scores[0] >= settings.extractive_min_margin
+
+def fast_path_answer(query: str, chunks: List[Dict[str, Any]], mode: str) -> Optional[str]:
+    """
+    Extractive answer for lookups the best chunk answers verbatim, or None
+    when the question should go to the LLM
+    """
+    if len(tokenize(query)) > settings.extractive_max_query_terms:
+        return None
+    if not is_confident_match(chunks, mode):
+        return None
+    best = max(chunks, key=lambda chunk: chunk["score"])
+    coverage, span = answer_span(query, best["content"], settings.extractive_context_sentences)
+    if coverage < settings.extractive_min_coverage or len(span) > settings.extractive_max_answer_chars:
+        return None
+    return span
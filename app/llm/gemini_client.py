@@ -1,70 +1,240 @@
-import google.generativeai as genai
-from typing import List, Dict, Any
+from google.api_core import exceptions as google_exceptions
+from typing import List, Dict, Any, AsyncIterator, Optional
+from contextlib import asynccontextmanager
+import asyncio
 import os
+import random
+import time
+import httpx
 from dotenv import load_dotenv
+from ..config import settings
+from ..core.metrics import metrics
+from .providers import (
+    LLMProvider,
+    MockGeminiClient,
+    TransientProviderError,
+    build_prompt,
+    create_provider
+)
 
 load_dotenv()
 
-class MockGeminiClient:
-    async def generate_response(self, query: str, relevant_chunks: List[Dict[str, Any]]) -> str:
-        """Mock implementation for testing"""
-        if not relevant_chunks:
-            return "Error: No context provided"
-        return f"This is a mock response about {query} based on the provided context: {relevant_chunks[0]['content']}"
+# Errors worth retrying: rate limits, overload and timeouts
+TRANSIENT_ERRORS = (
+    asyncio.TimeoutError,
+    google_exceptions.ResourceExhausted,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.InternalServerError,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.GatewayTimeout,
+    TransientProviderError,
+    httpx.TransportError
+)
+
+class LLMStreamError(Exception):
+    """A streamed answer failed; any text already yielded is incomplete"""
 
 class GeminiClient:
-    def __init__(self, use_mock: bool = False):
+    """
+    Async LLM client over a primary provider (Gemini by default).
+
+    Calls are limited by a per-process semaphore (`llm_max_concurrency`),
+    bounded by a per-call deadline (`llm_timeout`) and retried with
+    jittered exponential backoff on transient errors. When the primary
+    hasn't answered by the recent p95 latency and a slot is free, the
+    same request is hedged to `llm_hedge_provider` (or the primary again)
+    and whichever answer arrives first wins.
+    """
+
+    def __init__(self, use_mock: bool = False, provider: Optional[LLMProvider] = None, hedge_provider: Optional[LLMProvider] = None):
+        self._semaphore = asyncio.Semaphore(settings.llm_max_concurrency)
+        self._waiting = 0
+        self._in_flight = 0
+        self.latency = metrics.histogram("llm.latency_ms")
+        # Primary provider alone, without hedging or streaming, so the hedge delay tracks it
+        self.primary_latency = metrics.histogram("llm.primary_latency_ms")
+        self.queue_wait = metrics.histogram("llm.queue_wait_ms")
+        self.retries = metrics.counter("llm.retries")
+        self.timeouts = metrics.counter("llm.timeouts")
+        self.errors = metrics.counter("llm.errors")
+        self.hedges = metrics.counter("llm.hedges")
+        self.hedge_wins = metrics.counter("llm.hedge_wins")
+        metrics.gauge("llm.queue_depth", lambda: self._waiting)
+        metrics.gauge("llm.in_flight", lambda: self._in_flight)
+
         if use_mock:
             self.mock_client = MockGeminiClient()
-            return
-            
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
-            raise ValueError("GEMINI_API_KEY not found in environment variables")
-        
-        genai.configure(api_key=api_key)
-        
-        try:
-            # Use the newer Gemini 1.5 Flash model directly
-            self.model = genai.GenerativeModel('gemini-1.5-flash')
-            
-            # Set generation config
-            self.model.generation_config = {
-                "temperature": 0.7,
-                "top_p": 0.8,
-                "top_k": 40,
-                "max_output_tokens": 2048,
-            }
-            
-        except Exception as e:
-            print(f"Error during model initialization: {str(e)}")
-            raise ValueError(f"Failed to initialize Gemini model: {str(e)}")
+            provider = provider or self.mock_client
+        self.provider = provider or create_provider(settings.llm_provider)
+        if hedge_provider is None and settings.llm_hedge_provider:
+            hedge_provider = self.mock_client if use_mock else create_provider(settings.llm_hedge_provider)
+        self.hedge_provider = hedge_provider or self.provider
     
-    async def generate_response(self, query: str, relevant_chunks: List[Dict[str, Any]]) -> str:
-        if hasattr(self, 'mock_client'):
-            return await self.mock_client.generate_response(query, relevant_chunks)
-            
+    def build_prompt(self, query: str, relevant_chunks: List[Dict[str, Any]]) -> str:
+        return build_prompt(query, relevant_chunks)
+
+    @asynccontextmanager
+    async def _slot(self):
+        """Hold one of the process-wide LLM concurrency slots"""
+        self._waiting += 1
+        wait_start = time.perf_counter()
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._waiting -= 1
+        self.queue_wait.observe((time.perf_counter() - wait_start) * 1000)
+        self._in_flight += 1
         try:
-            if not relevant_chunks:
-                return "Error: No context provided"
-                
-            context = "\n".join([chunk["content"] for chunk in relevant_chunks])
-            prompt = f"""Based on the following context, provide a detailed answer to the question.
-            
-            Context: {context}
-            
-            Question: {query}
-            
-            Answer the question using only the information from the context above."""
-            
-            response = self.model.generate_content(prompt)
-            if not response or not response.text:
-                return "Error: Empty response from LLM"
-            return response.text
-            
-        except Exception as e:
-            print(f"Error generating response: {str(e)}")
-            return "Error generating response from LLM"
+            yield
+        finally:
+            self._in_flight -= 1
+            self._semaphore.release()
+
+    async def _backoff(self, attempt: int):
+        self.retries.inc()
+        # Full jitter keeps retries from many requests from synchronizing
+        await asyncio.sleep(random.uniform(0, settings.llm_retry_base_delay * (2 ** attempt)))
+
+    def _hedge_delay(self) -> Optional[float]:
+        """Seconds to wait for the primary before hedging, or None to not hedge"""
+        if not settings.llm_hedge_enabled:
+            return None
+        if settings.llm_hedge_delay_ms:
+            return settings.llm_hedge_delay_ms / 1000
+        if self.primary_latency.count < settings.llm_hedge_min_samples:
+            return None
+        return self.primary_latency.percentile(settings.llm_hedge_percentile) / 1000
+
+    def _observe_primary(self, task: asyncio.Task, start: float):
+        # Calls cancelled because a hedge won never finished, so they aren't samples
+        if not task.cancelled() and task.exception() is None:
+            self.primary_latency.observe((time.perf_counter() - start) * 1000)
+
+    async def _first_answer(self, primary: asyncio.Task, hedge: asyncio.Task) -> str:
+        """Result of whichever task succeeds first; re-raises if both fail"""
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is hedge:
+                        self.hedge_wins.inc()
+                    return task.result()
+                error = error or task.exception()
+        raise error
+
+    async def _generate_once(
+        self,
+        query: str,
+        relevant_chunks: List[Dict[str, Any]],
+        cached_context: Optional[str] = None
+    ) -> str:
+        start = time.perf_counter()
+        primary = asyncio.ensure_future(self.provider.generate_response(query, relevant_chunks, cached_context))
+        primary.add_done_callback(lambda task: self._observe_primary(task, start))
+        delay = self._hedge_delay()
+        hedge = None
+        try:
+            if delay is not None:
+                await asyncio.wait({primary}, timeout=delay)
+            # Hedge only with spare capacity, so hedging can't amplify overload
+            # Cached contexts belong to the primary provider, so those calls aren't hedged elsewhere
+            hedge_provider = self.provider if cached_context is not None else self.hedge_provider
+            if delay is None or primary.done() or self._semaphore.locked():
+                return await primary
+
+            self.hedges.inc()
+            async with self._slot():
+                hedge = asyncio.ensure_future(hedge_provider.generate_response(query, relevant_chunks, cached_context))
+                return await self._first_answer(primary, hedge)
+        finally:
+            for task in (primary, hedge):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    async def generate_response(
+        self,
+        query: str,
+        relevant_chunks: List[Dict[str, Any]],
+        cached_context: Optional[str] = None
+    ) -> str:
+        """
+        Answer `query` from `relevant_chunks`. With `cached_context` (a handle
+        from the primary provider's context cache) the chunks aren't resent.
+        """
+        if not relevant_chunks and cached_context is None:
+            return "Error: No context provided"
+
+        for attempt in range(settings.llm_max_retries + 1):
+            try:
+                async with self._slot():
+                    start = time.perf_counter()
+                    result = await asyncio.wait_for(
+                        self._generate_once(query, relevant_chunks, cached_context),
+                        timeout=settings.llm_timeout
+                    )
+                    self.latency.observe((time.perf_counter() - start) * 1000)
+                    return result
+
+            except TRANSIENT_ERRORS as e:
+                if isinstance(e, asyncio.TimeoutError):
+                    self.timeouts.inc()
+                if attempt == settings.llm_max_retries:
+                    self.errors.inc()
+                    print(f"Error generating response after {attempt + 1} attempts: {type(e).__name__} {str(e)}")
+                    return "Error generating response from LLM"
+                await self._backoff(attempt)
+
+            except Exception as e:
+                self.errors.inc()
+                print(f"Error generating response: {str(e)}")
+                return "Error generating response from LLM"
+
+    async def _stream_once(self, query: str, relevant_chunks: List[Dict[str, Any]]) -> AsyncIterator[str]:
+        iterator = self.provider.stream_response(query, relevant_chunks).__aiter__()
+        while True:
+            # The deadline applies to each gap between chunks, not the whole answer
+            try:
+                text = await asyncio.wait_for(iterator.__anext__(), timeout=settings.llm_timeout)
+            except StopAsyncIteration:
+                break
+            yield text
+
+    async def stream_response(self, query: str, relevant_chunks: List[Dict[str, Any]]) -> AsyncIterator[str]:
+        """
+        Yield answer text as Gemini produces it; only retried before the
+        first token. Raises LLMStreamError when generation fails, so a
+        partial answer is never mistaken for a complete one.
+        """
+        if not relevant_chunks:
+            yield "Error: No context provided"
+            return
+
+        for attempt in range(settings.llm_max_retries + 1):
+            started = False
+            try:
+                async with self._slot():
+                    start = time.perf_counter()
+                    async for text in self._stream_once(query, relevant_chunks):
+                        started = True
+                        yield text
+                    self.latency.observe((time.perf_counter() - start) * 1000)
+                return
+
+            except TRANSIENT_ERRORS as e:
+                if isinstance(e, asyncio.TimeoutError):
+                    self.timeouts.inc()
+                if started or attempt == settings.llm_max_retries:
+                    self.errors.inc()
+                    print(f"Error streaming response: {type(e).__name__} {str(e)}")
+                    raise LLMStreamError("Error generating response from LLM") from e
+                await self._backoff(attempt)
+
+            except Exception as e:
+                self.errors.inc()
+                print(f"Error streaming response: {str(e)}")
+                raise LLMStreamError("Error generating response from LLM") from e
 
 # Singleton instance - use mock in test environment
 is_test = os.getenv("PYTEST_CURRENT_TEST") is not None
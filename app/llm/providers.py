@@ -0,0 +1,233 @@
+from typing import List, Dict, Any, AsyncIterator, Optional
+from abc import ABC, abstractmethod
+from datetime import timedelta
+import asyncio
+import json
+import os
+import httpx
+import google.generativeai as genai
+from ..config import settings
+
+class TransientProviderError(Exception):
+    """Provider is overloaded or temporarily failing; the call can be retried"""
+
+def build_prompt(query: str, relevant_chunks: List[Dict[str, Any]]) -> str:
+    context = "\n".join([chunk["content"] for chunk in relevant_chunks])
+    return f"""Based on the following context, provide a detailed answer to the question.
+
+            Context: {context}
+
+            Question: {query}
+
+            Answer the question using only the information from the context above."""
+
+CACHED_CONTEXT_INSTRUCTION = (
+    "You answer questions about the company documents provided in this context. "
+    "Answer using only the information from those documents."
+)
+
+def build_cached_prompt(query: str) -> str:
+    """Prompt sent alongside a cached context; the documents themselves aren't resent"""
+    return f"Question: {query}"
+
+class LLMProvider(ABC):
+    """
+    A model backend. Providers only talk to the model; concurrency limits,
+    deadlines, retries and hedging live in the client that wraps them.
+    Only providers with `supports_context_cache` accept a `cached_context`.
+    """
+
+    name = "provider"
+    supports_context_cache = False
+
+    @abstractmethod
+    async def generate_response(
+        self,
+        query: str,
+        relevant_chunks: List[Dict[str, Any]],
+        cached_context: Optional[str] = None
+    ) -> str:
+        """Answer from `relevant_chunks`, or from a previously cached context when given"""
+
+    async def create_context_cache(self, display_name: str, context: str, ttl_seconds: int) -> str:
+        """Register `context` as a reusable prompt prefix; returns the provider's handle"""
+        raise NotImplementedError
+
+    async def delete_context_cache(self, handle: str):
+        pass
+
+    async def stream_response(self, query: str, relevant_chunks: List[Dict[str, Any]]) -> AsyncIterator[str]:
+        """Providers without native streaming return the whole answer as one piece"""
+        yield await self.generate_response(query, relevant_chunks)
+
+class MockGeminiClient(LLMProvider):
+    name = "mock"
+    supports_context_cache = True
+
+    def __init__(self):
+        self.context_caches: Dict[str, str] = {}
+
+    async def generate_response(
+        self,
+        query: str,
+        relevant_chunks: List[Dict[str, Any]],
+        cached_context: Optional[str] = None
+    ) -> str:
+        """Mock implementation for testing"""
+        if cached_context is not None:
+            if cached_context not in self.context_caches:
+                raise ValueError(f"Unknown cached context: {cached_context}")
+            return f"This is a mock response about {query} based on the cached context {cached_context}"
+        if not relevant_chunks:
+            return "Error: No context provided"
+        return f"This is a mock response about {query} based on the provided context: {relevant_chunks[0]['content']}"
+
+    async def create_context_cache(self, display_name: str, context: str, ttl_seconds: int) -> str:
+        handle = f"cachedContents/mock-{display_name}-{len(self.context_caches)}"
+        self.context_caches[handle] = context
+        return handle
+
+    async def delete_context_cache(self, handle: str):
+        self.context_caches.pop(handle, None)
+
+    async def stream_response(self, query: str, relevant_chunks: List[Dict[str, Any]]) -> AsyncIterator[str]:
+        """Mock streaming: yields the mock response word by word"""
+        response = await self.generate_response(query, relevant_chunks)
+        words = response.split(" ")
+        for i, word in enumerate(words):
+            yield word if i == len(words) - 1 else word + " "
+
+class GeminiProvider(LLMProvider):
+    name = "gemini"
+    supports_context_cache = True
+
+    def __init__(self, model_name: str = settings.llm_model):
+        self.model_name = model_name
+        # Cached-content handle -> model bound to it
+        self._cached_models: Dict[str, genai.GenerativeModel] = {}
+        api_key = os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            raise ValueError("GEMINI_API_KEY not found in environment variables")
+
+        genai.configure(api_key=api_key)
+
+        try:
+            self.model = genai.GenerativeModel(model_name)
+
+            # Set generation config
+            self.model.generation_config = {
+                "temperature": 0.7,
+                "top_p": 0.8,
+                "top_k": 40,
+                "max_output_tokens": 2048,
+            }
+
+        except Exception as e:
+            print(f"Error during model initialization: {str(e)}")
+            raise ValueError(f"Failed to initialize Gemini model: {str(e)}")
+
+    async def _model_for(self, handle: str) -> "genai.GenerativeModel":
+        model = self._cached_models.get(handle)
+        if model is None:
+            model = await asyncio.to_thread(genai.GenerativeModel.from_cached_content, cached_content=handle)
+            model.generation_config = self.model.generation_config
+            self._cached_models[handle] = model
+        return model
+
+    async def generate_response(
+        self,
+        query: str,
+        relevant_chunks: List[Dict[str, Any]],
+        cached_context: Optional[str] = None
+    ) -> str:
+        if cached_context is not None:
+            model = await self._model_for(cached_context)
+            response = await model.generate_content_async(build_cached_prompt(query))
+        else:
+            response = await self.model.generate_content_async(build_prompt(query, relevant_chunks))
+        if not response or not response.text:
+            return "Error: Empty response from LLM"
+        return response.text
+
+    async def create_context_cache(self, display_name: str, context: str, ttl_seconds: int) -> str:
+        cache = await asyncio.to_thread(
+            genai.caching.CachedContent.create,
+            model=f"models/{self.model_name}",
+            display_name=display_name,
+            system_instruction=CACHED_CONTEXT_INSTRUCTION,
+            contents=[context],
+            ttl=timedelta(seconds=ttl_seconds)
+        )
+        return cache.name
+
+    async def delete_context_cache(self, handle: str):
+        self._cached_models.pop(handle, None)
+        await asyncio.to_thread(lambda: genai.caching.CachedContent.get(handle).delete())
+
+    async def stream_response(self, query: str, relevant_chunks: List[Dict[str, Any]]) -> AsyncIterator[str]:
+        response = await self.model.generate_content_async(build_prompt(query, relevant_chunks), stream=True)
+        async for chunk in response:
+            try:
+                text = chunk.text
+            except ValueError:
+                # Chunks without text parts (e.g. safety metadata only)
+                continue
+            if text:
+                yield text
+
+class HTTPProvider(LLMProvider):
+    """
+    Model served over a small JSON API (see scripts/stub_llm_server.py):
+    POST {url}/generate with {"prompt", "stream"} returns {"text"}, or
+    newline-delimited JSON {"text"} pieces when streaming.
+    """
+
+    name = "http"
+
+    def __init__(self, url: str, timeout: Optional[float] = None):
+        self.url = url.rstrip("/")
+        self._client = httpx.AsyncClient(timeout=timeout or settings.llm_timeout)
+
+    @staticmethod
+    def _check(response: httpx.Response):
+        if response.status_code == 429 or response.status_code >= 500:
+            raise TransientProviderError(f"{response.status_code} from model server")
+        response.raise_for_status()
+
+    async def generate_response(
+        self,
+        query: str,
+        relevant_chunks: List[Dict[str, Any]],
+        cached_context: Optional[str] = None
+    ) -> str:
+        if cached_context is not None:
+            raise ValueError("The http provider doesn't support cached contexts")
+        response = await self._client.post(
+            f"{self.url}/generate",
+            json={"prompt": build_prompt(query, relevant_chunks), "stream": False}
+        )
+        self._check(response)
+        return response.json()["text"]
+
+    async def stream_response(self, query: str, relevant_chunks: List[Dict[str, Any]]) -> AsyncIterator[str]:
+        async with self._client.stream(
+            "POST",
+            f"{self.url}/generate",
+            json={"prompt": build_prompt(query, relevant_chunks), "stream": True}
+        ) as response:
+            self._check(response)
+            async for line in response.aiter_lines():
+                if line:
+                    yield json.loads(line)["text"]
+
+def create_provider(name: str) -> LLMProvider:
+    """Build the provider registered under `name` ("gemini", "http" or "mock")"""
+    if name == "gemini":
+        return GeminiProvider()
+    if name == "http":
+        if not settings.llm_http_url:
+            raise ValueError("llm_http_url is required for the http provider")
+        return HTTPProvider(settings.llm_http_url)
+    if name == "mock":
+        return MockGeminiClient()
+    raise ValueError(f"Unknown LLM provider: {name}")
@@ -1,4 +1,4 @@
-from fastapi import FastAPI, Request, Depends
+from fastapi import FastAPI, Request, Depends, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 # Import routers directly from their modules
 from .routers.auth_router import router as auth_router
@@ -8,7 +8,12 @@ from .routers.subscription_router import router as subscription_router
 from .routers.query_log_router import router as query_log_router
 from .routers.document_router import router as document_router
 from .core.logging.middleware import RequestLoggingMiddleware
+from .auth.auth_middleware import auth_middleware
 from .routers.rag_query_router import router as rag_router
+from .core.metrics import metrics
+from .utils.query_log_writer import query_log_writer
+from .retrieval import embedder
+import asyncio
 import time
 
 app = FastAPI(
@@ -85,10 +90,41 @@ app.include_router(rag_router)
 
 print("Routers registered!")
 
+@app.on_event("startup")
+async def start_background_writers():
+    await query_log_writer.start()
+
+@app.on_event("startup")
+async def load_embedding_model():
+    # Load the model before the first query instead of during it, and say so
+    # loudly when retrieval is running on the hashing fallback
+    model_name = await asyncio.to_thread(lambda: embedder.model_name)
+    if model_name != embedder.requested_model:
+        print(
+            f"WARNING: embedding model {embedder.requested_model} is not available; "
+            f"using the {model_name} fallback. Install sentence-transformers for semantic retrieval."
+        )
+    else:
+        print(f"Embedding model loaded: {model_name}")
+
+@app.on_event("shutdown")
+async def flush_background_writers():
+    # Buffered query logs must not be lost on shutdown
+    await query_log_writer.stop()
+    if embedder.query_cache is not None:
+        await asyncio.to_thread(embedder.query_cache.flush)
+
 @app.get("/")
 async def root():
     return {"message": "Welcome to Nyro API! See /docs for API documentation"}
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "timestamp": time.time()}
\ No newline at end of file
+    return {"status": "healthy", "timestamp": time.time()}
+
+@app.get("/metrics", dependencies=[Depends(auth_middleware)])
+async def get_metrics(request: Request):
+    """Process-wide counters and latency histograms (admin only)"""
+    if request.state.user.get('role') != 'admin':
+        raise HTTPException(status_code=403, detail="Only admins can read metrics")
+    return metrics.snapshot()
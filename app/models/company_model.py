@@ -10,6 +10,7 @@ class Company(BaseModel):
     created_at: datetime
     updated_at: datetime
     is_active: bool
+    extractive_answers: bool = False
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -21,6 +22,7 @@ class CompanyUpdate(BaseModel):
     name: Optional[str] = None
     email: Optional[EmailStr] = None
     is_active: Optional[bool] = None
+    extractive_answers: Optional[bool] = None
 
 class CompanyList(BaseModel):
     """Response model for list of companies"""
@@ -1,13 +1,22 @@
-from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
+from pydantic import BaseModel, Field
+from typing import List, Dict, Any, Optional, Literal
 
 class RAGQueryRequest(BaseModel):
     query: str
     max_results: int = 5
     company_id: Optional[str] = None  # Will be filled from JWT
+    retrieval_mode: Optional[Literal["lexical", "vector", "hybrid"]] = None  # Defaults to settings.retrieval_mode
+    deadline_ms: Optional[int] = Field(None, gt=0)  # Latency budget; defaults to the plan's budget
 
 class RAGQueryResponse(BaseModel):
     query: str
     relevant_chunks: List[Dict[str, Any]]
     answer: str
-    metadata: Dict[str, Any] = {}
\ No newline at end of file
+    metadata: Dict[str, Any] = {}
+
+class RAGBatchQueryRequest(BaseModel):
+    queries: List[RAGQueryRequest]
+
+class RAGBatchQueryResponse(BaseModel):
+    results: List[RAGQueryResponse]
+    metadata: Dict[str, Any] = {}
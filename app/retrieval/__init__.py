@@ -0,0 +1,26 @@
+from .embeddings import embedder, Embedder
+from .vector_index import InMemoryVectorStore, CompanyVectorIndex
+from .bm25_index import BM25Store, CompanyBM25Index
+from .retriever import retriever, ChunkRetriever
+from .answer_cache import answer_cache, AnswerCache, normalize_query
+from .semantic_cache import semantic_cache, SemanticCache
+from .rerank import reranker, Reranker, mmr_select
+
+__all__ = [
+    'embedder',
+    'Embedder',
+    'InMemoryVectorStore',
+    'CompanyVectorIndex',
+    'BM25Store',
+    'CompanyBM25Index',
+    'retriever',
+    'ChunkRetriever',
+    'answer_cache',
+    'AnswerCache',
+    'normalize_query',
+    'semantic_cache',
+    'SemanticCache',
+    'reranker',
+    'Reranker',
+    'mmr_select'
+]
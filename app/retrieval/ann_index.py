@@ -0,0 +1,140 @@
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
+from ..config import settings
+from .vector_index import CompanyVectorIndex, top_k_indices
+
+ASSIGN_BLOCK = 65536
+
+def assign_to_centroids(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Nearest centroid (by inner product) for every row, in bounded-memory blocks"""
+    assignments = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), ASSIGN_BLOCK):
+        block = vectors[start:start + ASSIGN_BLOCK]
+        assignments[start:start + ASSIGN_BLOCK] = np.argmax(block @ centroids.T, axis=1)
+    return assignments
+
+def train_centroids(vectors: np.ndarray, nlist: int, iterations: int, sample_size: int, seed: int = 0) -> np.ndarray:
+    """Spherical k-means on a sample of the (unit-norm) vectors"""
+    rng = np.random.default_rng(seed)
+    if len(vectors) > sample_size:
+        sample = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+    else:
+        sample = vectors
+    nlist = min(nlist, len(sample))
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignments = assign_to_centroids(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, sample)
+        counts = np.bincount(assignments, minlength=nlist)
+        empty = counts == 0
+        if empty.any():
+            # Re-seed empty clusters from random points so every list gets used
+            sums[empty] = sample[rng.choice(len(sample), int(empty.sum()), replace=False)]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        centroids = (sums / np.maximum(norms, 1e-12)).astype(np.float32)
+    return centroids
+
+class IVFVectorIndex(CompanyVectorIndex):
+    """
+    Inverted-file index: vectors are bucketed by their nearest k-means
+    centroid and a query only scores the `nprobe` closest buckets.
+
+    Centroids are trained on build. Later additions are assigned to the
+    existing centroids and removed rows just leave their lists, so updates
+    cost O(new rows x nlist) plus a re-sort of the row assignments. The
+    centroids are retrained once the rows added and removed since training
+    exceed `retrain_drift` times the trained size.
+    """
+
+    def __init__(
+        self,
+        dim: int,
+        nlist: int = settings.ann_nlist,
+        nprobe: int = settings.ann_nprobe,
+        train_iterations: int = settings.ann_train_iterations,
+        train_sample: int = settings.ann_train_sample,
+        retrain_drift: float = settings.ann_retrain_drift
+    ):
+        super().__init__(dim)
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_iterations = train_iterations
+        self.train_sample = train_sample
+        self.retrain_drift = retrain_drift
+        self._trained_size = 0
+        self._drift = 0
+        self._centroids = None
+        # Centroid of every row, aligned with the published vectors
+        self._assignments = np.empty(0, dtype=np.int32)
+
+    def _list_count(self, n: int) -> int:
+        return self.nlist or max(1, int(np.sqrt(n)))
+
+    @staticmethod
+    def _inverted_lists(assignments: np.ndarray, nlist: int) -> Tuple[np.ndarray, np.ndarray]:
+        order = np.argsort(assignments, kind="stable")
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assignments, minlength=nlist))])
+        return order, offsets
+
+    def _needs_training(self, size: int) -> bool:
+        if self._centroids is None or not len(self._centroids):
+            return size > 0
+        return self._drift > self.retrain_drift * max(self._trained_size, 1)
+
+    def _publish(self, chunks: List[Dict[str, Any]], vectors: np.ndarray, assignments: Optional[np.ndarray]):
+        """Swap in the new rows with their lists; `assignments` None retrains the centroids"""
+        if assignments is None:
+            if len(vectors):
+                self._centroids = train_centroids(
+                    vectors, self._list_count(len(vectors)), self.train_iterations, self.train_sample
+                )
+                assignments = assign_to_centroids(vectors, self._centroids)
+            else:
+                self._centroids = None
+                assignments = np.empty(0, dtype=np.int32)
+            self._trained_size = len(vectors)
+            self._drift = 0
+        self._assignments = assignments
+        centroids = self._centroids if self._centroids is not None else np.empty((0, self.dim), dtype=np.float32)
+        order, offsets = self._inverted_lists(assignments, len(centroids))
+        # Lists are published with the data they index so searches stay consistent;
+        # (chunks, vectors) snapshots without lists fall back to brute force
+        self._data = (chunks, vectors, (centroids, order, offsets))
+
+    def add(self, chunks: List[Dict[str, Any]], vectors: np.ndarray):
+        merged_chunks, merged_vectors, keep = self._merged(chunks, vectors)
+        self._drift += len(chunks) + (len(self.chunks) - len(keep))
+        assignments = None
+        if not self._needs_training(len(merged_vectors)):
+            new_rows = merged_vectors[len(keep):]
+            assignments = np.concatenate([self._assignments[keep], assign_to_centroids(new_rows, self._centroids)])
+        self._publish(merged_chunks, merged_vectors, assignments)
+
+    def remove_document(self, document_id: str) -> int:
+        kept_chunks, kept_vectors, keep = self._without_document(document_id)
+        removed = len(self.chunks) - len(kept_chunks)
+        if removed:
+            self._drift += removed
+            assignments = None if self._needs_training(len(kept_vectors)) else self._assignments[keep]
+            self._publish(kept_chunks, kept_vectors, assignments)
+        return removed
+
+    def search_batch(self, query_vectors: np.ndarray, k: int) -> List[List[Tuple[Dict[str, Any], float]]]:
+        """Score each query against the rows of its nprobe nearest lists"""
+        data = self._data
+        chunks, vectors = data[:2]
+        if not chunks or len(data) < 3:
+            return super().search_batch(query_vectors, k)
+        centroids, order, offsets = data[2]
+
+        query_vectors = np.atleast_2d(query_vectors)
+        probes = top_k_indices(query_vectors @ centroids.T, self.nprobe)
+        results = []
+        for query_vector, lists in zip(query_vectors, probes):
+            candidates = np.concatenate([order[offsets[j]:offsets[j + 1]] for j in lists])
+            scores = vectors[candidates] @ query_vector
+            top = top_k_indices(scores, k)
+            results.append([(chunks[candidates[i]], float(scores[i])) for i in top])
+        return results
@@ -0,0 +1,61 @@
+from typing import Dict, Any, Optional, Tuple
+from collections import OrderedDict
+import copy
+import threading
+import time
+from ..config import settings
+from ..core.metrics import metrics
+from .text import normalize_query
+from .retriever import retriever
+
+class AnswerCache:
+    """
+    Exact-match cache of full RAG responses.
+
+    Keys include the company's corpus version, so answers computed
+    against an older corpus can never be served; `invalidate` also drops
+    them eagerly when a company's documents change.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = metrics.counter("answer_cache.hits")
+        self.misses = metrics.counter("answer_cache.misses")
+        metrics.gauge("answer_cache.entries", lambda: len(self._entries))
+
+    @staticmethod
+    def make_key(company_id: str, query: str, max_results: int, mode: str, version: int) -> Tuple:
+        return (company_id, normalize_query(query), max_results, mode, version)
+
+    def get(self, key: Tuple) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None and item[0] < time.monotonic():
+                del self._entries[key]
+                item = None
+            if item is not None:
+                self._entries.move_to_end(key)
+        if item is None:
+            self.misses.inc()
+            return None
+        self.hits.inc()
+        return copy.deepcopy(item[1])
+
+    def put(self, key: Tuple, response: Dict[str, Any]):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, copy.deepcopy(response))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, company_id: str):
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == company_id]:
+                del self._entries[key]
+
+# Singleton instance, purged whenever a company's corpus version changes
+answer_cache = AnswerCache(settings.answer_cache_max_entries, settings.answer_cache_ttl)
+retriever.cache.add_listener(answer_cache.invalidate)
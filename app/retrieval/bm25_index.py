@@ -0,0 +1,135 @@
+from typing import List, Dict, Any, Tuple
+from collections import Counter, defaultdict
+import heapq
+import math
+import threading
+from .text import tokenize
+
+class CompanyBM25Index:
+    """Incremental inverted index with BM25 scoring for a single company"""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[str, int]] = defaultdict(dict)
+        self.doc_lengths: Dict[str, int] = {}
+        self.chunks: Dict[str, Dict[str, Any]] = {}
+        self.document_chunks: Dict[str, List[str]] = defaultdict(list)
+        self.total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    def _remove_chunk(self, chunk_id: str):
+        chunk = self.chunks.pop(chunk_id, None)
+        if chunk is None:
+            return
+        for term in set(tokenize(chunk["content"])):
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(chunk_id, None)
+                if not postings:
+                    del self.postings[term]
+        self.total_length -= self.doc_lengths.pop(chunk_id, 0)
+
+    def add(self, chunks: List[Dict[str, Any]]):
+        for chunk in chunks:
+            chunk_id = chunk["id"]
+            if chunk_id in self.chunks:
+                self._remove_chunk(chunk_id)
+            else:
+                self.document_chunks[chunk["document_id"]].append(chunk_id)
+            tokens = tokenize(chunk["content"])
+            for term, tf in Counter(tokens).items():
+                self.postings[term][chunk_id] = tf
+            self.chunks[chunk_id] = chunk
+            self.doc_lengths[chunk_id] = len(tokens)
+            self.total_length += len(tokens)
+
+    def remove_document(self, document_id: str) -> int:
+        chunk_ids = self.document_chunks.pop(document_id, [])
+        for chunk_id in chunk_ids:
+            self._remove_chunk(chunk_id)
+        return len(chunk_ids)
+
+    def search(self, query: str, k: int) -> List[Tuple[Dict[str, Any], float]]:
+        """Score only the chunks that share at least one term with the query"""
+        n = len(self.chunks)
+        if not n or k <= 0:
+            return []
+        avg_length = self.total_length / n or 1.0
+        scores: Dict[str, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            df = len(postings)
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            for chunk_id, tf in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[chunk_id] / avg_length)
+                scores[chunk_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [(self.chunks[chunk_id], score) for chunk_id, score in best]
+
+class BM25Store:
+    """
+    Per-company BM25 indexes kept in process memory.
+
+    Postings are mutated in place, so each company's index is guarded by
+    its own lock; a search or update for one tenant never waits on another.
+    """
+
+    persistent = False
+
+    def __init__(self):
+        self._indexes: Dict[str, CompanyBM25Index] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        # Only guards creating entries in _locks
+        self._locks_guard = threading.Lock()
+
+    def _lock_for(self, company_id: str) -> threading.Lock:
+        lock = self._locks.get(company_id)
+        if lock is None:
+            with self._locks_guard:
+                lock = self._locks.setdefault(company_id, threading.Lock())
+        return lock
+
+    def is_loaded(self, company_id: str) -> bool:
+        return company_id in self._indexes
+
+    def count(self, company_id: str) -> int:
+        index = self._indexes.get(company_id)
+        return len(index) if index else 0
+
+    def chunks(self, company_id: str) -> List[Dict[str, Any]]:
+        with self._lock_for(company_id):
+            index = self._indexes.get(company_id)
+            return list(index.chunks.values()) if index else []
+
+    def replace(self, company_id: str, chunks: List[Dict[str, Any]]):
+        index = CompanyBM25Index()
+        index.add(chunks)
+        with self._lock_for(company_id):
+            self._indexes[company_id] = index
+
+    def add(self, company_id: str, chunks: List[Dict[str, Any]]):
+        with self._lock_for(company_id):
+            index = self._indexes.get(company_id)
+            if index is not None:
+                index.add(chunks)
+
+    def remove_document(self, company_id: str, document_id: str):
+        with self._lock_for(company_id):
+            index = self._indexes.get(company_id)
+            if index is not None:
+                index.remove_document(document_id)
+
+    def drop(self, company_id: str):
+        with self._lock_for(company_id):
+            self._indexes.pop(company_id, None)
+
+    def search(self, company_id: str, query: str, k: int) -> List[Tuple[Dict[str, Any], float]]:
+        with self._lock_for(company_id):
+            index = self._indexes.get(company_id)
+            return index.search(query, k) if index else []
@@ -0,0 +1,138 @@
+from typing import Dict, List, Optional, Any, Callable
+from collections import OrderedDict
+import threading
+import time
+from ..core.metrics import metrics
+
+class CorpusEntry:
+    def __init__(self, version: int, size_bytes: int, fingerprint: Optional[int]):
+        self.version = version
+        self.size_bytes = size_bytes
+        self.fingerprint = fingerprint
+        self.loaded_at = time.monotonic()
+
+class CorpusCache:
+    """
+    Bookkeeping for the per-company corpora held in process memory.
+
+    Every company has a corpus version that is bumped whenever its
+    documents change. An entry is only served while its version is
+    current and younger than the TTL; tenants are evicted in LRU order
+    once the estimated memory use exceeds `max_bytes`.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, CorpusEntry]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[str], None]] = []
+        self.hits = metrics.counter("chunk_cache.hits")
+        self.misses = metrics.counter("chunk_cache.misses")
+        self.evictions = metrics.counter("chunk_cache.evictions")
+        metrics.gauge("chunk_cache.bytes", lambda: self.total_bytes)
+        # Only a count: metrics are process-wide and must not list company ids
+        metrics.gauge("chunk_cache.tenants", lambda: len(self._entries))
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(entry.size_bytes for entry in list(self._entries.values()))
+
+    def version(self, company_id: str) -> int:
+        return self._versions.get(company_id, 0)
+
+    def add_listener(self, callback: Callable[[str], None]):
+        """Call `callback(company_id)` whenever a company's version changes"""
+        self._listeners.append(callback)
+
+    def _notify(self, company_id: str):
+        for callback in self._listeners:
+            try:
+                callback(company_id)
+            except Exception as e:
+                print(f"Error in corpus version listener: {str(e)}")
+
+    def bump(self, company_id: str) -> int:
+        with self._lock:
+            self._versions[company_id] = self._versions.get(company_id, 0) + 1
+            version = self._versions[company_id]
+        self._notify(company_id)
+        return version
+
+    def is_current(self, company_id: str) -> bool:
+        entry = self._entries.get(company_id)
+        return entry is not None and entry.version == self.version(company_id)
+
+    def _is_fresh(self, company_id: str) -> bool:
+        entry = self._entries.get(company_id)
+        return (
+            entry is not None
+            and entry.version == self._versions.get(company_id, 0)
+            and time.monotonic() - entry.loaded_at <= self.ttl
+        )
+
+    def lookup(self, company_id: str) -> bool:
+        """True if the company's in-memory corpus can be served as is"""
+        with self._lock:
+            fresh = self._is_fresh(company_id)
+            if fresh:
+                self._entries.move_to_end(company_id)
+        (self.hits if fresh else self.misses).inc()
+        return fresh
+
+    def peek(self, company_id: str) -> bool:
+        """Like `lookup`, without counting or touching the LRU order"""
+        with self._lock:
+            return self._is_fresh(company_id)
+
+    def store(self, company_id: str, size_bytes: int, fingerprint: int) -> List[str]:
+        """
+        Record a freshly loaded corpus and return the companies evicted to
+        make room. A reload that finds a different chunk set (e.g. written
+        by another worker) bumps the version so dependent caches notice.
+        """
+        with self._lock:
+            previous = self._entries.pop(company_id, None)
+            # Entries changed in place have no fingerprint and are bumped conservatively
+            changed = previous is not None and previous.fingerprint != fingerprint
+            if changed:
+                self._versions[company_id] = self._versions.get(company_id, 0) + 1
+            self._entries[company_id] = CorpusEntry(self._versions.get(company_id, 0), size_bytes, fingerprint)
+
+            evicted = []
+            total = sum(entry.size_bytes for entry in self._entries.values())
+            while total > self.max_bytes and len(self._entries) > 1:
+                victim, entry = self._entries.popitem(last=False)
+                total -= entry.size_bytes
+                evicted.append(victim)
+        if evicted:
+            self.evictions.inc(len(evicted))
+        if changed:
+            self._notify(company_id)
+        return evicted
+
+    def update(self, company_id: str, delta_bytes: int = 0):
+        """Carry a current entry over to the latest version after an in-place change"""
+        with self._lock:
+            entry = self._entries.get(company_id)
+            if entry is not None:
+                entry.version = self._versions.get(company_id, 0)
+                entry.size_bytes = max(0, entry.size_bytes + delta_bytes)
+                entry.fingerprint = None
+
+    def discard(self, company_id: str):
+        with self._lock:
+            self._entries.pop(company_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits.value,
+            "misses": self.misses.value,
+            "evictions": self.evictions.value,
+            "bytes": self.total_bytes,
+            "tenants": {
+                company_id: {"version": entry.version, "bytes": entry.size_bytes}
+                for company_id, entry in list(self._entries.items())
+            }
+        }
@@ -0,0 +1,128 @@
+from typing import List, Optional
+import hashlib
+import numpy as np
+from ..config import settings
+from .text import tokenize
+from .query_embedding_cache import QueryEmbeddingCache
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:  # Optional dependency, fall back to hashed features
+    SentenceTransformer = None
+
+class Embedder:
+    """
+    Encodes text into L2-normalized float32 vectors of size `vector_dim`.
+
+    Uses the configured sentence-transformers model when the package is
+    installed; otherwise falls back to a deterministic feature-hashing
+    encoder so retrieval keeps working on minimal installs. Queries go
+    through `encode_queries`, which consults the optional query cache.
+    """
+
+    def __init__(
+        self,
+        model_name: str = settings.embedding_model,
+        dim: int = settings.vector_dim,
+        query_cache: Optional[QueryEmbeddingCache] = None
+    ):
+        self.requested_model = model_name
+        self.dim = dim
+        self.query_cache = query_cache
+        self._model = None
+        self._loaded = False
+
+    def _load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if SentenceTransformer is None:
+            return
+        try:
+            self._model = SentenceTransformer(self.requested_model)
+        except Exception as e:
+            print(f"Error loading embedding model {self.requested_model}: {str(e)}")
+            self._model = None
+
+    @property
+    def model_name(self) -> str:
+        self._load()
+        if self._model is not None:
+            return self.requested_model
+        return f"hashing-{self.dim}"
+
+    @property
+    def is_fallback(self) -> bool:
+        """True when encoding with hashed features instead of the configured model"""
+        self._load()
+        return self._model is None
+
+    def _hash_features(self, text: str) -> np.ndarray:
+        tokens = tokenize(text)
+        # Unigrams plus bigrams keep some word-order signal
+        features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        vector = np.zeros(self.dim, dtype=np.float32)
+        if not features:
+            return vector
+        digests = [
+            int.from_bytes(hashlib.blake2b(f.encode("utf-8"), digest_size=8).digest(), "little")
+            for f in features
+        ]
+        hashes = np.array(digests, dtype=np.uint64)
+        indices = (hashes % np.uint64(self.dim)).astype(np.int64)
+        signs = np.where((hashes >> np.uint64(63)) == 1, -1.0, 1.0).astype(np.float32)
+        np.add.at(vector, indices, signs)
+        return vector
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Encode a batch of texts into an (n, dim) matrix of unit vectors"""
+        self._load()
+        if not texts:
+            return np.empty((0, self.dim), dtype=np.float32)
+
+        if self._model is not None:
+            vectors = np.asarray(
+                self._model.encode(list(texts), batch_size=64, show_progress_bar=False),
+                dtype=np.float32
+            )
+        else:
+            vectors = np.vstack([self._hash_features(text) for text in texts])
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def encode_one(self, text: str) -> np.ndarray:
+        return self.encode([text])[0]
+
+    def encode_queries(self, queries: List[str]) -> np.ndarray:
+        """Like `encode`, but repeat queries skip the encoder via the query cache"""
+        if self.query_cache is None:
+            return self.encode(queries)
+        model = self.model_name
+        found = self.query_cache.get_many(model, queries)
+        missing = list(dict.fromkeys(query for query in queries if query not in found))
+        if missing:
+            vectors = self.encode(missing)
+            self.query_cache.put_many(model, missing, vectors)
+            found.update(zip(missing, vectors))
+        if not queries:
+            return np.empty((0, self.dim), dtype=np.float32)
+        return np.vstack([found[query] for query in queries])
+
+    def encode_query(self, query: str) -> np.ndarray:
+        return self.encode_queries([query])[0]
+
+    def coerce(self, stored: Optional[List[float]]) -> Optional[np.ndarray]:
+        """Return a stored embedding as a unit vector, or None if it doesn't fit this model"""
+        if stored is None or len(stored) != self.dim:
+            return None
+        vector = np.asarray(stored, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+# Singleton instance
+embedder = Embedder(query_cache=QueryEmbeddingCache(
+    settings.query_embedding_cache_size,
+    settings.query_embedding_cache_path
+))
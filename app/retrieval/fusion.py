@@ -0,0 +1,19 @@
+from typing import List, Dict, Any
+
+def reciprocal_rank_fusion(result_lists: List[List[Dict[str, Any]]], k: int, rrf_k: int = 60) -> List[Dict[str, Any]]:
+    """
+    Merge ranked chunk lists with reciprocal rank fusion.
+
+    Each chunk scores sum(1 / (rrf_k + rank)) over the lists it appears in,
+    so agreement between retrievers matters more than raw score scales.
+    """
+    fused: Dict[str, float] = {}
+    chunks: Dict[str, Dict[str, Any]] = {}
+    for results in result_lists:
+        for rank, chunk in enumerate(results, start=1):
+            chunk_id = chunk["id"]
+            fused[chunk_id] = fused.get(chunk_id, 0.0) + 1.0 / (rrf_k + rank)
+            chunks.setdefault(chunk_id, chunk)
+
+    ranked = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:k]
+    return [{**chunks[chunk_id], "score": score} for chunk_id, score in ranked]
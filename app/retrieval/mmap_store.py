@@ -0,0 +1,262 @@
+from typing import List, Dict, Any, Tuple, Optional
+from contextlib import contextmanager
+import os
+import json
+import uuid
+import fcntl
+import numpy as np
+from ..config import settings
+from .vector_index import CompanyVectorIndex, InMemoryVectorStore, top_k_indices
+
+# Bumped when the segment layout changes; shards in an older format are rewritten on load
+SHARD_FORMAT = 2
+
+class ShardedCompanyIndex(CompanyVectorIndex):
+    """
+    A company's embeddings as flat .npy segments on disk, memory-mapped
+    read-only so every worker shares the same pages through the OS cache.
+
+    The directory holds a compacted `base` segment, an append-only `delta`
+    segment and a manifest listing both plus tombstoned row numbers. Each
+    segment stores the chunk and document id of every row, so writers work
+    out row numbers from the manifest they read under the lock, never from
+    a possibly stale in-memory view.
+    Writes take an exclusive file lock, publish new segment files and
+    swap the manifest atomically; the delta is folded into the base once
+    it (or the tombstone list) grows past `delta_max_rows`.
+    """
+
+    def __init__(self, dim: int, directory: str, delta_max_rows: int = settings.vector_delta_max_rows):
+        super().__init__(dim)
+        self.directory = directory
+        self.delta_max_rows = delta_max_rows
+        os.makedirs(directory, exist_ok=True)
+        # (chunk per row or None, base vectors, delta vectors, live row mask)
+        self._data = ([], self._empty_vectors(), self._empty_vectors(), np.zeros(0, dtype=bool))
+
+    def _empty_vectors(self) -> np.ndarray:
+        return np.empty((0, self.dim), dtype=np.float32)
+
+    def __len__(self) -> int:
+        return int(self._data[3].sum())
+
+    @contextmanager
+    def _locked(self):
+        with open(os.path.join(self.directory, ".lock"), "w") as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _read_manifest(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path("manifest.json")) as handle:
+                return json.load(handle)
+        except FileNotFoundError:
+            return None
+
+    def _write_manifest(self, manifest: Dict[str, Any]):
+        tmp = self._path(f"manifest.{uuid.uuid4().hex}.tmp")
+        with open(tmp, "w") as handle:
+            json.dump(manifest, handle)
+        os.replace(tmp, self._path("manifest.json"))
+        # Workers that already mapped old segments keep their pages after unlink
+        referenced = {manifest["base"], manifest.get("delta")}
+        for name in os.listdir(self.directory):
+            if name.endswith(".npy") and name.split(".")[0] not in referenced:
+                os.unlink(self._path(name))
+
+    def _write_segment(self, ids: np.ndarray, document_ids: np.ndarray, vectors: np.ndarray) -> str:
+        segment = uuid.uuid4().hex
+        np.save(self._path(f"{segment}.ids.npy"), np.asarray(ids, dtype="S"))
+        np.save(self._path(f"{segment}.docs.npy"), np.asarray(document_ids, dtype="S"))
+        np.save(self._path(f"{segment}.vectors.npy"), np.ascontiguousarray(vectors, dtype=np.float32))
+        return segment
+
+    def _open_segment(self, segment: Optional[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        if not segment:
+            return np.empty(0, dtype="S"), np.empty(0, dtype="S"), self._empty_vectors()
+        return (
+            np.load(self._path(f"{segment}.ids.npy")),
+            np.load(self._path(f"{segment}.docs.npy")),
+            np.load(self._path(f"{segment}.vectors.npy"), mmap_mode="r")
+        )
+
+    def _open(self, manifest: Dict[str, Any]):
+        base_ids, base_docs, base_vectors = self._open_segment(manifest["base"])
+        delta_ids, delta_docs, delta_vectors = self._open_segment(manifest.get("delta"))
+        ids = [row_id.decode() for row_id in np.concatenate([base_ids, delta_ids])]
+        document_ids = [document_id.decode() for document_id in np.concatenate([base_docs, delta_docs])]
+        live = np.ones(len(ids), dtype=bool)
+        live[manifest["deleted"]] = False
+        return ids, document_ids, live, base_vectors, delta_vectors
+
+    def _map(self, manifest: Dict[str, Any], chunks_by_id: Dict[str, Dict[str, Any]]):
+        ids, _, live, base_vectors, delta_vectors = self._open(manifest)
+        rows = [chunks_by_id.get(row_id) if alive else None for row_id, alive in zip(ids, live)]
+        # Rows written by another worker whose chunks we haven't fetched yet stay hidden
+        live &= np.array([row is not None for row in rows], dtype=bool)
+        self._data = (rows, base_vectors, delta_vectors, live)
+
+    def _live_chunks_by_id(self) -> Dict[str, Dict[str, Any]]:
+        rows, _, _, live = self._data
+        return {row["id"]: row for row, alive in zip(rows, live) if alive}
+
+    def _manifest(self, base: Optional[str], model: Optional[str], delta: Optional[str] = None, deleted=()) -> Dict[str, Any]:
+        # The embedding model and dim are recorded so vectors from another model are never mapped
+        return {
+            "format": SHARD_FORMAT,
+            "model": model,
+            "dim": self.dim,
+            "base": base,
+            "delta": delta,
+            "deleted": sorted(deleted)
+        }
+
+    def _compact(self, manifest: Dict[str, Any]) -> Dict[str, Any]:
+        ids, document_ids, live, base_vectors, delta_vectors = self._open(manifest)
+        vectors = np.vstack([base_vectors, delta_vectors])[live]
+        base = self._write_segment(np.array(ids)[live], np.array(document_ids)[live], vectors)
+        return self._manifest(base, manifest.get("model"))
+
+    def _is_current(self, manifest: Optional[Dict[str, Any]], chunk_ids: set, model: Optional[str]) -> bool:
+        if manifest is None or manifest.get("format") != SHARD_FORMAT:
+            return False
+        if manifest.get("model") != model or manifest.get("dim") != self.dim:
+            return False
+        ids, _, live, _, _ = self._open(manifest)
+        return {row_id for row_id, alive in zip(ids, live) if alive} == chunk_ids
+
+    def load(self, chunks: List[Dict[str, Any]], vectors: Optional[np.ndarray] = None, model: Optional[str] = None) -> bool:
+        """
+        With `vectors`, rewrite the shard from them. Without, map the
+        on-disk shard if it holds exactly these chunks embedded by `model`
+        at this dim; returns False when it doesn't.
+        """
+        chunks_by_id = {chunk["id"]: chunk for chunk in chunks}
+        with self._locked():
+            if vectors is None:
+                manifest = self._read_manifest()
+                if not self._is_current(manifest, set(chunks_by_id), model):
+                    return False
+            else:
+                base = self._write_segment(
+                    list(chunks_by_id),
+                    [chunk["document_id"] for chunk in chunks_by_id.values()],
+                    np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+                )
+                manifest = self._manifest(base, model)
+                self._write_manifest(manifest)
+            self._map(manifest, chunks_by_id)
+        return True
+
+    def add(self, chunks: List[Dict[str, Any]], vectors: np.ndarray):
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        with self._locked():
+            manifest = self._read_manifest() or self._manifest(None, None)
+            ids, _, _, _, _ = self._open(manifest)
+            new_ids = [chunk["id"] for chunk in chunks]
+            replaced = set(new_ids)
+            deleted = set(manifest["deleted"]) | {row for row, row_id in enumerate(ids) if row_id in replaced}
+
+            delta_ids, delta_docs, delta_vectors = self._open_segment(manifest.get("delta"))
+            new_docs = [chunk["document_id"] for chunk in chunks]
+            manifest = self._manifest(
+                manifest["base"],
+                manifest.get("model"),
+                delta=self._write_segment(
+                    np.concatenate([delta_ids, np.asarray(new_ids, dtype="S")]),
+                    np.concatenate([delta_docs, np.asarray(new_docs, dtype="S")]),
+                    np.vstack([delta_vectors, vectors])
+                ),
+                deleted=deleted
+            )
+            if len(delta_ids) + len(new_ids) > self.delta_max_rows or len(deleted) > self.delta_max_rows:
+                manifest = self._compact(manifest)
+            self._write_manifest(manifest)
+            self._map(manifest, {**self._live_chunks_by_id(), **{chunk["id"]: chunk for chunk in chunks}})
+
+    def remove_document(self, document_id: str) -> int:
+        with self._locked():
+            manifest = self._read_manifest()
+            if manifest is None:
+                return 0
+            # Row numbers come from the manifest just read; another worker
+            # may have compacted since this one last mapped the shard
+            _, document_ids, live, _, _ = self._open(manifest)
+            removed = {row for row, owner in enumerate(document_ids) if live[row] and owner == document_id}
+            if not removed:
+                return 0
+            manifest["deleted"] = sorted(set(manifest["deleted"]) | removed)
+            if len(manifest["deleted"]) > self.delta_max_rows:
+                manifest = self._compact(manifest)
+            self._write_manifest(manifest)
+            chunks_by_id = {
+                chunk_id: chunk for chunk_id, chunk in self._live_chunks_by_id().items()
+                if chunk["document_id"] != document_id
+            }
+            self._map(manifest, chunks_by_id)
+        return len(removed)
+
+    def _vector_rows(self, data):
+        rows, base_vectors, delta_vectors, _ = data
+        # Dead rows are already None; only the requested rows are gathered, so the segments stay mapped
+        return rows, _Segments(base_vectors, delta_vectors)
+
+    def search_batch(self, query_vectors: np.ndarray, k: int) -> List[List[Tuple[Dict[str, Any], float]]]:
+        rows, base_vectors, delta_vectors, live = self._data
+        query_vectors = np.atleast_2d(query_vectors)
+        if not live.any():
+            return [[] for _ in range(len(query_vectors))]
+
+        scores = np.hstack([query_vectors @ base_vectors.T, query_vectors @ delta_vectors.T])
+        scores[:, ~live] = -np.inf
+        top = top_k_indices(scores, min(k, int(live.sum())))
+        return [
+            [(rows[i], float(row_scores[i])) for i in row]
+            for row, row_scores in zip(top, scores)
+        ]
+
+class _Segments:
+    """Row lookups across the base and delta segments without concatenating them"""
+
+    def __init__(self, base: np.ndarray, delta: np.ndarray):
+        self.base = base
+        self.delta = delta
+
+    def __getitem__(self, rows: List[int]) -> np.ndarray:
+        rows = np.asarray(rows, dtype=np.int64)
+        in_base = rows < len(self.base)
+        out = np.empty((len(rows), self.base.shape[1]), dtype=np.float32)
+        out[in_base] = self.base[rows[in_base]]
+        out[~in_base] = self.delta[rows[~in_base] - len(self.base)]
+        return out
+
+class MmapVectorStore(InMemoryVectorStore):
+    """Per-company sharded indexes on local disk, shared by every worker on the host"""
+
+    def __init__(self, dim: int = settings.vector_dim, directory: str = settings.vector_shard_dir):
+        super().__init__(dim)
+        self.directory = directory
+
+    def _index(self, company_id: str) -> ShardedCompanyIndex:
+        return ShardedCompanyIndex(self.dim, os.path.join(self.directory, company_id))
+
+    def attach(self, company_id: str, chunks: List[Dict[str, Any]], model: Optional[str] = None) -> bool:
+        """Map an existing shard holding exactly these chunks embedded by `model`, without re-embedding"""
+        index = self._index(company_id)
+        if not index.load(chunks, model=model):
+            return False
+        with self._lock:
+            self._indexes[company_id] = index
+        return True
+
+    def replace(self, company_id: str, chunks: List[Dict[str, Any]], vectors: np.ndarray, model: Optional[str] = None):
+        index = self._index(company_id)
+        index.load(chunks, vectors, model)
+        with self._lock:
+            self._indexes[company_id] = index
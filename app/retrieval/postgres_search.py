@@ -0,0 +1,53 @@
+from typing import List, Dict, Any, Tuple
+from ..config.database import get_supabase_client
+
+class PostgresLexicalStore:
+    """
+    Lexical retrieval delegated to the `search_chunks` SQL function.
+
+    The tsvector column is maintained by Postgres (see migration 11), so
+    writes are no-ops here and ranking/top-k happen in the database.
+    """
+
+    persistent = True
+
+    def __init__(self):
+        self._client = None
+
+    @property
+    def client(self):
+        if not self._client:
+            self._client = get_supabase_client(use_service_role=True)
+        return self._client
+
+    def count(self, company_id: str) -> int:
+        response = self.client.table('document_chunks')\
+            .select("id", count="exact", head=True)\
+            .eq('company_id', company_id)\
+            .execute()
+        return response.count or 0
+
+    def replace(self, company_id: str, chunks: List[Dict[str, Any]]):
+        pass
+
+    def add(self, company_id: str, chunks: List[Dict[str, Any]]):
+        pass
+
+    def remove_document(self, company_id: str, document_id: str):
+        pass
+
+    def drop(self, company_id: str):
+        pass
+
+    def search(self, company_id: str, query: str, k: int) -> List[Tuple[Dict[str, Any], float]]:
+        response = self.client.rpc('search_chunks', {
+            "p_company_id": company_id,
+            "p_query": query,
+            "p_k": k
+        }).execute()
+
+        results = []
+        for row in response.data or []:
+            score = row.pop("score", 0.0)
+            results.append((row, float(score or 0.0)))
+        return results
@@ -0,0 +1,152 @@
+from typing import List, Dict, Any, Tuple, Optional
+import numpy as np
+from qdrant_client import QdrantClient, models
+from ..config import settings
+
+class QdrantVectorStore:
+    """
+    Chunk vectors stored in a Qdrant collection, one point per chunk.
+
+    Tenants share `settings.collection_name` and are separated by a
+    `company_id` payload filter. Without `qdrant_url` the client runs in
+    local mode (on disk at `qdrant_path`, or in memory), which is enough
+    for tests and single-node installs.
+    """
+
+    # Points outlive the process, so writes must not depend on a loaded index
+    persistent = True
+
+    def __init__(
+        self,
+        collection_name: str = settings.collection_name,
+        dim: int = settings.vector_dim,
+        url: Optional[str] = settings.qdrant_url,
+        path: Optional[str] = settings.qdrant_path,
+        api_key: Optional[str] = settings.qdrant_api_key
+    ):
+        self.collection_name = collection_name
+        self.dim = dim
+        self.is_local = not url
+        if url:
+            self.client = QdrantClient(url=url, api_key=api_key)
+        elif path:
+            self.client = QdrantClient(path=path)
+        else:
+            self.client = QdrantClient(location=":memory:")
+        self._ensure_collection()
+
+    def _ensure_collection(self):
+        if self.client.collection_exists(self.collection_name):
+            return
+        self.client.create_collection(
+            collection_name=self.collection_name,
+            vectors_config=models.VectorParams(size=self.dim, distance=models.Distance.COSINE),
+            hnsw_config=models.HnswConfigDiff(m=settings.qdrant_hnsw_m, ef_construct=settings.qdrant_hnsw_ef_construct)
+        )
+        # Payload indexes only exist on the server; local mode always brute-forces
+        if not self.is_local:
+            self.client.create_payload_index(
+                collection_name=self.collection_name,
+                field_name="company_id",
+                field_schema=models.KeywordIndexParams(type="keyword", is_tenant=True)
+            )
+
+    @staticmethod
+    def _company_filter(company_id: str, document_id: Optional[str] = None) -> models.Filter:
+        conditions = [models.FieldCondition(key="company_id", match=models.MatchValue(value=company_id))]
+        if document_id is not None:
+            conditions.append(models.FieldCondition(key="document_id", match=models.MatchValue(value=document_id)))
+        return models.Filter(must=conditions)
+
+    def _search_params(self) -> Optional[models.SearchParams]:
+        return None if self.is_local else models.SearchParams(hnsw_ef=settings.qdrant_hnsw_ef)
+
+    @staticmethod
+    def _to_chunk(point) -> Dict[str, Any]:
+        payload = dict(point.payload or {})
+        payload.pop("company_id", None)
+        return {"id": str(point.id), **payload}
+
+    def is_loaded(self, company_id: str) -> bool:
+        return self.count(company_id) > 0
+
+    def count(self, company_id: str) -> int:
+        return self.client.count(
+            collection_name=self.collection_name,
+            count_filter=self._company_filter(company_id),
+            exact=True
+        ).count
+
+    def add(self, company_id: str, chunks: List[Dict[str, Any]], vectors: np.ndarray):
+        points = [
+            models.PointStruct(
+                id=chunk["id"],
+                vector=np.asarray(vector, dtype=np.float32).tolist(),
+                payload={
+                    "company_id": company_id,
+                    "document_id": chunk["document_id"],
+                    "chunk_index": chunk.get("chunk_index"),
+                    "content": chunk["content"],
+                    "metadata": chunk.get("metadata") or {}
+                }
+            )
+            for chunk, vector in zip(chunks, vectors)
+        ]
+        for i in range(0, len(points), 256):
+            self.client.upsert(collection_name=self.collection_name, points=points[i:i + 256])
+
+    def replace(self, company_id: str, chunks: List[Dict[str, Any]], vectors: np.ndarray, model: Optional[str] = None):
+        self.drop(company_id)
+        self.add(company_id, chunks, vectors)
+
+    def remove_document(self, company_id: str, document_id: str):
+        self.client.delete(
+            collection_name=self.collection_name,
+            points_selector=models.FilterSelector(filter=self._company_filter(company_id, document_id))
+        )
+
+    def drop(self, company_id: str):
+        self.client.delete(
+            collection_name=self.collection_name,
+            points_selector=models.FilterSelector(filter=self._company_filter(company_id))
+        )
+
+    def vectors_for(self, company_id: str, chunk_ids: List[str]) -> Dict[str, np.ndarray]:
+        if not chunk_ids:
+            return {}
+        points = self.client.retrieve(
+            collection_name=self.collection_name,
+            ids=list(chunk_ids),
+            with_payload=["company_id"],
+            with_vectors=True
+        )
+        return {
+            str(point.id): np.asarray(point.vector, dtype=np.float32)
+            for point in points
+            if (point.payload or {}).get("company_id") == company_id and point.vector is not None
+        }
+
+    def search(self, company_id: str, query_vector: np.ndarray, k: int) -> List[Tuple[Dict[str, Any], float]]:
+        response = self.client.query_points(
+            collection_name=self.collection_name,
+            query=np.asarray(query_vector, dtype=np.float32).tolist(),
+            query_filter=self._company_filter(company_id),
+            limit=k,
+            with_payload=True,
+            search_params=self._search_params()
+        )
+        return [(self._to_chunk(point), point.score) for point in response.points]
+
+    def search_batch(self, company_id: str, query_vectors: np.ndarray, k: int) -> List[List[Tuple[Dict[str, Any], float]]]:
+        requests = [
+            models.QueryRequest(
+                query=np.asarray(vector, dtype=np.float32).tolist(),
+                filter=self._company_filter(company_id),
+                limit=k,
+                with_payload=True,
+                params=self._search_params()
+            )
+            for vector in query_vectors
+        ]
+        responses = self.client.query_batch_points(collection_name=self.collection_name, requests=requests)
+        return [[(self._to_chunk(point), point.score) for point in response.points] for response in responses]
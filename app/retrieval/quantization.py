@@ -0,0 +1,209 @@
+from typing import List, Dict, Any, Tuple, Optional
+import os
+import uuid
+import tempfile
+import weakref
+import numpy as np
+from ..config import settings
+from .vector_index import CompanyVectorIndex, top_k_indices
+
+SCORE_BLOCK = 2048
+# Removed rows are only tombstoned until they outnumber live ones (and this many)
+COMPACT_MIN_DEAD = 1024
+
+def _unlink(path: str):
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+class VectorFile:
+    """
+    Append-only file of float32 rows on disk, read back memory-mapped so
+    rows are paged in only when read. Appending costs the new rows, not the
+    whole file. The file is removed once this object is garbage collected;
+    maps already handed out stay readable.
+    """
+
+    def __init__(self, dim: int, directory: Optional[str] = None):
+        directory = directory or settings.vector_disk_dir or tempfile.gettempdir()
+        os.makedirs(directory, exist_ok=True)
+        self.dim = dim
+        self.rows = 0
+        self.path = os.path.join(directory, f"vectors-{uuid.uuid4().hex}.f32")
+        open(self.path, "wb").close()
+        weakref.finalize(self, _unlink, self.path)
+
+    def append(self, vectors: np.ndarray) -> np.ndarray:
+        """Write `vectors` after the existing rows; returns a read-only map of every row"""
+        with open(self.path, "ab") as handle:
+            handle.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+        self.rows += len(vectors)
+        if not self.rows:
+            return np.empty((0, self.dim), dtype=np.float32)
+        return np.memmap(self.path, dtype=np.float32, mode="r", shape=(self.rows, self.dim))
+
+class Int8Quantizer:
+    """Symmetric per-dimension scalar quantization to int8"""
+
+    def __init__(self, scale: np.ndarray):
+        self.scale = np.maximum(scale, 1e-6).astype(np.float32)
+
+    @classmethod
+    def fit(cls, vectors: np.ndarray) -> "Int8Quantizer":
+        return cls(np.abs(vectors).max(axis=0) if len(vectors) else np.ones(vectors.shape[1]))
+
+    def covers(self, vectors: np.ndarray) -> bool:
+        """True when `vectors` fit the fitted range, i.e. encoding them won't clip"""
+        return not len(vectors) or bool((np.abs(vectors).max(axis=0) <= self.scale).all())
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        return np.clip(np.rint(vectors / self.scale * 127), -127, 127).astype(np.int8)
+
+    def score(self, codes: np.ndarray, query_vectors: np.ndarray) -> np.ndarray:
+        """Approximate inner products, decoding one block of rows at a time"""
+        weights = (query_vectors * (self.scale / 127)).T.astype(np.float32)
+        scores = np.empty((len(query_vectors), len(codes)), dtype=np.float32)
+        for start in range(0, len(codes), SCORE_BLOCK):
+            block = codes[start:start + SCORE_BLOCK].astype(np.float32)
+            scores[:, start:start + SCORE_BLOCK] = (block @ weights).T
+        return scores
+
+class BinaryQuantizer:
+    """Sign-bit codes compared by Hamming distance"""
+
+    @classmethod
+    def fit(cls, vectors: np.ndarray) -> "BinaryQuantizer":
+        return cls()
+
+    def covers(self, vectors: np.ndarray) -> bool:
+        return True
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        return np.packbits(vectors > 0, axis=1)
+
+    def score(self, codes: np.ndarray, query_vectors: np.ndarray) -> np.ndarray:
+        """Negated Hamming distance, so higher still means closer"""
+        query_codes = self.encode(query_vectors)
+        return np.stack([
+            -np.bitwise_count(np.bitwise_xor(codes, query_code)).sum(axis=1, dtype=np.int32)
+            for query_code in query_codes
+        ]).astype(np.float32)
+
+QUANTIZERS = {"int8": Int8Quantizer, "binary": BinaryQuantizer}
+
+class QuantizedVectorIndex(CompanyVectorIndex):
+    """
+    Keeps only compact codes in memory (int8: 1 byte/dim, binary: 1 bit/dim)
+    and the float32 vectors memory-mapped on disk. Queries shortlist
+    `rescore_factor * k` rows by their codes, then rescore the shortlist
+    exactly against the float vectors.
+
+    Adds append to the vector file and removals only tombstone rows, so an
+    update costs the rows it touches; the file is rewritten once dead rows
+    outnumber live ones. The quantizer is refit on every rewrite and as
+    soon as new vectors fall outside its range, so codes never clip.
+    """
+
+    def __init__(
+        self,
+        dim: int,
+        mode: str = settings.vector_quantization,
+        rescore_factor: int = settings.quantization_rescore_factor,
+        directory: Optional[str] = None
+    ):
+        super().__init__(dim)
+        if mode not in QUANTIZERS:
+            raise ValueError(f"Unknown quantization mode: {mode}")
+        self.mode = mode
+        self.rescore_factor = rescore_factor
+        self.directory = directory
+        self.quantizer = None
+        self._file: Optional[VectorFile] = None
+        # (chunk per row or None once removed, on-disk float vectors, codes, live row mask)
+        self._data = ([], np.empty((0, dim), dtype=np.float32), np.empty((0, 0), dtype=np.uint8), np.zeros(0, dtype=bool))
+
+    @property
+    def chunks(self) -> List[Dict[str, Any]]:
+        return [row for row in self._data[0] if row is not None]
+
+    def __len__(self) -> int:
+        return int(self._data[3].sum())
+
+    @property
+    def codes(self) -> np.ndarray:
+        return self._data[2]
+
+    def _rewrite(self, rows: List[Dict[str, Any]], vectors: np.ndarray):
+        """Start a new vector file holding just `rows` and refit the quantizer on them"""
+        self._file = VectorFile(self.dim, self.directory)
+        mapped = self._file.append(vectors)
+        self.quantizer = QUANTIZERS[self.mode].fit(vectors)
+        self._data = (list(rows), mapped, self.quantizer.encode(vectors), np.ones(len(rows), dtype=bool))
+
+    def _publish(self, rows: List[Optional[Dict[str, Any]]], vectors: np.ndarray, codes: np.ndarray, live: np.ndarray):
+        dead = len(live) - int(live.sum())
+        if dead > max(int(live.sum()), COMPACT_MIN_DEAD):
+            keep = np.flatnonzero(live)
+            self._rewrite([rows[i] for i in keep], np.asarray(vectors[keep]))
+        else:
+            self._data = (rows, vectors, codes, live)
+
+    def add(self, chunks: List[Dict[str, Any]], vectors: np.ndarray):
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        if self._file is None:
+            self._rewrite(chunks, vectors)
+            return
+
+        rows, _, codes, live = self._data
+        row_of = self._row_of(rows)
+        replaced = [row_of[chunk["id"]] for chunk in chunks if chunk["id"] in row_of]
+        rows = list(rows)
+        for row in replaced:
+            rows[row] = None
+        live = np.concatenate([live, np.ones(len(chunks), dtype=bool)])
+        live[replaced] = False
+        rows += list(chunks)
+
+        mapped = self._file.append(vectors)
+        if self.quantizer.covers(vectors):
+            codes = np.vstack([codes, self.quantizer.encode(vectors)])
+        else:
+            # Refit on every live row so neither old nor new codes clip
+            self.quantizer = QUANTIZERS[self.mode].fit(np.asarray(mapped[live]))
+            codes = self.quantizer.encode(np.asarray(mapped))
+        self._publish(rows, mapped, codes, live)
+
+    def remove_document(self, document_id: str) -> int:
+        rows, vectors, codes, live = self._data
+        removed = [i for i, row in enumerate(rows) if row is not None and row["document_id"] == document_id]
+        if removed:
+            rows = list(rows)
+            for i in removed:
+                rows[i] = None
+            live = live.copy()
+            live[removed] = False
+            self._publish(rows, vectors, codes, live)
+        return len(removed)
+
+    def memory_bytes(self) -> int:
+        """Resident bytes for vector data (codes only; floats live on disk)"""
+        return int(self.codes.nbytes)
+
+    def search_batch(self, query_vectors: np.ndarray, k: int) -> List[List[Tuple[Dict[str, Any], float]]]:
+        rows, vectors, codes, live = self._data
+        query_vectors = np.atleast_2d(query_vectors)
+        if not live.any():
+            return [[] for _ in range(len(query_vectors))]
+
+        scores = self.quantizer.score(codes, query_vectors)
+        scores[:, ~live] = -np.inf
+        shortlist = top_k_indices(scores, min(k * self.rescore_factor, int(live.sum())))
+        results = []
+        for query_vector, candidates in zip(query_vectors, shortlist):
+            # Sorted row order keeps the memory-mapped reads sequential
+            candidates = np.sort(candidates)
+            exact = vectors[candidates] @ query_vector
+            top = top_k_indices(exact, k)
+            results.append([(rows[candidates[i]], float(exact[i])) for i in top])
+        return results
@@ -0,0 +1,156 @@
+from typing import Dict, List, Optional, Tuple
+from collections import OrderedDict
+import os
+import queue
+import sqlite3
+import threading
+import numpy as np
+from ..config import settings
+from ..core.metrics import metrics
+from .text import normalize_query
+
+class QueryEmbeddingCache:
+    """
+    Process-wide LRU of query embeddings keyed by (model name, normalized
+    query), with an optional SQLite tier on disk that survives restarts.
+
+    Cached vectors are read-only so callers can't corrupt shared entries.
+    New vectors reach disk through a background writer thread, one commit
+    per batch of queued rows, and the table is trimmed to `disk_max_rows`
+    by dropping the rows written longest ago.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        disk_path: Optional[str] = None,
+        disk_max_rows: int = settings.query_embedding_cache_disk_max_rows
+    ):
+        self.max_entries = max_entries
+        self.disk_max_rows = disk_max_rows
+        self._entries: "OrderedDict[Tuple[str, str], np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        # The SQLite connection is shared by request threads and the writer
+        self._db_lock = threading.Lock()
+        self._pending: "queue.Queue[Tuple[str, str, bytes]]" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._db = None
+        if disk_path:
+            directory = os.path.dirname(disk_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(disk_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS query_embeddings "
+                "(model TEXT, query TEXT, vector BLOB, PRIMARY KEY (model, query))"
+            )
+            self._db.commit()
+
+        self.hits = metrics.counter("query_embedding_cache.hits")
+        self.disk_hits = metrics.counter("query_embedding_cache.disk_hits")
+        self.misses = metrics.counter("query_embedding_cache.misses")
+        self.disk_errors = metrics.counter("query_embedding_cache.disk_errors")
+        metrics.gauge("query_embedding_cache.entries", lambda: len(self._entries))
+        metrics.gauge("query_embedding_cache.hit_rate", self.hit_rate)
+
+    def hit_rate(self) -> Optional[float]:
+        hits = self.hits.value + self.disk_hits.value
+        total = hits + self.misses.value
+        return round(hits / total, 4) if total else None
+
+    def _remember(self, key: Tuple[str, str], vector: np.ndarray):
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _read_disk(self, keys: List[Tuple[str, str]]) -> Dict[Tuple[str, str], np.ndarray]:
+        found = {}
+        with self._db_lock:
+            for key in keys:
+                row = self._db.execute(
+                    "SELECT vector FROM query_embeddings WHERE model = ? AND query = ?", key
+                ).fetchone()
+                if row is not None:
+                    found[key] = np.frombuffer(row[0], dtype=np.float32)
+        return found
+
+    def get_many(self, model: str, queries: List[str]) -> Dict[str, np.ndarray]:
+        """Cached vectors for whichever of the queries have one, keyed by query"""
+        found: Dict[str, np.ndarray] = {}
+        missing: Dict[Tuple[str, str], List[str]] = {}
+        with self._lock:
+            for query in queries:
+                key = (model, normalize_query(query))
+                vector = self._entries.get(key)
+                if vector is None:
+                    missing.setdefault(key, []).append(query)
+                    continue
+                self._entries.move_to_end(key)
+                self.hits.inc()
+                found[query] = vector
+
+        # Disk lookups run outside the memory lock so they don't stall other queries
+        on_disk = self._read_disk(list(missing)) if self._db is not None and missing else {}
+        with self._lock:
+            for key, key_queries in missing.items():
+                vector = on_disk.get(key)
+                if vector is None:
+                    self.misses.inc(len(key_queries))
+                    continue
+                self._remember(key, vector)
+                self.disk_hits.inc(len(key_queries))
+                for query in key_queries:
+                    found[query] = vector
+        return found
+
+    def put_many(self, model: str, queries: List[str], vectors: np.ndarray):
+        rows = []
+        with self._lock:
+            for query, vector in zip(queries, vectors):
+                key = (model, normalize_query(query))
+                vector = np.array(vector, dtype=np.float32)
+                vector.flags.writeable = False
+                self._remember(key, vector)
+                rows.append((*key, vector.tobytes()))
+            if self._db is None or not rows:
+                return
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="query-embedding-cache", daemon=True)
+                self._writer.start()
+        for row in rows:
+            self._pending.put(row)
+
+    def _write_loop(self):
+        while True:
+            rows = [self._pending.get()]
+            # Whatever queued up meanwhile goes out in the same commit
+            while True:
+                try:
+                    rows.append(self._pending.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write(rows)
+            except Exception as e:
+                print(f"Error writing query embeddings: {str(e)}")
+                self.disk_errors.inc()
+            finally:
+                for _ in rows:
+                    self._pending.task_done()
+
+    def _write(self, rows: List[Tuple[str, str, bytes]]):
+        with self._db_lock:
+            self._db.executemany("INSERT OR REPLACE INTO query_embeddings VALUES (?, ?, ?)", rows)
+            # Replaced rows get a new rowid, so the lowest rowids are the oldest writes
+            self._db.execute(
+                "DELETE FROM query_embeddings WHERE rowid IN ("
+                "SELECT rowid FROM query_embeddings ORDER BY rowid "
+                "LIMIT max(0, (SELECT COUNT(*) FROM query_embeddings) - ?))",
+                (self.disk_max_rows,)
+            )
+            self._db.commit()
+
+    def flush(self):
+        """Block until every queued vector is on disk"""
+        self._pending.join()
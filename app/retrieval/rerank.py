@@ -0,0 +1,89 @@
+from typing import List, Dict, Any, Optional
+import numpy as np
+from ..config import settings
+from .embeddings import embedder, Embedder
+from .text import tokenize
+
+def mmr_select(candidates: np.ndarray, relevance: np.ndarray, k: int, lambda_: float) -> List[int]:
+    """
+    Pick k candidate indices by maximal marginal relevance.
+
+    Each step takes the candidate maximising
+    lambda * relevance - (1 - lambda) * max similarity to those already picked.
+    Similarities are kept in one array and updated with a single
+    matrix-vector product per pick.
+    """
+    n = len(candidates)
+    k = min(k, n)
+    if k <= 0:
+        return []
+
+    pairwise = candidates @ candidates.T
+    redundancy = np.full(n, -np.inf, dtype=np.float32)
+    available = np.ones(n, dtype=bool)
+    selected: List[int] = []
+    for _ in range(k):
+        penalty = np.where(np.isfinite(redundancy), redundancy, 0.0)
+        scores = lambda_ * relevance - (1.0 - lambda_) * penalty
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        redundancy = np.maximum(redundancy, pairwise[best])
+    return selected
+
+class Reranker:
+    """
+    Second-stage scorer over a small candidate list.
+
+    Relevance blends embedding similarity with the share of query terms
+    the chunk contains, then MMR trims the list so near-duplicate
+    paragraphs don't crowd out other evidence. Chunk vectors come from the
+    vector store when the caller passes them; only missing ones are encoded.
+    """
+
+    def __init__(self, embedder: Embedder = embedder, mmr_lambda: float = settings.mmr_lambda):
+        self.embedder = embedder
+        self.mmr_lambda = mmr_lambda
+
+    @staticmethod
+    def term_coverage(query_terms: set, content: str) -> float:
+        if not query_terms:
+            return 0.0
+        return len(query_terms & set(tokenize(content))) / len(query_terms)
+
+    def _candidate_vectors(self, chunks: List[Dict[str, Any]], stored: Dict[str, np.ndarray], dim: int) -> np.ndarray:
+        candidates = np.empty((len(chunks), dim), dtype=np.float32)
+        missing = []
+        for i, chunk in enumerate(chunks):
+            vector = stored.get(chunk["id"])
+            if vector is None:
+                missing.append(i)
+            else:
+                candidates[i] = vector
+        if missing:
+            candidates[missing] = self.embedder.encode([chunks[i]["content"] for i in missing])
+        return candidates
+
+    def rerank(
+        self,
+        query: str,
+        chunks: List[Dict[str, Any]],
+        k: int,
+        vectors: Optional[Dict[str, np.ndarray]] = None
+    ) -> List[Dict[str, Any]]:
+        """Re-score and diversify `chunks`; `vectors` maps chunk ids to their stored embeddings"""
+        if len(chunks) <= 1:
+            return chunks[:k]
+
+        query_vector = self.embedder.encode_query(query)
+        candidates = self._candidate_vectors(chunks, vectors or {}, len(query_vector))
+        query_terms = set(tokenize(query))
+        coverage = np.array([self.term_coverage(query_terms, chunk["content"]) for chunk in chunks], dtype=np.float32)
+        relevance = 0.5 * (candidates @ query_vector) + 0.5 * coverage
+
+        selected = mmr_select(candidates, relevance, k, self.mmr_lambda)
+        return [{**chunks[i], "rerank_score": round(float(relevance[i]), 4)} for i in selected]
+
+# Singleton instance
+reranker = Reranker()
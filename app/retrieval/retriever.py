@@ -0,0 +1,367 @@
+from typing import List, Dict, Any, Optional, Tuple
+import asyncio
+import threading
+import time
+import numpy as np
+from ..config import settings
+from ..config.database import get_supabase_client
+from .embeddings import embedder, Embedder
+from .vector_index import InMemoryVectorStore
+from .bm25_index import BM25Store
+from .fusion import reciprocal_rank_fusion
+from .corpus_cache import CorpusCache
+from .rerank import reranker, Reranker
+from ..utils.single_flight import SingleFlight
+
+CHUNK_FIELDS = "id, document_id, chunk_index, content, metadata, embedding_vector"
+
+def create_vector_store(dim: int = settings.vector_dim):
+    """Build the vector store selected by settings.vector_store_backend"""
+    if settings.vector_store_backend == "qdrant":
+        from .qdrant_store import QdrantVectorStore
+        return QdrantVectorStore(dim=dim)
+    if settings.vector_store_backend == "mmap":
+        from .mmap_store import MmapVectorStore
+        return MmapVectorStore(dim)
+    return InMemoryVectorStore(dim)
+
+def create_lexical_store():
+    """Build the lexical store selected by settings.lexical_backend"""
+    if settings.lexical_backend == "postgres":
+        from .postgres_search import PostgresLexicalStore
+        return PostgresLexicalStore()
+    return BM25Store()
+
+class ChunkRetriever:
+    """
+    Loads a company's chunks once, keeps their embeddings and a BM25
+    inverted index in memory and answers top-k queries against them.
+
+    Stores marked `persistent` (Qdrant, Postgres full-text search) hold
+    their own copy of the corpus; when every store is persistent the
+    corpus is never pulled into the process.
+    """
+
+    def __init__(
+        self,
+        embedder: Embedder = embedder,
+        vector_store=None,
+        lexical_store=None,
+        reranker: Reranker = reranker
+    ):
+        self.embedder = embedder
+        self.reranker = reranker
+        self.vector_store = vector_store or create_vector_store(embedder.dim)
+        self.lexical_store = lexical_store or create_lexical_store()
+        self._client = None
+        self.cache = CorpusCache(settings.chunk_cache_max_bytes, settings.retrieval_index_ttl)
+        # One reload per company at a time, shared by every request waiting on it
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._load_locks_guard = threading.Lock()
+        self._loads = SingleFlight("retrieval.corpus_load")
+
+    @property
+    def client(self):
+        if not self._client:
+            self._client = get_supabase_client(use_service_role=True)
+        return self._client
+
+    def _fetch_company_chunks(self, company_id: str) -> List[Dict[str, Any]]:
+        chunks_response = self.client.table('document_chunks')\
+            .select(CHUNK_FIELDS)\
+            .eq('company_id', company_id)\
+            .execute()
+
+        return chunks_response.data or []
+
+    def embed_chunks(self, chunks: List[Dict[str, Any]]) -> np.ndarray:
+        """Reuse stored embeddings from the current model and encode the rest"""
+        vectors = np.zeros((len(chunks), self.embedder.dim), dtype=np.float32)
+        missing = []
+        for i, chunk in enumerate(chunks):
+            metadata = chunk.get("metadata") or {}
+            stored = None
+            if metadata.get("embedding_model") == self.embedder.model_name:
+                stored = self.embedder.coerce(chunk.get("embedding_vector"))
+            if stored is None:
+                missing.append(i)
+            else:
+                vectors[i] = stored
+
+        if missing:
+            vectors[missing] = self.embedder.encode([chunks[i]["content"] for i in missing])
+        return vectors
+
+    @staticmethod
+    def _public_chunk(chunk: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: value for key, value in chunk.items() if key != "embedding_vector"}
+
+    @staticmethod
+    def _estimate_bytes(chunks: List[Dict[str, Any]], vectors: np.ndarray) -> int:
+        # Content is held by the chunk dicts and roughly again by BM25 postings
+        return int(vectors.nbytes) + 2 * sum(len(chunk["content"]) for chunk in chunks)
+
+    def corpus_version(self, company_id: str) -> int:
+        """Monotonic per-company version, bumped whenever its documents change"""
+        return self.cache.version(company_id)
+
+    def _drop_in_memory(self, company_id: str):
+        if not self.vector_store.persistent:
+            self.vector_store.drop(company_id)
+        if not self.lexical_store.persistent:
+            self.lexical_store.drop(company_id)
+
+    def load_company(self, company_id: str):
+        """(Re)build the in-memory index for a company from the database"""
+        chunks = self._fetch_company_chunks(company_id)
+        public_chunks = [self._public_chunk(c) for c in chunks]
+        # A store already holding the corpus (persistent, or shards on disk)
+        # doesn't need the vectors decoded or a full rewrite
+        if self.vector_store.persistent:
+            current = self.vector_store.count(company_id) == len(chunks)
+        else:
+            current = self.vector_store.attach(company_id, public_chunks, self.embedder.model_name)
+        vectors = np.empty((0, self.embedder.dim), dtype=np.float32)
+        if not current:
+            vectors = self.embed_chunks(chunks)
+            self.vector_store.replace(company_id, public_chunks, vectors, self.embedder.model_name)
+        if not self.lexical_store.persistent:
+            self.lexical_store.replace(company_id, public_chunks)
+
+        fingerprint = hash(frozenset(chunk["id"] for chunk in chunks))
+        evicted = self.cache.store(company_id, self._estimate_bytes(chunks, vectors), fingerprint)
+        for victim in evicted:
+            self._drop_in_memory(victim)
+
+    def _reload(self, company_id: str):
+        with self._load_locks_guard:
+            lock = self._load_locks.setdefault(company_id, threading.Lock())
+        with lock:
+            # Another thread may have finished the reload while this one waited
+            if not self.cache.peek(company_id):
+                self.load_company(company_id)
+
+    def ensure_loaded(self, company_id: str):
+        if self.vector_store.persistent and self.lexical_store.persistent:
+            return
+        # Entries expire after the TTL so chunks written by other workers become visible
+        if not self.cache.lookup(company_id):
+            self._reload(company_id)
+
+    async def ensure_loaded_async(self, company_id: str):
+        """
+        `ensure_loaded` for the event loop: a cold load (database fetch,
+        embedding, BM25 build) runs in a worker thread, and concurrent
+        requests for the same company await that one load
+        """
+        if self.vector_store.persistent and self.lexical_store.persistent:
+            return
+        if not self.cache.lookup(company_id):
+            await self._loads.do(company_id, lambda: asyncio.to_thread(self._reload, company_id))
+
+    def index_chunks(self, company_id: str, chunks: List[Dict[str, Any]], vectors: np.ndarray):
+        """Add freshly processed chunks to the company's indexes"""
+        public_chunks = [self._public_chunk(c) for c in chunks]
+        loaded = self.cache.is_current(company_id)
+        if loaded or self.vector_store.persistent:
+            self.vector_store.add(company_id, public_chunks, vectors)
+        if loaded or self.lexical_store.persistent:
+            self.lexical_store.add(company_id, public_chunks)
+
+        self.cache.bump(company_id)
+        if loaded:
+            self.cache.update(company_id, self._estimate_bytes(public_chunks, np.asarray(vectors)))
+
+    def remove_document(self, company_id: str, document_id: str):
+        loaded = self.cache.is_current(company_id)
+        self.vector_store.remove_document(company_id, document_id)
+        self.lexical_store.remove_document(company_id, document_id)
+
+        self.cache.bump(company_id)
+        if loaded:
+            # Size stays an overestimate until the next reload
+            self.cache.update(company_id)
+
+    def corpus_size(self, company_id: str) -> Optional[int]:
+        """Chunk count from an in-process store, or None if the corpus isn't held here"""
+        if not self.cache.is_current(company_id):
+            return None
+        if not self.lexical_store.persistent:
+            return self.lexical_store.count(company_id)
+        return self.vector_store.count(company_id)
+
+    def corpus_chunks(self, company_id: str) -> List[Dict[str, Any]]:
+        """Every chunk of the company, in document order"""
+        if not self.lexical_store.persistent and self.cache.is_current(company_id):
+            chunks = self.lexical_store.chunks(company_id)
+        else:
+            chunks = [self._public_chunk(c) for c in self._fetch_company_chunks(company_id)]
+        return sorted(chunks, key=lambda chunk: (chunk["document_id"], chunk.get("chunk_index") or 0))
+
+    def has_chunks(self, company_id: str) -> bool:
+        size = self.corpus_size(company_id)
+        if size is not None:
+            return size > 0
+        return self.lexical_store.count(company_id) > 0
+
+    @staticmethod
+    def _with_scores(results) -> List[Dict[str, Any]]:
+        return [
+            {**chunk, "score": score}
+            for chunk, score in results
+            if score > 0
+        ]
+
+    def search_vector(self, company_id: str, query: str, k: int) -> List[Dict[str, Any]]:
+        """Return the k chunks most similar to the query, best first"""
+        if not self.vector_store.persistent:
+            self.ensure_loaded(company_id)
+        query_vector = self.embedder.encode_query(query)
+        return self._with_scores(self.vector_store.search(company_id, query_vector, k))
+
+    def search_lexical(self, company_id: str, query: str, k: int) -> List[Dict[str, Any]]:
+        """Return the k chunks with the highest lexical score, best first"""
+        if not self.lexical_store.persistent:
+            self.ensure_loaded(company_id)
+        return self._with_scores(self.lexical_store.search(company_id, query, k))
+
+    def search(self, company_id: str, query: str, k: int, mode: Optional[str] = None) -> List[Dict[str, Any]]:
+        mode = mode or settings.retrieval_mode
+        if mode == "vector":
+            return self.search_vector(company_id, query, k)
+        if mode == "lexical":
+            return self.search_lexical(company_id, query, k)
+        raise ValueError(f"Unknown retrieval mode: {mode}")
+
+    def _rerank(self, company_id: str, query: str, chunks: List[Dict[str, Any]], k: int) -> List[Dict[str, Any]]:
+        # Reuse the stored chunk embeddings instead of re-encoding every candidate
+        vectors = self.vector_store.vectors_for(company_id, [chunk["id"] for chunk in chunks])
+        return self.reranker.rerank(query, chunks, k, vectors)
+
+    async def _timed(self, search, company_id: str, query: str, k: int) -> Tuple[List[Dict[str, Any]], float]:
+        start = time.perf_counter()
+        results = await asyncio.to_thread(search, company_id, query, k)
+        return results, (time.perf_counter() - start) * 1000
+
+    async def retrieve(
+        self,
+        company_id: str,
+        query: str,
+        k: int,
+        mode: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Run the requested retrieval mode and report per-leg latency.
+
+        Hybrid mode runs both legs concurrently with a deeper candidate
+        list and merges them with reciprocal rank fusion. With re-ranking
+        enabled a deeper list is retrieved and trimmed back to k by MMR.
+        """
+        mode = mode or settings.retrieval_mode
+        final_k = k
+        if settings.rerank_enabled:
+            k = max(k, settings.rerank_candidates)
+        if mode == "hybrid":
+            # Load once up front instead of racing from both legs
+            await self.ensure_loaded_async(company_id)
+
+        if mode == "hybrid":
+            depth = max(k, settings.hybrid_candidates)
+            (lexical, lexical_ms), (vector, vector_ms) = await asyncio.gather(
+                self._timed(self.search_lexical, company_id, query, depth),
+                self._timed(self.search_vector, company_id, query, depth)
+            )
+            chunks = reciprocal_rank_fusion([lexical, vector], k, settings.rrf_k)
+            latency = {"lexical_ms": round(lexical_ms, 2), "vector_ms": round(vector_ms, 2)}
+        elif mode in ("lexical", "vector"):
+            search = self.search_lexical if mode == "lexical" else self.search_vector
+            chunks, elapsed_ms = await self._timed(search, company_id, query, k)
+            latency = {f"{mode}_ms": round(elapsed_ms, 2)}
+        else:
+            raise ValueError(f"Unknown retrieval mode: {mode}")
+
+        if settings.rerank_enabled:
+            start = time.perf_counter()
+            chunks = await asyncio.to_thread(self._rerank, company_id, query, chunks, final_k)
+            latency["rerank_ms"] = round((time.perf_counter() - start) * 1000, 2)
+
+        return chunks, {"mode": mode, **latency}
+
+    def _search_vector_batch(self, company_id: str, queries: List[str], depths: List[int]) -> List[List[Dict[str, Any]]]:
+        if not queries:
+            return []
+        if not self.vector_store.persistent:
+            self.ensure_loaded(company_id)
+        # One encoder call and one matrix product for the whole batch
+        query_vectors = self.embedder.encode_queries(queries)
+        results = self.vector_store.search_batch(company_id, query_vectors, max(depths))
+        return [self._with_scores(row[:depth]) for row, depth in zip(results, depths)]
+
+    def _search_lexical_batch(self, company_id: str, queries: List[str], depths: List[int]) -> List[List[Dict[str, Any]]]:
+        return [self.search_lexical(company_id, query, depth) for query, depth in zip(queries, depths)]
+
+    async def retrieve_batch(
+        self,
+        company_id: str,
+        queries: List[str],
+        ks: List[int],
+        modes: List[str]
+    ) -> Tuple[List[List[Dict[str, Any]]], Dict[str, Any]]:
+        """
+        Retrieve for many queries at once.
+
+        Vector legs of every query are scored together; lexical legs run
+        concurrently with them. Hybrid queries are fused per query.
+        """
+        await self.ensure_loaded_async(company_id)
+
+        final_ks = ks
+        if settings.rerank_enabled:
+            ks = [max(k, settings.rerank_candidates) for k in ks]
+        depths = [max(k, settings.hybrid_candidates) if mode == "hybrid" else k for k, mode in zip(ks, modes)]
+        vector_idx = [i for i, mode in enumerate(modes) if mode in ("vector", "hybrid")]
+        lexical_idx = [i for i, mode in enumerate(modes) if mode in ("lexical", "hybrid")]
+
+        async def timed(search, idx):
+            start = time.perf_counter()
+            results = await asyncio.to_thread(
+                search,
+                company_id,
+                [queries[i] for i in idx],
+                [depths[i] for i in idx]
+            )
+            return dict(zip(idx, results)), (time.perf_counter() - start) * 1000
+
+        (vector, vector_ms), (lexical, lexical_ms) = await asyncio.gather(
+            timed(self._search_vector_batch, vector_idx),
+            timed(self._search_lexical_batch, lexical_idx)
+        )
+
+        results = []
+        for i, mode in enumerate(modes):
+            if mode == "hybrid":
+                results.append(reciprocal_rank_fusion([lexical[i], vector[i]], ks[i], settings.rrf_k))
+            elif mode == "vector":
+                results.append(vector[i])
+            elif mode == "lexical":
+                results.append(lexical[i])
+            else:
+                raise ValueError(f"Unknown retrieval mode: {mode}")
+
+        info = {
+            "vector_queries": len(vector_idx),
+            "lexical_queries": len(lexical_idx),
+            "vector_ms": round(vector_ms, 2),
+            "lexical_ms": round(lexical_ms, 2)
+        }
+        if settings.rerank_enabled:
+            start = time.perf_counter()
+            results = await asyncio.to_thread(lambda: [
+                self._rerank(company_id, query, chunks, k)
+                for query, chunks, k in zip(queries, results, final_ks)
+            ])
+            info["rerank_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        return results, info
+
+# Singleton instance
+retriever = ChunkRetriever()
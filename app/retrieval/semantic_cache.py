@@ -0,0 +1,98 @@
+from typing import Dict, Any, Optional, List, Tuple
+import copy
+import threading
+import time
+import numpy as np
+from ..config import settings
+from ..core.metrics import metrics
+from .embeddings import embedder, Embedder
+from .retriever import retriever
+
+class CompanySemanticCache:
+    """Query embeddings and answers for one company, scanned as a single matrix"""
+
+    def __init__(self, dim: int, max_entries: int):
+        self.max_entries = max_entries
+        self.vectors = np.empty((0, dim), dtype=np.float32)
+        # (version, max_results, mode, expires_at, response) per row of `vectors`
+        self.entries: List[Tuple[int, int, str, float, Dict[str, Any]]] = []
+
+    def add(self, vector: np.ndarray, entry: Tuple[int, int, str, float, Dict[str, Any]]):
+        self.vectors = np.vstack([self.vectors, vector[np.newaxis, :]])[-self.max_entries:]
+        self.entries = (self.entries + [entry])[-self.max_entries:]
+
+    def lookup(self, vector: np.ndarray, version: int, max_results: int, mode: str, threshold: float) -> Optional[Tuple[Dict[str, Any], float]]:
+        if not self.entries:
+            return None
+        now = time.monotonic()
+        similarities = self.vectors @ vector
+        valid = np.fromiter(
+            (e[0] == version and e[1] == max_results and e[2] == mode and e[3] >= now for e in self.entries),
+            dtype=bool,
+            count=len(self.entries)
+        )
+        similarities = np.where(valid, similarities, -np.inf)
+        best = int(np.argmax(similarities))
+        if similarities[best] < threshold:
+            return None
+        return self.entries[best][4], float(similarities[best])
+
+class SemanticCache:
+    """
+    Serves cached answers for paraphrased queries.
+
+    A new query reuses an answer when the cosine similarity between its
+    embedding and a cached query embedding reaches `threshold`, for the
+    same corpus version and request parameters.
+
+    Only meaningful with a real embedding model: hashed features score
+    paraphrases near zero and one-word edits near the threshold, so the
+    cache switches itself off on the hashing fallback.
+    """
+
+    def __init__(self, embedder: Embedder, threshold: float, max_entries: int, ttl: float):
+        self.embedder = embedder
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._companies: Dict[str, CompanySemanticCache] = {}
+        self._lock = threading.Lock()
+        self.hits = metrics.counter("semantic_cache.hits")
+        self.misses = metrics.counter("semantic_cache.misses")
+        metrics.gauge("semantic_cache.entries", lambda: sum(len(c.entries) for c in list(self._companies.values())))
+
+    @property
+    def enabled(self) -> bool:
+        return settings.semantic_cache_enabled and not self.embedder.is_fallback
+
+    def get(self, company_id: str, query_vector: np.ndarray, version: int, max_results: int, mode: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        with self._lock:
+            cache = self._companies.get(company_id)
+            found = cache.lookup(query_vector, version, max_results, mode, self.threshold) if cache else None
+        if found is None:
+            self.misses.inc()
+            return None
+        self.hits.inc()
+        response, similarity = found
+        return copy.deepcopy(response), similarity
+
+    def put(self, company_id: str, query_vector: np.ndarray, version: int, max_results: int, mode: str, response: Dict[str, Any]):
+        entry = (version, max_results, mode, time.monotonic() + self.ttl, copy.deepcopy(response))
+        with self._lock:
+            cache = self._companies.get(company_id)
+            if cache is None:
+                cache = self._companies[company_id] = CompanySemanticCache(self.embedder.dim, self.max_entries)
+            cache.add(np.asarray(query_vector, dtype=np.float32), entry)
+
+    def invalidate(self, company_id: str):
+        with self._lock:
+            self._companies.pop(company_id, None)
+
+# Singleton instance, purged whenever a company's corpus version changes
+semantic_cache = SemanticCache(
+    embedder,
+    settings.semantic_cache_threshold,
+    settings.semantic_cache_max_entries,
+    settings.answer_cache_ttl
+)
+retriever.cache.add_listener(semantic_cache.invalidate)
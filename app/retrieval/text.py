@@ -0,0 +1,18 @@
+import re
+import unicodedata
+from typing import List
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+def normalize_text(text: str) -> str:
+    """Lowercase and strip accents so 'Política' and 'politica' match"""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+def tokenize(text: str) -> List[str]:
+    """Split text into normalized word tokens"""
+    return TOKEN_PATTERN.findall(normalize_text(text))
+
+def normalize_query(query: str) -> str:
+    """Case, accent, punctuation and whitespace-insensitive form of a query"""
+    return " ".join(tokenize(query))
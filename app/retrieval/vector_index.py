@@ -0,0 +1,177 @@
+from typing import List, Dict, Any, Optional, Tuple
+import threading
+import numpy as np
+from ..config import settings
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores along the last axis, best first"""
+    n = scores.shape[-1]
+    k = min(k, n)
+    if k <= 0:
+        return np.empty(scores.shape[:-1] + (0,), dtype=np.int64)
+    if k < n:
+        candidates = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+    else:
+        candidates = np.broadcast_to(np.arange(n), scores.shape).copy()
+    order = np.argsort(-np.take_along_axis(scores, candidates, axis=-1), axis=-1)
+    return np.take_along_axis(candidates, order, axis=-1)
+
+class CompanyVectorIndex:
+    """Dense matrix of chunk embeddings for a single company"""
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        # (chunks, vectors) is swapped as a single tuple so concurrent
+        # searches never see chunks and vectors from different versions
+        self._data: Tuple[List[Dict[str, Any]], np.ndarray] = ([], np.empty((0, dim), dtype=np.float32))
+        # (chunk list it was built from, chunk id -> row), rebuilt lazily per snapshot
+        self._rows: Tuple[Optional[List[Dict[str, Any]]], Dict[str, int]] = (None, {})
+
+    @property
+    def chunks(self) -> List[Dict[str, Any]]:
+        return self._data[0]
+
+    @property
+    def vectors(self) -> np.ndarray:
+        return self._data[1]
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    def _merged(self, chunks: List[Dict[str, Any]], vectors: np.ndarray) -> Tuple[List[Dict[str, Any]], np.ndarray, List[int]]:
+        """Current rows with `chunks` appended (replacing rows with the same id) and the kept row numbers"""
+        current_chunks, current_vectors = self._data[:2]
+        new_ids = {chunk["id"] for chunk in chunks}
+        keep = [i for i, chunk in enumerate(current_chunks) if chunk["id"] not in new_ids]
+        if len(keep) == len(current_chunks):
+            # Plain appends skip the gather copy
+            kept_chunks, kept_vectors = list(current_chunks), current_vectors
+        else:
+            kept_chunks, kept_vectors = [current_chunks[i] for i in keep], current_vectors[keep]
+        return (
+            kept_chunks + list(chunks),
+            np.vstack([kept_vectors, np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)]),
+            keep
+        )
+
+    def _without_document(self, document_id: str) -> Tuple[List[Dict[str, Any]], np.ndarray, np.ndarray]:
+        """Current rows minus the document's chunks and the kept row numbers"""
+        current_chunks, current_vectors = self._data[:2]
+        mask = np.fromiter((chunk["document_id"] != document_id for chunk in current_chunks), dtype=bool, count=len(current_chunks))
+        keep = np.flatnonzero(mask)
+        return [current_chunks[i] for i in keep], current_vectors[mask], keep
+
+    def add(self, chunks: List[Dict[str, Any]], vectors: np.ndarray):
+        merged_chunks, merged_vectors, _ = self._merged(chunks, vectors)
+        self._data = (merged_chunks, merged_vectors)
+
+    def remove_document(self, document_id: str) -> int:
+        kept_chunks, kept_vectors, _ = self._without_document(document_id)
+        removed = len(self.chunks) - len(kept_chunks)
+        if removed:
+            self._data = (kept_chunks, kept_vectors)
+        return removed
+
+    def _vector_rows(self, data) -> Tuple[List[Optional[Dict[str, Any]]], np.ndarray]:
+        """Chunk per row and the matching float vectors of a snapshot"""
+        return data[0], data[1]
+
+    def _row_of(self, rows: List[Optional[Dict[str, Any]]]) -> Dict[str, int]:
+        """Chunk id -> row number for a snapshot's rows, cached per snapshot"""
+        built_from, row_of = self._rows
+        if built_from is not rows:
+            row_of = {chunk["id"]: i for i, chunk in enumerate(rows) if chunk is not None}
+            self._rows = (rows, row_of)
+        return row_of
+
+    def vectors_for(self, chunk_ids: List[str]) -> Dict[str, np.ndarray]:
+        """Stored vectors of whichever of the chunks this index holds"""
+        rows, vectors = self._vector_rows(self._data)
+        row_of = self._row_of(rows)
+        found = {chunk_id: row_of[chunk_id] for chunk_id in chunk_ids if chunk_id in row_of}
+        if not found:
+            return {}
+        stacked = np.asarray(vectors[list(found.values())], dtype=np.float32)
+        return dict(zip(found, stacked))
+
+    def search_batch(self, query_vectors: np.ndarray, k: int) -> List[List[Tuple[Dict[str, Any], float]]]:
+        """Score every query against every chunk with one matrix product"""
+        chunks, vectors = self._data[:2]
+        if not chunks:
+            return [[] for _ in range(len(query_vectors))]
+        scores = np.atleast_2d(query_vectors) @ vectors.T
+        top = top_k_indices(scores, k)
+        return [
+            [(chunks[i], float(row_scores[i])) for i in row]
+            for row, row_scores in zip(top, scores)
+        ]
+
+    def search(self, query_vector: np.ndarray, k: int) -> List[Tuple[Dict[str, Any], float]]:
+        return self.search_batch(query_vector[np.newaxis, :], k)[0]
+
+class InMemoryVectorStore:
+    """Per-company vector indexes kept in process memory"""
+
+    persistent = False
+
+    def __init__(self, dim: int = settings.vector_dim):
+        self.dim = dim
+        self._indexes: Dict[str, CompanyVectorIndex] = {}
+        self._lock = threading.Lock()
+
+    def is_loaded(self, company_id: str) -> bool:
+        return company_id in self._indexes
+
+    def count(self, company_id: str) -> int:
+        index = self._indexes.get(company_id)
+        return len(index) if index else 0
+
+    def attach(self, company_id: str, chunks: List[Dict[str, Any]], model: Optional[str] = None) -> bool:
+        """Reuse vectors `model` already stored outside this process; nothing to reuse here"""
+        return False
+
+    def replace(self, company_id: str, chunks: List[Dict[str, Any]], vectors: np.ndarray, model: Optional[str] = None):
+        """Swap in the company's whole corpus; `model` names the embedding model for stores that persist vectors"""
+        if len(chunks) >= settings.ann_min_chunks:
+            # Large tenants trade a little recall for sub-linear search; IVF
+            # lists hold float vectors, so quantization doesn't apply to them
+            from .ann_index import IVFVectorIndex
+            index = IVFVectorIndex(self.dim)
+        elif settings.vector_quantization != "none":
+            from .quantization import QuantizedVectorIndex
+            index = QuantizedVectorIndex(self.dim, settings.vector_quantization)
+        else:
+            index = CompanyVectorIndex(self.dim)
+        index.add(chunks, vectors)
+        with self._lock:
+            self._indexes[company_id] = index
+
+    def add(self, company_id: str, chunks: List[Dict[str, Any]], vectors: np.ndarray):
+        with self._lock:
+            index = self._indexes.get(company_id)
+            if index is not None:
+                index.add(chunks, vectors)
+
+    def remove_document(self, company_id: str, document_id: str):
+        with self._lock:
+            index = self._indexes.get(company_id)
+            if index is not None:
+                index.remove_document(document_id)
+
+    def drop(self, company_id: str):
+        with self._lock:
+            self._indexes.pop(company_id, None)
+
+    def search(self, company_id: str, query_vector: np.ndarray, k: int) -> List[Tuple[Dict[str, Any], float]]:
+        index = self._indexes.get(company_id)
+        return index.search(query_vector, k) if index else []
+
+    def vectors_for(self, company_id: str, chunk_ids: List[str]) -> Dict[str, np.ndarray]:
+        index = self._indexes.get(company_id)
+        return index.vectors_for(chunk_ids) if index else {}
+
+    def search_batch(self, company_id: str, query_vectors: np.ndarray, k: int) -> List[List[Tuple[Dict[str, Any], float]]]:
+        index = self._indexes.get(company_id)
+        if not index:
+            return [[] for _ in range(len(query_vectors))]
+        return index.search_batch(query_vectors, k)
@@ -2,6 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException, Request
 from ..models.company_model import Company, CompanyCreate, CompanyUpdate
 from ..config.database import get_supabase_client
 from ..auth.auth_middleware import auth_middleware
+from ..utils.company_settings import forget_company_settings
 from datetime import datetime
 from typing import List
 from uuid import UUID
@@ -139,6 +140,8 @@ async def update_company(company_id: UUID, company: CompanyUpdate, request: Requ
             update_data["email"] = company.email
         if company.is_active is not None:
             update_data["is_active"] = company.is_active
+        if company.extractive_answers is not None:
+            update_data["extractive_answers"] = company.extractive_answers
             
         # Add updated_at timestamp
         update_data["updated_at"] = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S.%f+00:00")
@@ -147,6 +150,7 @@ async def update_company(company_id: UUID, company: CompanyUpdate, request: Requ
         print(f"Updating company {company_id} with data: {update_data}")
         
         response = supabase.table('companies').update(update_data).eq('id', str(company_id)).execute()
+        forget_company_settings(str(company_id))
         return response.data[0]
     except Exception as e:
         print(f"Error updating company: {str(e)}")  # Debug info
@@ -5,9 +5,11 @@ from ..auth.auth_middleware import auth_middleware
 from ..utils import storage
 from ..utils.document_processor import document_processor
 from ..utils.subscription_validator import check_document_limits
+from ..retrieval import retriever
 from datetime import datetime
 from typing import List, Optional, Dict, Any
 from uuid import UUID
+import asyncio
 import pytz
 
 router = APIRouter(
@@ -242,6 +244,10 @@ async def delete_document(document_id: UUID, request: Request):
             .delete()\
             .eq('id', str(document_id))\
             .execute()
+
+        # Drop the document's chunks from the in-memory index (index updates
+        # can take a while on large tenants, so keep them off the event loop)
+        await asyncio.to_thread(retriever.remove_document, company_id, str(document_id))
             
         return {"message": "Document deleted successfully"}
         
@@ -330,26 +336,30 @@ async def get_document_chunks(document_id: UUID, request: Request):
     try:
         supabase = get_supabase_client(use_service_role=True)
         
-        # Verify document exists and belongs to company
+        # Chunks carry company_id, so ownership is checked in the same query
+        response = supabase.table('document_chunks')\
+            .select("id, document_id, chunk_index, content, metadata, embedding_id, created_at")\
+            .eq('company_id', company_id)\
+            .eq('document_id', str(document_id))\
+            .order('chunk_index')\
+            .execute()
+            
+        if response.data:
+            return response.data
+        
+        # No chunks: tell an unprocessed document apart from a missing or foreign one
         document = supabase.table('documents')\
-            .select("*")\
+            .select("id")\
             .eq('id', str(document_id))\
             .eq('company_id', company_id)\
-            .single()\
             .execute()
             
         if not document.data:
             raise HTTPException(status_code=404, detail="Document not found")
+        return []
         
-        # Get chunks
-        response = supabase.table('document_chunks')\
-            .select("*")\
-            .eq('document_id', str(document_id))\
-            .order('chunk_index')\
-            .execute()
-            
-        return response.data if response.data else []
-        
+    except HTTPException as he:
+        raise he
     except Exception as e:
         print(f"Error fetching chunks: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
@@ -4,7 +4,8 @@ from ..config.database import get_supabase_client
 from ..auth.auth_middleware import auth_middleware
 from datetime import datetime
 from typing import List
-from uuid import UUID
+from uuid import UUID, uuid4
+from ..utils.query_log_writer import query_log_writer
 
 router = APIRouter(
     prefix="/query-logs",
@@ -17,29 +18,20 @@ async def create_query_log(log: QueryLogCreate, request: Request):
     """Create a new query log"""
     user = request.state.user
     
-    try:
-        supabase = get_supabase_client(use_service_role=True)
-        
-        # Remove relevance_score since it's not in QueryLogCreate
-        log_data = {
-            "user_id": user.get('user_id'),
-            "company_id": user.get('company_id'),
-            "query": log.query,
-            "response": log.response,
-            "metadata": log.metadata,
-            "created_at": datetime.utcnow().isoformat()
-        }
-        
-        response = supabase.table('query_logs').insert(log_data).execute()
-        
-        if not response.data:
-            raise HTTPException(status_code=500, detail="Failed to create query log")
-            
-        return response.data[0]
-        
-    except Exception as e:
-        print(f"Error creating query log: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+    # Id and timestamp are set here so the row can be returned before
+    # the write-behind buffer inserts it
+    log_data = {
+        "id": str(uuid4()),
+        "user_id": user.get('user_id'),
+        "company_id": user.get('company_id'),
+        "query": log.query,
+        "response": log.response,
+        "metadata": log.metadata,
+        "created_at": datetime.utcnow().isoformat()
+    }
+    query_log_writer.enqueue(log_data)
+    
+    return log_data
 
 @router.get("/", response_model=List[QueryLog])
 async def get_query_logs(
@@ -52,6 +44,8 @@ async def get_query_logs(
     company_id = user.get('company_id')
     
     try:
+        # Make buffered rows visible to reads
+        await query_log_writer.flush()
         supabase = get_supabase_client(use_service_role=True)
         
         response = supabase.table('query_logs')\
@@ -74,6 +68,7 @@ async def get_query_log(log_id: UUID, request: Request):
     company_id = user.get('company_id')
     
     try:
+        await query_log_writer.flush()
         supabase = get_supabase_client(use_service_role=True)
         
         # First check if log exists
@@ -1,10 +1,26 @@
 from fastapi import APIRouter, Request, HTTPException, Depends
-from ..models.rag_query_model import RAGQueryRequest, RAGQueryResponse
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from ..models.rag_query_model import RAGQueryRequest, RAGQueryResponse, RAGBatchQueryRequest, RAGBatchQueryResponse
 from ..auth.auth_middleware import auth_middleware
-from ..config.database import get_supabase_client
-from ..utils.document_processor import document_processor
+from ..config import settings
+from ..retrieval import retriever, answer_cache, semantic_cache, embedder
 from ..llm.gemini_client import gemini_client  # Add this import
-from typing import Dict, Any
+from ..llm.context_packer import context_packer, estimate_tokens, PackedContext
+from ..utils.single_flight import SingleFlight
+from ..utils.query_log_writer import query_log_writer
+from ..core.metrics import metrics, StageTimer
+from ..llm.extractive import extractive_answer, fast_path_answer
+from ..llm.context_cache import context_cache
+from ..llm.providers import build_cached_prompt
+from ..utils.subscription_validator import get_plan_type
+from ..utils.company_settings import extractive_answers_enabled
+from typing import Dict, Any, List, Optional, Tuple
+import asyncio
+import copy
+import json
+from datetime import datetime
+from uuid import uuid4
 import time
 
 router = APIRouter(
@@ -13,6 +29,219 @@ router = APIRouter(
     dependencies=[Depends(auth_middleware)]
 )
 
+# Coalesces identical in-flight queries (same key as the exact answer cache)
+single_flight = SingleFlight("rag.single_flight")
+degraded_answers = metrics.counter("rag.degraded_answers")
+# Lookups answered straight from the best chunk instead of calling the LLM
+llm_calls_saved = metrics.counter("rag.llm_calls_saved")
+
+async def _check_caches(query: RAGQueryRequest, company_id: str, timer: StageTimer) -> Tuple[Optional[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Look the query up in the exact and semantic answer caches.
+
+    Returns the cached response (or None) and the cache context needed
+    to store a fresh answer afterwards.
+    """
+    retrieval_mode = query.retrieval_mode or settings.retrieval_mode
+
+    # Refresh the corpus first so the version reflects its current state
+    with timer.stage("corpus_load"):
+        await retriever.ensure_loaded_async(company_id)
+    corpus_version = retriever.corpus_version(company_id)
+    context = {
+        "retrieval_mode": retrieval_mode,
+        "corpus_version": corpus_version,
+        "cache_key": answer_cache.make_key(company_id, query.query, query.max_results, retrieval_mode, corpus_version),
+        "query_vector": None
+    }
+
+    with timer.stage("cache_lookup"):
+        cached = answer_cache.get(context["cache_key"])
+        cache_info = {"cache_type": "exact"}
+
+        # Fall back to answers for paraphrases of the same question
+        if cached is None and semantic_cache.enabled:
+            context["query_vector"] = await asyncio.to_thread(embedder.encode_query, query.query)
+            found = semantic_cache.get(company_id, context["query_vector"], corpus_version, query.max_results, retrieval_mode)
+            if found is not None:
+                cached, similarity = found
+                cache_info = {"cache_type": "semantic", "cache_similarity": round(similarity, 4)}
+
+    if cached is not None:
+        cached["query"] = query.query
+        cached["metadata"]["cached"] = True
+        cached["metadata"].update(cache_info)
+    return cached, context
+
+def _store_in_caches(query: RAGQueryRequest, company_id: str, context: Dict[str, Any], response: Dict[str, Any]):
+    # Failed or degraded generations are retried on the next request instead of cached
+    if response["answer"].startswith("Error") or response["metadata"].get("degraded"):
+        return
+    answer_cache.put(context["cache_key"], response)
+    if context["query_vector"] is not None:
+        semantic_cache.put(
+            company_id,
+            context["query_vector"],
+            context["corpus_version"],
+            query.max_results,
+            context["retrieval_mode"],
+            response
+        )
+
+def _no_documents_response(query: RAGQueryRequest, start_time: float) -> Dict[str, Any]:
+    return {
+        "query": query.query,
+        "relevant_chunks": [],
+        "answer": "No documents found",
+        "metadata": {
+            "processing_time": f"{time.time() - start_time:.2f}s",
+            "total_chunks": 0,
+            "returned_chunks": 0
+        }
+    }
+
+def _cached_context(company_id: str, corpus_version: int) -> Optional[str]:
+    """Provider handle for the company's cached corpus, when it has one"""
+    return context_cache.handle_for(
+        company_id,
+        corpus_version,
+        gemini_client.provider,
+        lambda: retriever.corpus_chunks(company_id)
+    )
+
+def _context_metadata(query: RAGQueryRequest, packed: PackedContext, cached_context: Optional[str] = None) -> Dict[str, Any]:
+    # With a cached prefix only the question goes out; the corpus is already at the provider
+    if cached_context is not None:
+        prompt = build_cached_prompt(query.query)
+    else:
+        prompt = gemini_client.build_prompt(query.query, packed.chunks)
+    return {
+        "cached_prefix": cached_context is not None,
+        "prompt_tokens": estimate_tokens(prompt),
+        "context_tokens": packed.context_tokens,
+        "context_chunks": len(packed.chunks),
+        "dropped_duplicates": packed.dropped_duplicates,
+        "dropped_over_budget": packed.dropped_budget
+    }
+
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+async def _deadline_ms(query: RAGQueryRequest, company_id: str) -> Optional[int]:
+    """Caller's latency budget, else the one for the company's plan; None means no budget"""
+    if query.deadline_ms:
+        return query.deadline_ms
+    plan_type = await get_plan_type(company_id)
+    return settings.rag_plan_deadline_ms.get(plan_type, settings.rag_default_deadline_ms) or None
+
+async def _generate_within(
+    query: RAGQueryRequest,
+    chunks: List[Dict[str, Any]],
+    deadline: Optional[float],
+    cached_context: Optional[str] = None
+) -> Optional[str]:
+    """Gemini answer, or None if it isn't ready by `deadline` (a perf_counter value)"""
+    generation = gemini_client.generate_response(query.query, chunks, cached_context)
+    if deadline is None:
+        return await generation
+    remaining = deadline - time.perf_counter()
+    if remaining <= 0:
+        generation.close()
+        return None
+    try:
+        # Cancelling the call releases its LLM concurrency slot
+        return await asyncio.wait_for(generation, timeout=remaining)
+    except asyncio.TimeoutError:
+        return None
+
+async def _answer(
+    query: RAGQueryRequest,
+    company_id: str,
+    cache_context: Dict[str, Any],
+    start_time: float,
+    deadline: Optional[float] = None,
+    extractive: bool = False
+) -> Optional[Dict[str, Any]]:
+    """
+    Retrieve, generate and cache an answer; None when the company has no chunks.
+    With `extractive`, confident lookups are answered from the best chunk.
+    """
+    timer = StageTimer()
+    # Top-k chunks from BM25, embeddings or both fused
+    with timer.stage("retrieval"):
+        relevant_chunks, retrieval_info = await retriever.retrieve(
+            company_id,
+            query.query,
+            query.max_results,
+            cache_context["retrieval_mode"]
+        )
+        
+    if not relevant_chunks and not retriever.has_chunks(company_id):
+        return None
+    
+    # Deduplicate and fit the context into the prompt token budget
+    with timer.stage("context_packing"):
+        packed = context_packer.pack(relevant_chunks)
+
+    fast_answer = None
+    if extractive and relevant_chunks:
+        fast_answer = fast_path_answer(query.query, relevant_chunks, retrieval_info["mode"])
+
+    cached_context = None
+    if fast_answer is not None:
+        llm_calls_saved.inc()
+        llm_response = fast_answer
+    else:
+        # Busy tenants with small corpora send a cached-context handle instead of the chunks
+        cached_context = _cached_context(company_id, cache_context["corpus_version"])
+
+        # Generate LLM response using Gemini
+        with timer.stage("llm"):
+            llm_response = await _generate_within(query, packed.chunks, deadline, cached_context)
+
+    degraded = llm_response is None and bool(relevant_chunks)
+    if llm_response is None:
+        # Out of budget: answer from the retrieved text instead of waiting
+        degraded_answers.inc()
+        llm_response = extractive_answer(query.query, packed.chunks) if relevant_chunks else "Error: No context provided"
+    
+    response = {
+        "query": query.query,
+        "relevant_chunks": relevant_chunks,
+        "answer": llm_response,  # Now using the LLM response
+        "metadata": {
+            "processing_time": f"{time.time() - start_time:.2f}s",
+            "total_chunks": retriever.corpus_size(company_id),
+            "returned_chunks": len(relevant_chunks),
+            "retrieval": retrieval_info,
+            "context": _context_metadata(query, packed, cached_context),
+            "timings": timer.summary(),
+            "cached": False
+        }
+    }
+    if degraded:
+        response["metadata"].update({"degraded": True, "degraded_reason": "llm_deadline"})
+    if fast_answer is not None:
+        response["metadata"]["extractive"] = True
+
+    _store_in_caches(query, company_id, cache_context, response)
+    return response
+
+def _request_timer(request: Request) -> StageTimer:
+    # Auth runs as a dependency before the endpoint; count it in the total
+    auth_ms = getattr(request.state, "auth_ms", 0.0)
+    timer = StageTimer(start=time.perf_counter() - auth_ms / 1000)
+    timer.add("auth", auth_ms)
+    return timer
+
+async def _log_with_timings(query: RAGQueryRequest, response: Dict[str, Any], request: Request, timer: StageTimer):
+    """Log the query with its stage timings and feed them into the stage histograms"""
+    response["metadata"]["timings"] = timer.summary()
+    with timer.stage("logging"):
+        await log_query(query.query, response, request)
+    response["metadata"]["timings"] = timer.summary()
+    timer.observe("rag.stage")
+
 @router.post("/query", response_model=RAGQueryResponse)
 async def query_documents(query: RAGQueryRequest, request: Request):
     """
@@ -22,13 +251,33 @@ async def query_documents(query: RAGQueryRequest, request: Request):
     Realiza una consulta sobre los documentos procesados usando RAG.
     
     ### Proceso
-    1. Búsqueda de chunks relevantes
-    2. Generación de respuesta con Gemini
-    3. Registro de la consulta
+    1. Búsqueda de chunks relevantes (BM25, embeddings o híbrida)
+    2. Selección del contexto (sin duplicados, dentro del presupuesto de tokens)
+    3. Generación de respuesta con Gemini
+    4. Registro de la consulta
+
+    Las respuestas se cachean por empresa, consulta normalizada y versión
+    del corpus, y también se reutilizan para consultas semánticamente
+    equivalentes; `metadata.cached` indica si se sirvió desde caché.
+    Consultas idénticas simultáneas se resuelven una sola vez
+    (`metadata.coalesced`), pero cada una se registra en `query_logs`.
     
     ### Parámetros
     - **query**: Texto de la consulta
     - **max_results**: Número máximo de chunks a considerar
+    - **retrieval_mode**: `lexical`, `vector` o `hybrid` (opcional)
+    - **deadline_ms**: Presupuesto de latencia (opcional, por defecto el del plan)
+    
+    Si Gemini no responde dentro del presupuesto, se devuelve una respuesta
+    extractiva construida con los chunks recuperados y `metadata.degraded`.
+
+    Para empresas con `extractive_answers` activado, las consultas de tipo
+    búsqueda que un único chunk responde con alta confianza se contestan
+    con la frase correspondiente sin llamar a Gemini (`metadata.extractive`).
+
+    Con `context_cache_enabled`, los corpus pequeños y muy consultados se
+    registran como contexto cacheado en el proveedor y las consultas
+    siguientes solo envían la pregunta (`metadata.context.cached_prefix`).
     
     ### Retorna
     - **query**: Consulta original
@@ -37,90 +286,293 @@ async def query_documents(query: RAGQueryRequest, request: Request):
     - **metadata**: Información adicional del proceso
     """
     start_time = time.time()
+    timer = _request_timer(request)
     user = request.state.user
     company_id = user.get('company_id')
     
     try:
-        supabase = get_supabase_client(use_service_role=True)
-        
-        # First get all document IDs belonging to the company
-        docs_response = supabase.table('documents')\
-            .select("id")\
-            .eq('company_id', company_id)\
-            .execute()
-            
-        if not docs_response.data:
-            return {
-                "query": query.query,
-                "relevant_chunks": [],
-                "answer": "No documents found",
-                "metadata": {
-                    "processing_time": f"{time.time() - start_time:.2f}s",
-                    "total_chunks": 0,
-                    "returned_chunks": 0
-                }
-            }
-        
-        # Get document IDs
-        doc_ids = [doc['id'] for doc in docs_response.data]
+        cached, cache_context = await _check_caches(query, company_id, timer)
+        if cached is not None:
+            cached["metadata"]["processing_time"] = f"{time.time() - start_time:.2f}s"
+            await _log_with_timings(query, cached, request, timer)
+            return cached
+
+        deadline_ms = await _deadline_ms(query, company_id)
+        deadline = timer.started + deadline_ms / 1000 if deadline_ms else None
+        extractive = await extractive_answers_enabled(company_id)
+
+        # Identical concurrent queries (with the same budget) share one retrieval + generation
+        response, coalesced = await single_flight.do(
+            (cache_context["cache_key"], deadline_ms),
+            lambda: _answer(query, company_id, cache_context, start_time, deadline, extractive)
+        )
+        if response is None:
+            return _no_documents_response(query, start_time)
+
+        response["query"] = query.query
+        response["metadata"]["coalesced"] = coalesced
+        response["metadata"]["deadline_ms"] = deadline_ms
+        response["metadata"]["processing_time"] = f"{time.time() - start_time:.2f}s"
+        timer.merge(response["metadata"]["timings"])
         
-        # Get chunks for these documents
-        chunks_response = supabase.table('document_chunks')\
-            .select("*")\
-            .in_('document_id', doc_ids)\
-            .execute()
-            
-        # For MVP, simple text matching
-        relevant_chunks = [
-            chunk for chunk in chunks_response.data
-            if query.query.lower() in chunk['content'].lower()
-        ][:query.max_results]
+        # Log the query
+        await _log_with_timings(query, response, request, timer)
         
-        # Generate LLM response using Gemini
-        llm_response = await gemini_client.generate_response(
-            query.query,
-            relevant_chunks
-        )
+        return response
         
+    except Exception as e:
+        print(f"Error in query_documents: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/query/stream")
+async def stream_query(query: RAGQueryRequest, request: Request):
+    """
+    Consulta RAG en streaming
+    
+    ### Descripción
+    Igual que `/rag/query`, pero devuelve la respuesta como Server-Sent Events
+    para que el cliente muestre el texto a medida que Gemini lo genera.
+    
+    ### Eventos
+    1. **chunks**: IDs y scores de los chunks recuperados (antes de llamar a Gemini)
+    2. **token**: Fragmentos de la respuesta a medida que llegan
+    3. **metadata**: Metadatos finales de la consulta
+    
+    Si ocurre un error durante la generación se emite un evento **error**.
+    La consulta se registra en `query_logs` al cerrarse el stream.
+    """
+    start_time = time.time()
+    timer = _request_timer(request)
+    user = request.state.user
+    company_id = user.get('company_id')
+    # Final response, logged once the stream has closed
+    state: Dict[str, Any] = {}
+
+    try:
+        cached, cache_context = await _check_caches(query, company_id, timer)
+        relevant_chunks, retrieval_info = [], {}
+        if cached is None:
+            with timer.stage("retrieval"):
+                relevant_chunks, retrieval_info = await retriever.retrieve(
+                    company_id,
+                    query.query,
+                    query.max_results,
+                    cache_context["retrieval_mode"]
+                )
+    except Exception as e:
+        print(f"Error in stream_query: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    def chunks_event(chunks):
+        return _sse("chunks", {
+            "chunk_ids": [chunk["id"] for chunk in chunks],
+            "scores": [chunk.get("score") for chunk in chunks]
+        })
+
+    async def events():
+        if cached is not None or (not relevant_chunks and not retriever.has_chunks(company_id)):
+            response = cached or _no_documents_response(query, start_time)
+            response["metadata"]["processing_time"] = f"{time.time() - start_time:.2f}s"
+            response["metadata"]["timings"] = timer.summary()
+            yield chunks_event(response["relevant_chunks"])
+            yield _sse("token", {"text": response["answer"]})
+            yield _sse("metadata", response["metadata"])
+            state["response"] = response
+            return
+
+        yield chunks_event(relevant_chunks)
+
+        with timer.stage("context_packing"):
+            packed = context_packer.pack(relevant_chunks)
+        parts = []
+        llm_start = time.perf_counter()
+        try:
+            async for text in gemini_client.stream_response(query.query, packed.chunks):
+                if not parts:
+                    timer.add("llm_first_token", (time.perf_counter() - llm_start) * 1000)
+                parts.append(text)
+                yield _sse("token", {"text": text})
+        except Exception as e:
+            # Partial answers are neither cached nor logged as successful queries
+            print(f"Error streaming query response: {str(e)}")
+            yield _sse("error", {"detail": str(e)})
+            return
+        # Includes time the client took to read each token off the stream
+        timer.add("llm", (time.perf_counter() - llm_start) * 1000)
+
         response = {
             "query": query.query,
             "relevant_chunks": relevant_chunks,
-            "answer": llm_response,  # Now using the LLM response
+            "answer": "".join(parts),
             "metadata": {
                 "processing_time": f"{time.time() - start_time:.2f}s",
-                "total_chunks": len(chunks_response.data),
-                "returned_chunks": len(relevant_chunks)
+                "total_chunks": retriever.corpus_size(company_id),
+                "returned_chunks": len(relevant_chunks),
+                "retrieval": retrieval_info,
+                "context": _context_metadata(query, packed),
+                "timings": timer.summary(),
+                "cached": False
             }
         }
-        
-        # Log the query
-        await log_query(query.query, response, request)
-        
-        return response
-        
-    except Exception as e:
-        print(f"Error in query_documents: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+        _store_in_caches(query, company_id, cache_context, response)
+        state["response"] = response
+        yield _sse("metadata", response["metadata"])
 
-async def log_query(query: str, response: Dict[str, Any], request: Request):
-    """Log the RAG query using existing query log system"""
+    async def log_after_stream():
+        if "response" in state:
+            await _log_with_timings(query, state["response"], request, timer)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(log_after_stream)
+    )
+
+@router.post("/query/batch", response_model=RAGBatchQueryResponse)
+async def batch_query_documents(batch: RAGBatchQueryRequest, request: Request):
+    """
+    Consulta RAG por lotes
+    
+    ### Descripción
+    Resuelve muchas consultas en una sola llamada (p. ej. conjuntos de
+    regresión). La configuración por empresa se hace una vez, la búsqueda
+    vectorial de todas las consultas se resuelve con un único producto de
+    matrices y los registros de `query_logs` se insertan en bloque.
+    
+    ### Parámetros
+    - **queries**: Lista de consultas con el mismo formato que `/rag/query`
+    
+    ### Retorna
+    - **results**: Una respuesta por consulta, en el mismo orden
+    - **metadata**: Tiempos y contadores del lote
+    """
+    start_time = time.time()
+    user = request.state.user
+    company_id = user.get('company_id')
+
+    if len(batch.queries) > settings.rag_batch_max_queries:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch too large: max {settings.rag_batch_max_queries} queries"
+        )
+    
     try:
-        supabase = get_supabase_client(use_service_role=True)
-        user = request.state.user
-        
-        log_data = {
-            "user_id": user.get('user_id'),
-            "company_id": user.get('company_id'),
-            "query": query,
-            "response": str(response["answer"]),
+        await retriever.ensure_loaded_async(company_id)
+        corpus_version = retriever.corpus_version(company_id)
+        modes = [q.retrieval_mode or settings.retrieval_mode for q in batch.queries]
+        keys = [
+            answer_cache.make_key(company_id, q.query, q.max_results, mode, corpus_version)
+            for q, mode in zip(batch.queries, modes)
+        ]
+
+        results: List[Optional[Dict[str, Any]]] = []
+        cache_hits = 0
+        for query, key in zip(batch.queries, keys):
+            cached = answer_cache.get(key)
+            if cached is not None:
+                cache_hits += 1
+                # The key is normalized, so the cached answer may be for another spelling
+                cached["query"] = query.query
+                cached["metadata"].update({"cached": True, "cache_type": "exact"})
+            results.append(cached)
+        pending = [i for i, result in enumerate(results) if result is None]
+
+        if pending and not retriever.has_chunks(company_id):
+            for i in pending:
+                results[i] = _no_documents_response(batch.queries[i], start_time)
+            pending = []
+
+        # Repeated queries in one batch are retrieved and answered once
+        first_with_key: Dict[Tuple, int] = {}
+        for i in pending:
+            first_with_key.setdefault(keys[i], i)
+        unique = list(first_with_key.values())
+
+        retrieved, retrieval_info = await retriever.retrieve_batch(
+            company_id,
+            [batch.queries[i].query for i in unique],
+            [batch.queries[i].max_results for i in unique],
+            [modes[i] for i in unique]
+        )
+
+        # Bounded fan-out so one batch can't take every LLM slot
+        semaphore = asyncio.Semaphore(settings.rag_batch_concurrency)
+
+        async def generate(i: int, relevant_chunks: List[Dict[str, Any]]):
+            query = batch.queries[i]
+            packed = context_packer.pack(relevant_chunks)
+            cached_context = _cached_context(company_id, corpus_version)
+            async with semaphore:
+                llm_response = await gemini_client.generate_response(query.query, packed.chunks, cached_context)
+            response = {
+                "query": query.query,
+                "relevant_chunks": relevant_chunks,
+                "answer": llm_response,
+                "metadata": {
+                    "processing_time": f"{time.time() - start_time:.2f}s",
+                    "total_chunks": retriever.corpus_size(company_id),
+                    "returned_chunks": len(relevant_chunks),
+                    "retrieval": {"mode": modes[i], "batched": True},
+                    "context": _context_metadata(query, packed, cached_context),
+                    "cached": False
+                }
+            }
+            if not llm_response.startswith("Error"):
+                answer_cache.put(keys[i], response)
+            results[i] = response
+
+        await asyncio.gather(*[generate(i, chunks) for i, chunks in zip(unique, retrieved)])
+        for i in pending:
+            first = first_with_key[keys[i]]
+            if i != first:
+                results[i] = {**copy.deepcopy(results[first]), "query": batch.queries[i].query}
+
+        await log_queries([
+            (query.query, response)
+            for query, response in zip(batch.queries, results)
+            if response["answer"] != "No documents found"
+        ], request)
+
+        return {
+            "results": results,
             "metadata": {
-                "chunks_returned": len(response["relevant_chunks"]),
-                "processing_time": response["metadata"]["processing_time"]
+                "processing_time": f"{time.time() - start_time:.2f}s",
+                "total_queries": len(batch.queries),
+                "cached_queries": cache_hits,
+                "retrieval": retrieval_info
             }
         }
         
-        supabase.table('query_logs').insert(log_data).execute()
-        
+    except HTTPException as he:
+        raise he
     except Exception as e:
-        print(f"Error logging query: {str(e)}")
-        # Don't raise exception - logging failure shouldn't affect the query response
\ No newline at end of file
+        print(f"Error in batch_query_documents: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _log_row(query: str, response: Dict[str, Any], user: Dict[str, Any]) -> Dict[str, Any]:
+    # Rows are bulk-inserted together, so every row carries the same columns
+    return {
+        "id": str(uuid4()),
+        "user_id": user.get('user_id'),
+        "company_id": user.get('company_id'),
+        "query": query,
+        "response": str(response["answer"]),
+        "created_at": datetime.utcnow().isoformat(),
+        "metadata": {
+            "chunks_returned": len(response["relevant_chunks"]),
+            "processing_time": response["metadata"]["processing_time"],
+            "timings": response["metadata"].get("timings")
+        }
+    }
+
+async def log_query(query: str, response: Dict[str, Any], request: Request):
+    """Log the RAG query using existing query log system"""
+    # Buffered and bulk-inserted in the background, off the request path
+    query_log_writer.enqueue(_log_row(query, response, request.state.user))
+
+async def log_queries(entries: List[Tuple[str, Dict[str, Any]]], request: Request):
+    """Log many RAG queries"""
+    user = request.state.user
+    for query, response in entries:
+        query_log_writer.enqueue(_log_row(query, response, user))
@@ -346,6 +346,15 @@ def test_invalid_document_id(auth_token):
     )
     assert response.status_code == 404
 
+def test_invalid_document_chunks(auth_token):
+    """Test listing chunks of a non-existent document"""
+    fake_id = str(uuid4())
+    response = client.get(
+        f"/documents/{fake_id}/chunks",
+        headers={"Authorization": f"Bearer {auth_token}"}
+    )
+    assert response.status_code == 404
+
 def test_wrong_company_access(auth_token):
     """Test accessing document from another company"""
     # Create a document for a different company first
@@ -1,5 +1,10 @@
 import pytest
-from ..llm.gemini_client import GeminiClient, gemini_client
+from ..llm.gemini_client import GeminiClient, LLMStreamError, gemini_client
+from ..llm.providers import LLMProvider
+from ..models.rag_query_model import RAGQueryRequest
+from ..retrieval import answer_cache
+from ..routers import rag_query_router
+from google.api_core import exceptions as google_exceptions
 import os
 from dotenv import load_dotenv
 
@@ -56,4 +61,303 @@ async def test_gemini_error_handling():
 
     # Test with invalid chunks
     response = await gemini_client.generate_response("test query", None)
-    assert "Error" in response
\ No newline at end of file
+    assert "Error" in response
+@pytest.mark.asyncio
+async def test_retries_transient_errors(monkeypatch):
+    """Transient failures should be retried and then succeed"""
+    from google.api_core import exceptions as google_exceptions
+    from ..config import settings
+    client = GeminiClient(use_mock=True)
+    monkeypatch.setattr(settings, "llm_retry_base_delay", 0.0)
+    calls = []
+
+    async def flaky(query, chunks, cached_context=None):
+        calls.append(query)
+        if len(calls) == 1:
+            raise google_exceptions.ServiceUnavailable("overloaded")
+        return "recovered"
+
+    monkeypatch.setattr(client, "_generate_once", flaky)
+    response = await client.generate_response("test query", [{"content": "context"}])
+    assert response == "recovered"
+    assert len(calls) == 2
+
+@pytest.mark.asyncio
+async def test_concurrency_limit_and_timeout(monkeypatch):
+    """Calls beyond the concurrency limit should queue and slow calls should time out"""
+    import asyncio
+    from ..config import settings
+    monkeypatch.setattr(settings, "llm_max_concurrency", 2)
+    monkeypatch.setattr(settings, "llm_timeout", 0.2)
+    monkeypatch.setattr(settings, "llm_max_retries", 0)
+    client = GeminiClient(use_mock=True)
+    active = []
+    peak = []
+
+    async def slow(query, chunks, cached_context=None):
+        active.append(query)
+        peak.append(len(active))
+        await asyncio.sleep(0.05 if query != "hang" else 1)
+        active.remove(query)
+        return "ok"
+
+    monkeypatch.setattr(client, "_generate_once", slow)
+    results = await asyncio.gather(*[client.generate_response(f"q{i}", [{"content": "c"}]) for i in range(5)])
+    assert results == ["ok"] * 5
+    assert max(peak) == 2
+
+    assert "Error" in await client.generate_response("hang", [{"content": "c"}])
+
+def test_context_packer_dedup_and_budget():
+    """Packer should drop near-duplicates and stop at the token budget"""
+    from ..llm.context_packer import ContextPacker, estimate_tokens
+    text = "The refund window is thirty days from the date of purchase for all items"
+    chunks = [
+        {"id": "1", "content": text, "score": 0.9},
+        {"id": "2", "content": text + " sold online", "score": 0.8},
+        {"id": "3", "content": "Vacation requests must be approved by your manager " * 3, "score": 0.7},
+        {"id": "4", "content": "Office hours are nine to five " * 20, "score": 0.6}
+    ]
+    packer = ContextPacker(token_budget=80, dedup_threshold=0.8)
+    packed = packer.pack(chunks)
+
+    assert [chunk["id"] for chunk in packed.chunks] == ["1", "3"]
+    assert packed.dropped_duplicates == 1
+    assert packed.dropped_budget == 1
+    assert packed.context_tokens <= 80
+    assert packed.context_tokens == sum(estimate_tokens(c["content"]) for c in packed.chunks)
+
+def test_context_packer_keeps_rerank_order():
+    """Packer should keep the re-ranked order rather than re-sort by first-stage score"""
+    from ..llm.context_packer import ContextPacker
+    chunks = [
+        {"id": "a", "content": "Refunds are issued within thirty days of purchase", "score": 0.2, "rerank_score": 0.9},
+        {"id": "b", "content": "Vacation requests need manager approval", "score": 0.8, "rerank_score": 0.7},
+        {"id": "c", "content": "The office opens at nine in the morning", "score": 0.5, "rerank_score": 0.4}
+    ]
+    packed = ContextPacker(token_budget=1000).pack(chunks)
+    assert [chunk["id"] for chunk in packed.chunks] == ["a", "b", "c"]
+
+@pytest.mark.asyncio
+async def test_cancelled_call_frees_concurrency_slot(monkeypatch):
+    """A call cancelled by a caller's deadline should give its slot back"""
+    import asyncio
+    from ..config import settings
+    monkeypatch.setattr(settings, "llm_max_concurrency", 1)
+    client = GeminiClient(use_mock=True)
+
+    async def hang(query, chunks, cached_context=None):
+        await asyncio.sleep(10)
+
+    monkeypatch.setattr(client, "_generate_once", hang)
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(client.generate_response("q", [{"content": "c"}]), timeout=0.05)
+    assert client._in_flight == 0
+    assert not client._semaphore.locked()
+
+def test_extractive_answer_picks_matching_sentences():
+    """Extractive fallback should quote the sentences that cover the query"""
+    from ..llm.extractive import extractive_answer
+    chunks = [
+        {"content": "Employees get twenty vacation days. Requests need manager approval."},
+        {"content": "Office hours are nine to five. Vacation days do not roll over."}
+    ]
+    answer = extractive_answer("how many vacation days", chunks, max_sentences=2)
+    assert answer == "Employees get twenty vacation days. Vacation days do not roll over."
+
+def test_fast_path_answers_only_confident_lookups():
+    """Short lookups with a clear best chunk are answered without the LLM"""
+    from ..llm.extractive import fast_path_answer
+    chunks = [
+        {"content": "Refunds are processed by support. The refund window is thirty days from purchase.", "score": 9.0},
+        {"content": "Office hours are nine to five.", "score": 2.0}
+    ]
+    assert fast_path_answer("what is the refund window?", chunks, "lexical") == "The refund window is thirty days from purchase."
+
+    # Runner-up too close, question not covered, or query too long: go to the LLM
+    close = [dict(chunks[0]), {**chunks[1], "score": 8.5}]
+    assert fast_path_answer("what is the refund window?", close, "lexical") is None
+    assert fast_path_answer("who approves vacation requests?", chunks, "lexical") is None
+    long_query = "compare the refund window with the exchange policy and explain which one applies to gift cards"
+    assert fast_path_answer(long_query, chunks, "lexical") is None
+
+    # Hybrid scores are fused ranks: the best chunk must lead both legs
+    top_in_both, top_in_one = 2 / 61, 1 / 61 + 1 / 62
+    assert fast_path_answer("refund window", [{**chunks[0], "score": top_in_both}], "hybrid") is not None
+    assert fast_path_answer("refund window", [{**chunks[0], "score": top_in_one}], "hybrid") is None
+
+@pytest.mark.asyncio
+async def test_hedged_request_takes_first_answer(monkeypatch):
+    """A slow primary should be hedged and the faster answer returned"""
+    import asyncio
+    from ..config import settings
+    from ..llm.providers import LLMProvider
+    monkeypatch.setattr(settings, "llm_hedge_enabled", True)
+    monkeypatch.setattr(settings, "llm_hedge_delay_ms", 20)
+
+    class Provider(LLMProvider):
+        def __init__(self, delay, answer):
+            self.delay, self.answer, self.cancelled = delay, answer, False
+
+        async def generate_response(self, query, chunks, cached_context=None):
+            try:
+                await asyncio.sleep(self.delay)
+            except asyncio.CancelledError:
+                self.cancelled = True
+                raise
+            return self.answer
+
+    primary, backup = Provider(1, "primary"), Provider(0.01, "backup")
+    client = GeminiClient(provider=primary, hedge_provider=backup)
+    samples = client.primary_latency.count
+    assert await client.generate_response("q", [{"content": "c"}]) == "backup"
+    assert client.hedge_wins.value >= 1
+    await asyncio.sleep(0)
+    assert primary.cancelled
+    assert client._in_flight == 0
+    # The hedged call's latency isn't the primary's, so it doesn't feed the hedge delay
+    assert client.primary_latency.count == samples
+
+    fast = GeminiClient(provider=Provider(0, "primary"), hedge_provider=backup)
+    assert await fast.generate_response("q", [{"content": "c"}]) == "primary"
+    assert fast.primary_latency.count == samples + 1
+
+@pytest.mark.asyncio
+async def test_context_cache_registered_and_invalidated():
+    """A busy corpus is cached with the provider and dropped when its version changes"""
+    import asyncio
+    from ..llm.context_cache import ContextCacheManager
+    from ..llm.providers import MockGeminiClient
+    provider = MockGeminiClient()
+    manager = ContextCacheManager(enabled=True, min_queries=2, min_tokens=1, max_tokens=1000, ttl=60)
+    corpus = lambda: [{"content": "Refunds are accepted within 30 days."}]
+
+    assert manager.handle_for("company-a", 1, provider, corpus) is None
+    assert manager.handle_for("company-a", 1, provider, corpus) is None
+    await asyncio.gather(*manager._creating.values())
+    handle = manager.handle_for("company-a", 1, provider, corpus)
+    assert provider.context_caches[handle] == "Refunds are accepted within 30 days."
+
+    client = GeminiClient(provider=provider)
+    response = await client.generate_response("refund window", [], cached_context=handle)
+    assert handle in response
+
+    # A document change (process_document / delete_document) bumps the version
+    manager.invalidate("company-a")
+    await asyncio.sleep(0)
+    assert handle not in provider.context_caches
+    assert manager.handle_for("company-a", 2, provider, corpus) is None
+
+    # Corpora outside the token bounds are never registered
+    small = ContextCacheManager(enabled=True, min_queries=1, min_tokens=500, max_tokens=1000, ttl=60)
+    small.handle_for("company-b", 1, provider, corpus)
+    await asyncio.gather(*small._creating.values())
+    assert small.handle_for("company-b", 1, provider, corpus) is None
+    assert len(provider.context_caches) == 0
+
+
+@pytest.mark.asyncio
+async def test_context_cache_failure_backs_off():
+    """A failed registration is retried after a backoff, not on every query"""
+    import asyncio
+    from ..llm.context_cache import ContextCacheManager
+    from ..llm.providers import MockGeminiClient
+    attempts = []
+
+    class FailingProvider(MockGeminiClient):
+        async def create_context_cache(self, display_name, context, ttl_seconds):
+            attempts.append(display_name)
+            raise RuntimeError("quota exceeded")
+
+    provider = FailingProvider()
+    manager = ContextCacheManager(enabled=True, min_queries=1, min_tokens=1, max_tokens=1000, ttl=60, retry_after=30)
+    corpus = lambda: [{"content": "Refunds are accepted within 30 days."}]
+
+    manager.handle_for("company-a", 1, provider, corpus)
+    await asyncio.gather(*manager._creating.values())
+    for _ in range(5):
+        assert manager.handle_for("company-a", 1, provider, corpus) is None
+    assert not manager._creating
+    assert len(attempts) == 1
+
+    # Once the backoff has passed the next query retries, and a second failure waits twice as long
+    entry = manager._entries["company-a"]
+    entry.expires_at = 0
+    manager.handle_for("company-a", 1, provider, corpus)
+    await asyncio.gather(*manager._creating.values())
+    assert len(attempts) == 2
+    assert manager._entries["company-a"].failures == 2
+
+
+@pytest.mark.asyncio
+async def test_stream_failure_after_first_token_raises():
+    """A stream that breaks mid-answer raises instead of yielding error text as a token"""
+    class BrokenStream(LLMProvider):
+        async def generate_response(self, query, chunks, cached_context=None):
+            return "unused"
+
+        async def stream_response(self, query, chunks):
+            yield "partial "
+            raise google_exceptions.ServiceUnavailable("connection reset")
+
+    client = GeminiClient(provider=BrokenStream())
+    received = []
+    with pytest.raises(LLMStreamError):
+        async for text in client.stream_response("q", [{"content": "c"}]):
+            received.append(text)
+    assert received == ["partial "]
+    assert client._in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_providers_without_context_cache_reject_handles():
+    """Providers must implement generate_response and refuse handles they can't use"""
+    from ..llm.providers import HTTPProvider
+    with pytest.raises(TypeError):
+        LLMProvider()
+    provider = HTTPProvider("http://localhost:1")
+    assert not provider.supports_context_cache
+    with pytest.raises(ValueError):
+        await provider.generate_response("q", [], cached_context="cachedContents/x")
+
+
+@pytest.mark.asyncio
+async def test_llm_deadline_degrades_to_extractive_answer(monkeypatch):
+    """A model slower than the deadline yields an extractive, uncached answer"""
+    import asyncio
+    import time
+    chunks = [{
+        "id": "c1",
+        "document_id": "d1",
+        "content": "The refund window is thirty days from purchase. Refunds go back to the original card.",
+        "score": 1.0
+    }]
+
+    class FakeRetriever:
+        async def retrieve(self, company_id, query, k, mode):
+            return chunks, {"mode": mode}
+
+        def has_chunks(self, company_id):
+            return True
+
+        def corpus_size(self, company_id):
+            return len(chunks)
+
+    class SlowProvider(LLMProvider):
+        async def generate_response(self, query, relevant_chunks, cached_context=None):
+            await asyncio.sleep(5)
+            return "too late"
+
+    monkeypatch.setattr(rag_query_router, "retriever", FakeRetriever())
+    monkeypatch.setattr(rag_query_router, "gemini_client", GeminiClient(provider=SlowProvider()))
+    query = RAGQueryRequest(query="what is the refund window", max_results=1)
+    cache_key = answer_cache.make_key("company-deadline", query.query, query.max_results, "lexical", 0)
+    cache_context = {"retrieval_mode": "lexical", "corpus_version": 0, "cache_key": cache_key, "query_vector": None}
+
+    response = await rag_query_router._answer(
+        query, "company-deadline", cache_context, time.time(), deadline=time.perf_counter() + 0.05
+    )
+    assert response["metadata"]["degraded"] is True
+    assert response["metadata"]["degraded_reason"] == "llm_deadline"
+    assert "thirty days" in response["answer"]
+    assert answer_cache.get(cache_key) is None
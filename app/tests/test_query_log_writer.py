@@ -0,0 +1,84 @@
+import pytest
+import asyncio
+import httpx
+from postgrest.exceptions import APIError
+from ..utils.query_log_writer import QueryLogWriter
+
+@pytest.mark.asyncio
+async def test_rows_are_flushed_in_bulk(monkeypatch):
+    """Rows are buffered and written in batches, with the rest flushed on stop"""
+    writer = QueryLogWriter(batch_size=3, flush_interval=60, max_backlog=100)
+    inserts = []
+    monkeypatch.setattr(writer, "_insert", lambda rows: inserts.append(list(rows)))
+
+    for i in range(4):
+        writer.enqueue({"query": f"q{i}"})
+    await asyncio.sleep(0.05)
+    assert [len(rows) for rows in inserts] == [3]
+    assert writer.backlog == 1
+
+    await writer.stop()
+    assert [len(rows) for rows in inserts] == [3, 1]
+    assert writer.backlog == 0
+
+@pytest.mark.asyncio
+async def test_failed_flush_keeps_rows_up_to_backlog(monkeypatch):
+    """A transient failure puts rows back; the oldest are dropped past the backlog limit"""
+    writer = QueryLogWriter(batch_size=10, flush_interval=60, max_backlog=3)
+
+    def fail(rows):
+        raise httpx.ConnectError("database unavailable")
+
+    monkeypatch.setattr(writer, "_insert", fail)
+    for i in range(5):
+        writer.enqueue({"query": f"q{i}"})
+    await writer.flush()
+
+    assert [row["query"] for row in writer._buffer] == ["q2", "q3", "q4"]
+    monkeypatch.setattr(writer, "_insert", lambda rows: None)
+    await writer.stop()
+    assert writer.backlog == 0
+
+@pytest.mark.asyncio
+async def test_rejected_rows_are_dropped_not_retried(monkeypatch):
+    """A row the database rejects is isolated and dropped; the rest of its batch is written"""
+    writer = QueryLogWriter(batch_size=10, flush_interval=60, max_backlog=100)
+    written = []
+
+    def insert(rows):
+        if any(row["query"] == "bad" for row in rows):
+            raise APIError({"code": "22P02", "message": "invalid input syntax for type uuid"})
+        written.extend(row["query"] for row in rows)
+
+    monkeypatch.setattr(writer, "_insert", insert)
+    for query in ["q0", "q1", "bad", "q3", "q4"]:
+        writer.enqueue({"query": query})
+    rejected = writer.rows_rejected.value
+    await writer.flush()
+
+    assert sorted(written) == ["q0", "q1", "q3", "q4"]
+    assert writer.rows_rejected.value == rejected + 1
+    assert writer.backlog == 0
+
+@pytest.mark.asyncio
+async def test_server_errors_requeue_without_dropping(monkeypatch):
+    """An API 503 is an outage, not bad rows: the whole batch goes back in one attempt"""
+    writer = QueryLogWriter(batch_size=200, flush_interval=60, max_backlog=1000)
+    calls = []
+
+    def unavailable(rows):
+        calls.append(len(rows))
+        raise APIError({"code": 503, "message": "JSON could not be generated"})
+
+    monkeypatch.setattr(writer, "_insert", unavailable)
+    for i in range(200):
+        writer.enqueue({"query": f"q{i}"})
+    rejected = writer.rows_rejected.value
+    # The 200th row started a background flush
+    await writer._flushing
+
+    assert calls == [200]
+    assert writer.backlog == 200
+    assert writer.rows_rejected.value == rejected
+    assert writer._buffer[0]["query"] == "q0"
+    writer._loop_task.cancel()
@@ -35,11 +35,12 @@ def setup_test_chunks(test_user_token):
         "chunk_count": 2
     }
     
-    # Create test chunks (removed company_id field)
+    # Create test chunks
     chunk_data = [
         {
             "id": str(uuid.uuid4()),
             "document_id": doc_id,
+            "company_id": company_id,
             "chunk_index": 0,
             "content": "This is a test chunk containing specific test query content.",
             "metadata": {},
@@ -49,6 +50,7 @@ def setup_test_chunks(test_user_token):
         {
             "id": str(uuid.uuid4()),
             "document_id": doc_id,
+            "company_id": company_id,
             "chunk_index": 1,
             "content": "This is another chunk with different content.",
             "metadata": {},
@@ -114,8 +116,41 @@ def test_rag_query(test_user_token, setup_test_chunks):
     assert isinstance(data["relevant_chunks"], list)
     assert len(data["relevant_chunks"]) > 0  # Should find at least one chunk
     assert "metadata" in data
+    timings = data["metadata"]["timings"]
+    assert {"auth", "retrieval", "llm", "logging", "total"} <= set(timings)
 
 def test_unauthorized_rag_query():
     """Test RAG query without authorization"""
     response = client.post("/rag/query", json={"query": "test"})
-    assert response.status_code == 403
\ No newline at end of file
+    assert response.status_code == 403
+def test_rag_query_stream(test_user_token, setup_test_chunks):
+    """Test streaming RAG query emits chunks, tokens and final metadata"""
+    response = client.post(
+        "/rag/query/stream",
+        headers={"Authorization": f"Bearer {test_user_token}"},
+        json={"query": "specific test query", "max_results": 3}
+    )
+    
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [line.split(": ", 1)[1] for line in response.text.splitlines() if line.startswith("event: ")]
+    assert events[0] == "chunks"
+    assert "token" in events
+    assert events[-1] == "metadata"
+
+def test_rag_query_batch(test_user_token, setup_test_chunks):
+    """Test batch RAG query returns one response per query, in order"""
+    queries = [
+        {"query": "specific test query", "max_results": 3},
+        {"query": "another test query", "retrieval_mode": "lexical"}
+    ]
+    response = client.post(
+        "/rag/query/batch",
+        headers={"Authorization": f"Bearer {test_user_token}"},
+        json={"queries": queries}
+    )
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert [r["query"] for r in data["results"]] == [q["query"] for q in queries]
+    assert data["metadata"]["total_queries"] == 2
@@ -0,0 +1,470 @@
+import pytest
+import asyncio
+import threading
+import time
+import numpy as np
+import uuid
+from ..config import settings
+from ..retrieval.embeddings import Embedder
+from ..retrieval.vector_index import InMemoryVectorStore, top_k_indices
+from ..retrieval.bm25_index import CompanyBM25Index, BM25Store
+from ..retrieval.fusion import reciprocal_rank_fusion
+from ..retrieval.qdrant_store import QdrantVectorStore
+from ..retrieval.corpus_cache import CorpusCache
+from ..retrieval.retriever import ChunkRetriever
+from ..retrieval.answer_cache import AnswerCache
+from ..retrieval.semantic_cache import SemanticCache
+from ..retrieval.rerank import Reranker, mmr_select
+from ..retrieval.ann_index import IVFVectorIndex
+from ..retrieval.quantization import QuantizedVectorIndex
+from ..retrieval.mmap_store import ShardedCompanyIndex, MmapVectorStore
+from ..retrieval.query_embedding_cache import QueryEmbeddingCache
+
+@pytest.fixture
+def test_embedder():
+    return Embedder(dim=64)
+
+def make_chunks(texts, document_id="doc-1"):
+    return [
+        {"id": f"{document_id}-{i}", "document_id": document_id, "chunk_index": i, "content": text}
+        for i, text in enumerate(texts)
+    ]
+
+def test_embeddings_are_normalized(test_embedder):
+    """Embeddings should be unit vectors of the configured size"""
+    vectors = test_embedder.encode(["refund policy", "vacation days", ""])
+    assert vectors.shape == (3, 64)
+    norms = np.linalg.norm(vectors[:2], axis=1)
+    assert np.allclose(norms, 1.0, atol=1e-5)
+
+def test_top_k_indices_matches_full_sort():
+    """argpartition-based top-k should agree with a full sort"""
+    scores = np.random.default_rng(0).random((4, 100))
+    top = top_k_indices(scores, 5)
+    expected = np.argsort(-scores, axis=1)[:, :5]
+    assert np.array_equal(top, expected)
+
+def test_vector_store_search(test_embedder):
+    """Search should rank the matching chunk first and respect tenant isolation"""
+    store = InMemoryVectorStore(dim=64)
+    chunks = make_chunks([
+        "The refund window is thirty days from purchase",
+        "Employees get twenty vacation days per year",
+        "The office opens at nine in the morning"
+    ])
+    store.replace("company-a", chunks, test_embedder.encode([c["content"] for c in chunks]))
+
+    results = store.search("company-a", test_embedder.encode_one("vacation days"), 2)
+    assert len(results) == 2
+    assert results[0][0]["id"] == "doc-1-1"
+    assert store.search("company-b", test_embedder.encode_one("vacation days"), 2) == []
+
+def test_vector_store_remove_document(test_embedder):
+    """Removing a document should drop all of its chunks"""
+    store = InMemoryVectorStore(dim=64)
+    chunks = make_chunks(["first", "second"], "doc-1") + make_chunks(["third"], "doc-2")
+    store.replace("company-a", chunks, test_embedder.encode([c["content"] for c in chunks]))
+
+    store.remove_document("company-a", "doc-1")
+    assert store.count("company-a") == 1
+    results = store.search("company-a", test_embedder.encode_one("third"), 5)
+    assert [chunk["document_id"] for chunk, _ in results] == ["doc-2"]
+
+def test_bm25_incremental_index():
+    """BM25 index should rank term matches and support document removal"""
+    index = CompanyBM25Index()
+    index.add(make_chunks([
+        "The refund window is thirty days",
+        "Vacation requests go to your manager",
+        "Refunds require the original receipt"
+    ]))
+    index.add(make_chunks(["Política de reembolso de treinta días"], "doc-2"))
+
+    results = index.search("refund window", 2)
+    assert results[0][0]["id"] == "doc-1-0"
+    assert index.search("politica reembolso", 1)[0][0]["document_id"] == "doc-2"
+
+    index.remove_document("doc-1")
+    assert len(index) == 1
+    assert index.search("refund", 5) == []
+    assert "refund" not in index.postings
+
+def test_bm25_store_locks_per_company():
+    """An update holding one company's index must not block another company's search"""
+    store = BM25Store()
+    store.replace("company-a", make_chunks(["The refund window is thirty days"]))
+    store.replace("company-b", make_chunks(["Vacation requests go to your manager"]))
+
+    results = []
+    with store._lock_for("company-a"):
+        searcher = threading.Thread(target=lambda: results.append(store.search("company-b", "vacation", 1)))
+        searcher.start()
+        searcher.join(timeout=1)
+        assert not searcher.is_alive()
+    assert results[0][0][0]["content"].startswith("Vacation")
+
+def test_reciprocal_rank_fusion():
+    """Chunks ranked well by both retrievers should come first"""
+    lexical = make_chunks(["a", "b", "c"])
+    vector = [lexical[1], lexical[2], lexical[0]]
+    fused = reciprocal_rank_fusion([lexical, vector], 2)
+    assert [chunk["id"] for chunk in fused] == ["doc-1-1", "doc-1-0"]
+    assert fused[0]["score"] > fused[1]["score"]
+
+def test_qdrant_store_filters_by_company(test_embedder):
+    """Qdrant adapter in local mode should isolate tenants and delete by document"""
+    store = QdrantVectorStore(collection_name=f"test_{uuid.uuid4().hex}", dim=64)
+    chunks = [
+        {"id": str(uuid.uuid4()), "document_id": "doc-1", "chunk_index": i, "content": text}
+        for i, text in enumerate(["refund window thirty days", "vacation days per year"])
+    ]
+    vectors = test_embedder.encode([c["content"] for c in chunks])
+    store.add("company-a", chunks, vectors)
+    store.add("company-b", [{**chunks[0], "id": str(uuid.uuid4())}], vectors[:1])
+
+    results = store.search("company-a", test_embedder.encode_one("vacation days"), 2)
+    assert results[0][0]["id"] == chunks[1]["id"]
+    assert store.count("company-a") == 2
+
+    store.remove_document("company-a", "doc-1")
+    assert store.count("company-a") == 0
+    assert store.count("company-b") == 1
+
+def test_corpus_cache_versions_and_eviction():
+    """Version bumps invalidate entries and the memory budget evicts LRU tenants"""
+    cache = CorpusCache(max_bytes=100, ttl=60)
+    assert cache.lookup("company-a") is False
+
+    cache.store("company-a", 60, fingerprint=1)
+    assert cache.lookup("company-a") is True
+
+    cache.bump("company-a")
+    assert cache.lookup("company-a") is False
+
+    cache.store("company-a", 60, fingerprint=1)
+    assert cache.store("company-b", 60, fingerprint=2) == ["company-a"]
+    assert cache.lookup("company-b") is True
+
+def test_retriever_serves_repeat_queries_from_memory(test_embedder, monkeypatch):
+    """Only the first query should hit the database until the corpus changes"""
+    test_retriever = ChunkRetriever(
+        embedder=test_embedder,
+        vector_store=InMemoryVectorStore(dim=64),
+        lexical_store=BM25Store()
+    )
+    fetches = []
+
+    def fake_fetch(company_id):
+        fetches.append(company_id)
+        return make_chunks(["refund window is thirty days", "vacation days per year"])
+
+    monkeypatch.setattr(test_retriever, "_fetch_company_chunks", fake_fetch)
+
+    test_retriever.search_lexical("company-a", "refund", 1)
+    test_retriever.search_lexical("company-a", "vacation", 1)
+    assert len(fetches) == 1
+
+    version = test_retriever.corpus_version("company-a")
+    new_chunks = make_chunks(["holiday calendar"], "doc-2")
+    test_retriever.index_chunks("company-a", new_chunks, test_embedder.encode(["holiday calendar"]))
+    assert test_retriever.corpus_version("company-a") == version + 1
+    assert test_retriever.search_lexical("company-a", "holiday", 1)[0]["document_id"] == "doc-2"
+    assert len(fetches) == 1
+
+@pytest.mark.asyncio
+async def test_concurrent_cold_loads_share_one_reload(test_embedder, monkeypatch):
+    """Concurrent requests for a cold company wait on a single off-loop reload"""
+    test_retriever = ChunkRetriever(
+        embedder=test_embedder,
+        vector_store=InMemoryVectorStore(dim=64),
+        lexical_store=BM25Store()
+    )
+    fetches = []
+
+    def slow_fetch(company_id):
+        fetches.append(threading.get_ident())
+        time.sleep(0.05)
+        return make_chunks(["refund window is thirty days"])
+
+    monkeypatch.setattr(test_retriever, "_fetch_company_chunks", slow_fetch)
+    await asyncio.gather(*[test_retriever.ensure_loaded_async("company-a") for _ in range(5)])
+    assert len(fetches) == 1
+    assert fetches[0] != threading.get_ident()
+    assert test_retriever.corpus_size("company-a") == 1
+
+def test_answer_cache_normalization_and_invalidation():
+    """Equivalent queries share an entry; new corpus versions and invalidation miss"""
+    cache = AnswerCache(max_entries=10, ttl=60)
+    key = AnswerCache.make_key("company-a", "What is the refund window?", 5, "hybrid", 1)
+    cache.put(key, {"answer": "30 days", "metadata": {}})
+
+    same = AnswerCache.make_key("company-a", "  what is the REFUND window ", 5, "hybrid", 1)
+    assert cache.get(same)["answer"] == "30 days"
+    assert cache.get(AnswerCache.make_key("company-a", "What is the refund window?", 5, "hybrid", 2)) is None
+
+    cache.invalidate("company-a")
+    assert cache.get(key) is None
+
+def test_semantic_cache_matches_similar_queries(test_embedder):
+    """Near-identical query embeddings reuse an answer only for the same corpus version"""
+    cache = SemanticCache(test_embedder, threshold=0.8, max_entries=2, ttl=60)
+    vector = test_embedder.encode_one("what is the refund window for purchases")
+    cache.put("company-a", vector, 1, 5, "hybrid", {"answer": "30 days", "metadata": {}})
+
+    paraphrase = test_embedder.encode_one("what is the refund window for my purchases")
+    response, similarity = cache.get("company-a", paraphrase, 1, 5, "hybrid")
+    assert response["answer"] == "30 days" and similarity >= 0.8
+
+    assert cache.get("company-a", paraphrase, 2, 5, "hybrid") is None
+    assert cache.get("company-a", test_embedder.encode_one("office hours"), 1, 5, "hybrid") is None
+    assert cache.get("company-b", paraphrase, 1, 5, "hybrid") is None
+
+def test_semantic_cache_disabled_on_hashing_fallback(test_embedder):
+    """Hashed features can't tell paraphrases from near misses, so the cache stays off"""
+    assert test_embedder.is_fallback
+    assert not SemanticCache(test_embedder, threshold=0.95, max_entries=2, ttl=60).enabled
+
+def test_semantic_cache_with_embedding_model():
+    """With the real model a paraphrase reuses the answer and a different question doesn't"""
+    pytest.importorskip("sentence_transformers")
+    model_embedder = Embedder()
+    if model_embedder.is_fallback:
+        pytest.skip(f"embedding model {model_embedder.requested_model} not available")
+    cache = SemanticCache(model_embedder, threshold=settings.semantic_cache_threshold, max_entries=10, ttl=60)
+    assert cache.enabled
+    cache.put("company-a", model_embedder.encode_one("What is the refund window?"), 1, 5, "hybrid", {"answer": "30 days"})
+
+    found = cache.get("company-a", model_embedder.encode_one("What's the refund window?"), 1, 5, "hybrid")
+    assert found is not None and found[0]["answer"] == "30 days"
+    assert cache.get("company-a", model_embedder.encode_one("What is the exchange window?"), 1, 5, "hybrid") is None
+    assert cache.get("company-a", model_embedder.encode_one("What is the refund policy for gift cards?"), 1, 5, "hybrid") is None
+
+def test_mmr_skips_near_duplicates():
+    """MMR should prefer a distinct chunk over a copy of one already picked"""
+    candidates = np.array([[1.0, 0.0], [1.0, 0.0], [0.0, 1.0]], dtype=np.float32)
+    relevance = np.array([0.9, 0.89, 0.6], dtype=np.float32)
+    assert mmr_select(candidates, relevance, 2, 0.5) == [0, 2]
+    assert mmr_select(candidates, relevance, 2, 1.0) == [0, 1]
+
+def test_reranker_diversifies_results(test_embedder):
+    """Duplicate paragraphs shouldn't fill every returned slot"""
+    paragraph = "refund requests are accepted within 30 days of purchase"
+    chunks = make_chunks([paragraph, paragraph, paragraph, "refund payments go back to the original card"])
+    results = Reranker(test_embedder, mmr_lambda=0.5).rerank("refund purchase", chunks, 2)
+    assert len(results) == 2
+    assert {r["id"] for r in results} == {"doc-1-0", "doc-1-3"}
+
+def test_reranker_reuses_stored_vectors(test_embedder, tmp_path):
+    """Re-ranking should only encode candidates the vector store doesn't hold"""
+    chunks = make_chunks([
+        "refund requests are accepted within 30 days of purchase",
+        "refund payments go back to the original card",
+        "the office opens at nine"
+    ])
+    vectors = test_embedder.encode([c["content"] for c in chunks])
+    store = InMemoryVectorStore(dim=64)
+    store.replace("company-a", chunks[:2], vectors[:2])
+    sharded = ShardedCompanyIndex(64, str(tmp_path))
+    sharded.add(chunks[:2], vectors[:2])
+
+    ids = [c["id"] for c in chunks]
+    stored = store.vectors_for("company-a", ids)
+    assert set(stored) == {"doc-1-0", "doc-1-1"}
+    assert np.allclose(stored["doc-1-1"], vectors[1])
+    assert set(sharded.vectors_for(ids)) == {"doc-1-0", "doc-1-1"}
+    assert store.vectors_for("company-b", ids) == {}
+
+    encoded = []
+    class CountingEmbedder(Embedder):
+        def encode(self, texts):
+            encoded.extend(texts)
+            return super().encode(texts)
+
+    reranker = Reranker(CountingEmbedder(dim=64), mmr_lambda=1.0)
+    expected = Reranker(test_embedder, mmr_lambda=1.0).rerank("refund purchase", chunks, 3)
+    assert reranker.rerank("refund purchase", chunks, 3, stored) == expected
+    assert [text for text in encoded if text != "refund purchase"] == [chunks[2]["content"]]
+
+def test_ivf_index_matches_brute_force_on_clustered_data():
+    """IVF search should find the exact neighbours when probing the right lists"""
+    rng = np.random.default_rng(1)
+    centres = rng.standard_normal((8, 32)).astype(np.float32)
+    vectors = centres[rng.integers(0, 8, 2000)] + 0.3 * rng.standard_normal((2000, 32)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    chunks = make_chunks([""] * 2000)
+
+    ivf = IVFVectorIndex(32, nlist=8, nprobe=2)
+    ivf.add(chunks, vectors)
+    query = vectors[0]
+    assert ivf.search(query, 1)[0][0]["id"] == "doc-1-0"
+
+    ivf.add(make_chunks(["new"], document_id="doc-2"), query[np.newaxis, :])
+    assert {c["document_id"] for c, _ in ivf.search(query, 2)} == {"doc-1", "doc-2"}
+    assert ivf.remove_document("doc-2") == 1
+    assert len(ivf) == 2000
+
+def test_ivf_index_updates_without_retraining():
+    """Small updates reuse the centroids; retraining waits until drift crosses the threshold"""
+    rng = np.random.default_rng(2)
+    vectors = rng.standard_normal((400, 16)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    ivf = IVFVectorIndex(16, nlist=4, nprobe=4, retrain_drift=0.5)
+    ivf.add(make_chunks([""] * 400), vectors)
+    centroids = ivf._centroids
+
+    ivf.add(make_chunks(["new"], document_id="doc-2"), vectors[:1])
+    assert ivf.remove_document("doc-2") == 1
+    assert ivf._centroids is centroids
+    assert len(ivf._assignments) == len(ivf) == 400
+    assert ivf.search(vectors[5], 1)[0][0]["id"] == "doc-1-5"
+
+    ivf.add(make_chunks([""] * 250, document_id="doc-3"), vectors[:250])
+    assert ivf._centroids is not centroids and ivf._drift == 0
+
+@pytest.mark.parametrize("mode", ["int8", "binary"])
+def test_quantized_index_rescores_with_float_vectors(test_embedder, tmp_path, mode):
+    """Quantized search should return exact float scores for the best matches"""
+    texts = ["refund policy for purchases", "vacation days per year", "office opening hours", "refund card payments"]
+    vectors = test_embedder.encode(texts)
+    index = QuantizedVectorIndex(64, mode=mode, rescore_factor=4, directory=str(tmp_path))
+    index.add(make_chunks(texts), vectors)
+    assert index.memory_bytes() < vectors.nbytes
+
+    query = test_embedder.encode_one("refund policy for purchases")
+    (chunk, score), = index.search(query, 1)
+    assert chunk["id"] == "doc-1-0"
+    assert score == pytest.approx(float(vectors[0] @ query), abs=1e-5)
+
+    index.remove_document("doc-1")
+    assert len(index) == 0 and index.search(query, 1) == []
+
+def test_quantized_index_appends_and_refits(test_embedder, tmp_path, monkeypatch):
+    """Updates append to or tombstone the float file; out-of-range vectors refit the scale"""
+    monkeypatch.setattr("app.retrieval.quantization.COMPACT_MIN_DEAD", 2)
+    texts = ["refund policy for purchases", "vacation days per year", "office opening hours"]
+    index = QuantizedVectorIndex(64, mode="int8", directory=str(tmp_path))
+    index.add(make_chunks(texts), test_embedder.encode(texts))
+    path = index._file.path
+
+    loud = 3 * test_embedder.encode(["parking rules"])
+    index.add(make_chunks(["parking rules"], document_id="doc-2"), loud)
+    assert index._file.path == path and len(list(tmp_path.iterdir())) == 1
+    assert index.quantizer.covers(loud)
+    (chunk, score), = index.search(loud[0], 1)
+    assert chunk["id"] == "doc-2-0" and score == pytest.approx(float(loud[0] @ loud[0]), rel=1e-5)
+
+    assert index.remove_document("doc-2") == 1
+    assert index._file.path == path and len(index) == 3
+    assert all(chunk["document_id"] == "doc-1" for chunk, _ in index.search(loud[0], 4))
+
+    # Once dead rows outnumber live ones the file is rewritten with the live rows only
+    index.remove_document("doc-1")
+    index.add(make_chunks(["holiday calendar"], document_id="doc-3"), test_embedder.encode(["holiday calendar"]))
+    assert index._file.path != path and index._file.rows == 1 and len(index) == 1
+
+def test_large_tenants_use_ivf_without_quantization(test_embedder, monkeypatch):
+    """Quantization only applies below ann_min_chunks; IVF tenants keep float vectors"""
+    monkeypatch.setattr(settings, "vector_quantization", "int8")
+    monkeypatch.setattr(settings, "ann_min_chunks", 3)
+    store = InMemoryVectorStore(dim=64)
+    small, large = make_chunks(["a", "b"]), make_chunks(["a", "b", "c"])
+    store.replace("small", small, test_embedder.encode(["a", "b"]))
+    store.replace("large", large, test_embedder.encode(["a", "b", "c"]))
+    assert isinstance(store._indexes["small"], QuantizedVectorIndex)
+    assert isinstance(store._indexes["large"], IVFVectorIndex)
+
+def test_sharded_index_delta_and_compaction(test_embedder, tmp_path):
+    """Appends land in the delta segment and compaction keeps only live rows"""
+    texts = ["refund policy", "vacation days", "office hours"]
+    chunks = make_chunks(texts)
+    index = ShardedCompanyIndex(64, str(tmp_path), delta_max_rows=3)
+    assert index.load(chunks, test_embedder.encode(texts))
+
+    extra = make_chunks(["parking rules"], document_id="doc-2")
+    index.add(extra, test_embedder.encode(["parking rules"]))
+    assert len(index) == 4
+    assert index.search(test_embedder.encode_one("parking rules"), 1)[0][0]["id"] == "doc-2-0"
+
+    assert index.remove_document("doc-2") == 1
+    assert len(index) == 3
+
+    # Re-adding an existing id replaces its row instead of duplicating it
+    index.add(chunks[:1], test_embedder.encode(texts[:1]))
+    index.add(extra, test_embedder.encode(["parking rules"]))
+    assert len(index) == 4
+    assert len(list(tmp_path.glob("*.vectors.npy"))) <= 2
+
+def test_mmap_store_attaches_existing_shards(test_embedder, tmp_path):
+    """A second worker maps the shard written by the first without vectors"""
+    texts = ["refund policy", "vacation days"]
+    chunks = make_chunks(texts)
+    MmapVectorStore(64, str(tmp_path)).replace("company-a", chunks, test_embedder.encode(texts))
+
+    other_worker = MmapVectorStore(64, str(tmp_path))
+    assert other_worker.attach("company-a", chunks)
+    assert other_worker.search("company-a", test_embedder.encode_one("vacation days"), 1)[0][0]["id"] == "doc-1-1"
+    assert not other_worker.attach("company-a", chunks[:1])
+
+def test_mmap_store_rewrites_on_replace_and_model_change(test_embedder, tmp_path):
+    """replace always writes the given vectors; shards from another model or dim aren't attached"""
+    texts = ["refund policy", "vacation days"]
+    chunks = make_chunks(texts)
+    store = MmapVectorStore(64, str(tmp_path))
+    store.replace("company-a", chunks, test_embedder.encode(texts), "hashing-64")
+
+    new_vectors = test_embedder.encode(["office hours", "parking rules"])
+    store.replace("company-a", chunks, new_vectors, "hashing-64")
+    assert np.allclose(store.vectors_for("company-a", ["doc-1-0"])["doc-1-0"], new_vectors[0])
+
+    assert MmapVectorStore(64, str(tmp_path)).attach("company-a", chunks, "hashing-64")
+    assert not MmapVectorStore(64, str(tmp_path)).attach("company-a", chunks, "all-MiniLM-L6-v2")
+    assert not MmapVectorStore(32, str(tmp_path)).attach("company-a", chunks, "hashing-64")
+
+def test_query_embedding_cache_skips_encoder(tmp_path, monkeypatch):
+    """Repeat and normalized-equal queries reuse cached vectors, also from disk"""
+    path = str(tmp_path / "queries.db")
+    embedder = Embedder(dim=64, query_cache=QueryEmbeddingCache(max_entries=1, disk_path=path))
+    encoded = []
+    original = embedder.encode
+    monkeypatch.setattr(embedder, "encode", lambda texts: encoded.extend(texts) or original(texts))
+
+    first = embedder.encode_query("What is the refund window?")
+    again = embedder.encode_query("what is the  REFUND window")
+    assert np.allclose(first, again)
+    assert encoded == ["What is the refund window?"]
+
+    embedder.encode_query("vacation days")  # evicts the first entry from memory
+    embedder.query_cache.flush()
+    restarted = Embedder(dim=64, query_cache=QueryEmbeddingCache(max_entries=10, disk_path=path))
+    monkeypatch.setattr(restarted, "encode", lambda texts: pytest.fail("encoder should not run"))
+    vectors = restarted.encode_queries(["what is the refund window", "vacation days"])
+    assert np.allclose(vectors[0], first)
+
+def test_query_embedding_cache_caps_disk_rows(tmp_path):
+    """The on-disk tier keeps only the most recently written rows"""
+    cache = QueryEmbeddingCache(max_entries=10, disk_path=str(tmp_path / "queries.db"), disk_max_rows=2)
+    for i in range(4):
+        cache.put_many("model", [f"query {i}"], np.full((1, 4), i, dtype=np.float32))
+    cache.flush()
+
+    assert cache._db.execute("SELECT COUNT(*) FROM query_embeddings").fetchone()[0] == 2
+    restarted = QueryEmbeddingCache(max_entries=10, disk_path=str(tmp_path / "queries.db"))
+    assert set(restarted.get_many("model", [f"query {i}" for i in range(4)])) == {"query 2", "query 3"}
+
+def test_sharded_index_remove_after_other_worker_compacts(test_embedder, tmp_path):
+    """A stale worker must tombstone rows from the current manifest, not its own view"""
+    chunks = make_chunks(["refund policy"], "A") + make_chunks(["vacation days", "holiday calendar"], "B") \
+        + make_chunks(["office hours"], "C")
+    vectors = test_embedder.encode([c["content"] for c in chunks])
+    first = ShardedCompanyIndex(64, str(tmp_path), delta_max_rows=0)
+    assert first.load(chunks, vectors)
+    stale = ShardedCompanyIndex(64, str(tmp_path), delta_max_rows=0)
+    assert stale.load(chunks)
+
+    # The first worker's delete compacts the shard and renumbers the rows
+    assert first.remove_document("A") == 1
+    assert stale.remove_document("B") == 2
+
+    fresh = ShardedCompanyIndex(64, str(tmp_path))
+    assert fresh.load([c for c in chunks if c["document_id"] == "C"])
+    assert fresh.search(test_embedder.encode_one("office hours"), 5)[0][0]["id"] == "C-0"
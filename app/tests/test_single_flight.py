@@ -0,0 +1,40 @@
+import pytest
+import asyncio
+from ..utils.single_flight import SingleFlight
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_execution():
+    """Concurrent callers with the same key should run the work once"""
+    flight = SingleFlight("test.single_flight")
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"answer": "42"}
+
+    results = await asyncio.gather(*[flight.do(("company-a", "question"), work) for _ in range(5)])
+
+    assert len(calls) == 1
+    assert [shared for _, shared in results].count(False) == 1
+    assert all(result == {"answer": "42"} for result, _ in results)
+    # Every caller gets its own copy
+    results[0][0]["answer"] = "changed"
+    assert results[1][0]["answer"] == "42"
+
+@pytest.mark.asyncio
+async def test_errors_propagate_and_key_is_released():
+    """Followers see the leader's error and the next call starts fresh"""
+    flight = SingleFlight("test.single_flight_errors")
+
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    results = await asyncio.gather(flight.do("key", failing), flight.do("key", failing), return_exceptions=True)
+    assert all(isinstance(result, ValueError) for result in results)
+
+    async def ok():
+        return "fine"
+
+    assert await flight.do("key", ok) == ("fine", False)
@@ -0,0 +1,40 @@
+from ..config.database import get_supabase_client
+from ..config import settings
+from typing import Any, Dict, Tuple
+import asyncio
+import time
+
+# company_id -> (expires, companies row)
+_settings_cache: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+
+def _fetch_company(company_id: str) -> Dict[str, Any]:
+    supabase = get_supabase_client(use_service_role=True)
+    response = supabase.table('companies')\
+        .select("*")\
+        .eq('id', company_id)\
+        .limit(1)\
+        .execute()
+    return response.data[0] if response.data else {}
+
+async def get_company_settings(company_id: str) -> Dict[str, Any]:
+    """The company's row, cached for company_settings_ttl seconds; empty if it can't be read"""
+    cached = _settings_cache.get(company_id)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+    try:
+        company = await asyncio.to_thread(_fetch_company, company_id)
+    except Exception as e:
+        print(f"Error getting company settings: {str(e)}")
+        company = {}
+    _settings_cache[company_id] = (time.monotonic() + settings.company_settings_ttl, company)
+    return company
+
+async def extractive_answers_enabled(company_id: str) -> bool:
+    company = await get_company_settings(company_id)
+    return bool(company.get('extractive_answers'))
+
+def forget_company_settings(company_id: str):
+    """Drop the cached row so this worker sees an update right away"""
+    _settings_cache.pop(company_id, None)
+
+__all__ = ['get_company_settings', 'extractive_answers_enabled', 'forget_company_settings']
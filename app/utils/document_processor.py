@@ -1,8 +1,10 @@
 from typing import List, Dict, Any
 import json
+import asyncio
 from datetime import datetime
 import uuid
 from ..config.database import get_supabase_client
+from ..retrieval import embedder, retriever
 import PyPDF2
 import io
 
@@ -71,18 +73,23 @@ class DocumentProcessor:
 
             # Create chunks
             chunks = self.create_chunks(text)
+
+            # Embed all chunks in one batch
+            vectors = await asyncio.to_thread(embedder.encode, chunks)
             
             # Create chunk records
             chunk_records = [
                 {
                     "id": str(uuid.uuid4()),
                     "document_id": document_id,
+                    "company_id": document['company_id'],
                     "chunk_index": idx,
                     "content": chunk,
-                    "metadata": {"page": 1},  # Simplified for MVP
+                    "metadata": {"page": 1, "embedding_model": embedder.model_name},  # Simplified for MVP
                     "embedding_id": None,
+                    "embedding_vector": vectors[idx].tolist(),
                     "created_at": datetime.utcnow().isoformat(),
-                    "vector_status": "pending"
+                    "vector_status": "indexed"
                 }
                 for idx, chunk in enumerate(chunks)
             ]
@@ -92,6 +99,9 @@ class DocumentProcessor:
                 batch = chunk_records[i:i + 50]
                 self.supabase.table('document_chunks').insert(batch).execute()
 
+            # Make the new chunks searchable without a full index reload
+            await asyncio.to_thread(retriever.index_chunks, document['company_id'], chunk_records, vectors)
+
             # Update document status
             update_data = {
                 "status": "processed",
@@ -0,0 +1,147 @@
+from typing import Any, Dict, List, Optional
+import asyncio
+import time
+from postgrest.exceptions import APIError
+from ..config import settings
+from ..config.database import get_supabase_client
+from ..core.metrics import metrics
+
+# SQLSTATE classes for bad row data: 22 data exception, 23 integrity constraint violation
+REJECTED_SQLSTATE_CLASSES = ("22", "23")
+
+def rejects_rows(error: Exception) -> bool:
+    """
+    True when the database refused the rows themselves, so writing them
+    again can't succeed. Outages, rate limits and anything unrecognised
+    count as transient.
+    """
+    if not isinstance(error, APIError):
+        return False
+    # Non-JSON error responses carry the HTTP status as the code
+    code = str(error.code or "")
+    if len(code) == 3 and code.isdigit():
+        status = int(code)
+        return 400 <= status < 500 and status != 429
+    return code[:2] in REJECTED_SQLSTATE_CLASSES
+
+class QueryLogWriter:
+    """
+    Write-behind buffer for query_logs rows.
+
+    Requests only append to an in-memory list; rows are written with one
+    bulk insert once `batch_size` accumulate or every `flush_interval`
+    seconds, and on shutdown. Batches that fail on a transient error are
+    put back at the front of the buffer; past `max_backlog` the oldest rows
+    are dropped. A batch rejected for bad row data is split in half until the
+    offending rows are isolated, and those rows are dropped so they can't
+    block the rows behind them.
+    """
+
+    def __init__(
+        self,
+        table: str = "query_logs",
+        batch_size: int = settings.query_log_batch_size,
+        flush_interval: float = settings.query_log_flush_interval,
+        max_backlog: int = settings.query_log_max_backlog
+    ):
+        self.table = table
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_backlog = max_backlog
+        self._buffer: List[Dict[str, Any]] = []
+        self._flushing: Optional[asyncio.Task] = None
+        self._loop_task: Optional[asyncio.Task] = None
+
+        self.rows_written = metrics.counter("query_log.rows_written")
+        self.rows_dropped = metrics.counter("query_log.rows_dropped")
+        self.rows_rejected = metrics.counter("query_log.rows_rejected")
+        self.flush_errors = metrics.counter("query_log.flush_errors")
+        self.flush_ms = metrics.histogram("query_log.flush_ms")
+        metrics.gauge("query_log.backlog", lambda: len(self._buffer))
+
+    @property
+    def backlog(self) -> int:
+        return len(self._buffer)
+
+    def enqueue(self, row: Dict[str, Any]):
+        """Buffer a row; never blocks on the database"""
+        self._buffer.append(row)
+        self._trim()
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._ensure_started()
+        if len(self._buffer) >= self.batch_size and not (self._flushing and not self._flushing.done()):
+            self._flushing = asyncio.ensure_future(self.flush(full_batches_only=True))
+
+    def _trim(self):
+        overflow = len(self._buffer) - self.max_backlog
+        if overflow > 0:
+            del self._buffer[:overflow]
+            self.rows_dropped.inc(overflow)
+
+    def _insert(self, rows: List[Dict[str, Any]]):
+        supabase = get_supabase_client(use_service_role=True)
+        supabase.table(self.table).insert(rows).execute()
+
+    async def _write(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Insert `rows`, dropping any the database rejects; returns those a transient error left unwritten"""
+        try:
+            await asyncio.to_thread(self._insert, rows)
+        except Exception as e:
+            self.flush_errors.inc()
+            if not rejects_rows(e):
+                print(f"Error flushing query logs: {str(e)}")
+                return rows
+            if len(rows) == 1:
+                print(f"Dropping rejected query log row: {str(e)}")
+                self.rows_rejected.inc()
+                return []
+            middle = len(rows) // 2
+            unwritten = await self._write(rows[:middle])
+            if unwritten:
+                return unwritten + rows[middle:]
+            return await self._write(rows[middle:])
+        self.rows_written.inc(len(rows))
+        return []
+
+    async def flush(self, full_batches_only: bool = False):
+        """Write buffered rows in batches of `batch_size`"""
+        while self._buffer and (not full_batches_only or len(self._buffer) >= self.batch_size):
+            rows, self._buffer = self._buffer[:self.batch_size], self._buffer[self.batch_size:]
+            start = time.perf_counter()
+            unwritten = await self._write(rows)
+            if unwritten:
+                self._buffer[:0] = unwritten
+                self._trim()
+                return
+            self.flush_ms.observe((time.perf_counter() - start) * 1000)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def _ensure_started(self):
+        if self._loop_task is None or self._loop_task.done():
+            self._loop_task = asyncio.ensure_future(self._run())
+
+    async def start(self):
+        self._ensure_started()
+
+    async def stop(self):
+        """Stop the periodic flush and write out whatever is left"""
+        if self._loop_task is not None:
+            self._loop_task.cancel()
+            try:
+                await self._loop_task
+            except asyncio.CancelledError:
+                pass
+            self._loop_task = None
+        if self._flushing is not None:
+            await self._flushing
+        await self.flush()
+
+# Singleton instance
+query_log_writer = QueryLogWriter()
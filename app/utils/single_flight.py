@@ -0,0 +1,33 @@
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+import asyncio
+import copy
+from ..core.metrics import metrics
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key.
+
+    The first caller starts the work as its own task; callers arriving
+    while it runs await the same task. Each caller receives its own deep
+    copy of the result, and cancelling one caller doesn't cancel the
+    shared work.
+    """
+
+    def __init__(self, name: str):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.coalesced = metrics.counter(f"{name}.coalesced")
+        metrics.gauge(f"{name}.inflight", lambda: len(self._inflight))
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Run `fn` once per key at a time; returns (result, shared)"""
+        task = self._inflight.get(key)
+        shared = task is not None
+        if shared:
+            self.coalesced.inc()
+        else:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+
+        result = await asyncio.shield(task)
+        return copy.deepcopy(result), shared
@@ -1,7 +1,13 @@
 from ..config.database import get_supabase_client
+from ..config import settings
 from fastapi import HTTPException
 from datetime import datetime
+from typing import Dict, Optional, Tuple
 import pytz
+import time
+
+# company_id -> (expires, plan_type)
+_plan_cache: Dict[str, Tuple[float, Optional[str]]] = {}
 
 async def check_document_limits(company_id: str):
     """Check if company has reached document limits"""
@@ -64,4 +70,14 @@ async def get_subscription(company_id: str):
         print(f"Error getting subscription: {str(e)}")
         return None
 
-__all__ = ['check_document_limits', 'get_subscription']
\ No newline at end of file
+async def get_plan_type(company_id: str) -> Optional[str]:
+    """Plan type of the company's subscription, cached for plan_cache_ttl seconds"""
+    cached = _plan_cache.get(company_id)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+    subscription = await get_subscription(company_id)
+    plan_type = subscription.get('plan_type') if subscription else None
+    _plan_cache[company_id] = (time.monotonic() + settings.plan_cache_ttl, plan_type)
+    return plan_type
+
+__all__ = ['check_document_limits', 'get_subscription', 'get_plan_type']
\ No newline at end of file
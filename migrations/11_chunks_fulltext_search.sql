@@ -0,0 +1,46 @@
+-- Full-text search over document chunks (Spanish stemming + simple config)
+ALTER TABLE document_chunks
+    ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('spanish', coalesce(content, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(content, '')), 'B')
+    ) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_document_chunks_search_vector
+    ON document_chunks USING GIN (search_vector);
+
+-- Ranked top-k chunks for a company. Query terms are OR-ed together because
+-- natural-language questions rarely contain every word of the answer.
+CREATE OR REPLACE FUNCTION search_chunks(p_company_id UUID, p_query TEXT, p_k INTEGER DEFAULT 5)
+RETURNS TABLE (
+    id UUID,
+    document_id UUID,
+    chunk_index INTEGER,
+    content TEXT,
+    metadata JSONB,
+    score REAL
+)
+LANGUAGE sql STABLE
+AS $$
+    WITH q AS (
+        SELECT
+            replace(plainto_tsquery('spanish', p_query)::text, '&', '|')::tsquery ||
+            replace(plainto_tsquery('simple', p_query)::text, '&', '|')::tsquery AS query
+    )
+    SELECT
+        c.id,
+        c.document_id,
+        c.chunk_index,
+        c.content,
+        c.metadata,
+        ts_rank_cd(c.search_vector, q.query) AS score
+    FROM document_chunks c
+    JOIN documents d ON d.id = c.document_id
+    CROSS JOIN q
+    WHERE d.company_id = p_company_id
+      AND c.search_vector @@ q.query
+    ORDER BY score DESC
+    LIMIT p_k;
+$$;
+
+GRANT EXECUTE ON FUNCTION search_chunks(UUID, TEXT, INTEGER) TO service_role;
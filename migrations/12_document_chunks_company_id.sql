@@ -0,0 +1,74 @@
+-- Denormalize company_id onto document_chunks so chunk queries don't need
+-- the company's document ids first
+ALTER TABLE document_chunks
+    ADD COLUMN IF NOT EXISTS company_id UUID REFERENCES companies(id);
+
+-- Backfill existing chunks from their documents
+UPDATE document_chunks c
+SET company_id = d.company_id
+FROM documents d
+WHERE d.id = c.document_id
+  AND c.company_id IS NULL;
+
+-- Fill company_id for writers that don't send it
+CREATE OR REPLACE FUNCTION set_document_chunk_company_id()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF NEW.company_id IS NULL THEN
+        SELECT company_id INTO NEW.company_id FROM documents WHERE id = NEW.document_id;
+    END IF;
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_document_chunks_company_id ON document_chunks;
+CREATE TRIGGER trg_document_chunks_company_id
+    BEFORE INSERT ON document_chunks
+    FOR EACH ROW
+    EXECUTE FUNCTION set_document_chunk_company_id();
+
+ALTER TABLE document_chunks
+    ALTER COLUMN company_id SET NOT NULL;
+
+CREATE INDEX IF NOT EXISTS idx_document_chunks_company_document
+    ON document_chunks(company_id, document_id, chunk_index);
+
+-- Company visibility no longer needs a subquery over documents
+DROP POLICY IF EXISTS "Users can view their company document chunks" ON document_chunks;
+CREATE POLICY "Users can view their company document chunks" ON document_chunks
+    FOR SELECT
+    USING (company_id = (SELECT company_id FROM users WHERE id = auth.uid()));
+
+-- Full-text search filters on the chunk's own company_id
+CREATE OR REPLACE FUNCTION search_chunks(p_company_id UUID, p_query TEXT, p_k INTEGER DEFAULT 5)
+RETURNS TABLE (
+    id UUID,
+    document_id UUID,
+    chunk_index INTEGER,
+    content TEXT,
+    metadata JSONB,
+    score REAL
+)
+LANGUAGE sql STABLE
+AS $$
+    WITH q AS (
+        SELECT
+            replace(plainto_tsquery('spanish', p_query)::text, '&', '|')::tsquery ||
+            replace(plainto_tsquery('simple', p_query)::text, '&', '|')::tsquery AS query
+    )
+    SELECT
+        c.id,
+        c.document_id,
+        c.chunk_index,
+        c.content,
+        c.metadata,
+        ts_rank_cd(c.search_vector, q.query) AS score
+    FROM document_chunks c
+    CROSS JOIN q
+    WHERE c.company_id = p_company_id
+      AND c.search_vector @@ q.query
+    ORDER BY score DESC
+    LIMIT p_k;
+$$;
@@ -0,0 +1,4 @@
+-- Per-company switch for answering high-confidence lookups extractively,
+-- without calling the LLM
+ALTER TABLE companies
+    ADD COLUMN IF NOT EXISTS extractive_answers BOOLEAN NOT NULL DEFAULT FALSE;
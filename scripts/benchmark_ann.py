@@ -0,0 +1,74 @@
+"""
+Recall and latency of the IVF index against brute-force search.
+
+Usage:
+    python scripts/benchmark_ann.py --chunks 200000 --queries 200 --k 10 --nprobe 4 8 16 32
+"""
+import sys
+import time
+import argparse
+from pathlib import Path
+import numpy as np
+from dotenv import load_dotenv
+
+# Add absolute path for root directory
+root_dir = Path(__file__).parent.parent
+sys.path.append(str(root_dir))
+load_dotenv(root_dir / '.env')
+
+from app.retrieval.vector_index import CompanyVectorIndex
+from app.retrieval.ann_index import IVFVectorIndex
+
+def synthetic_corpus(n: int, dim: int, clusters: int, noise: float, seed: int = 0) -> np.ndarray:
+    """Unit vectors scattered around random topic centres, like chunk embeddings"""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centres[rng.integers(0, clusters, n)] + noise * rng.standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def timed_search(index, queries: np.ndarray, k: int):
+    results, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append([chunk["id"] for chunk, _ in index.search(query, k)])
+        latencies.append((time.perf_counter() - start) * 1000)
+    return results, np.array(latencies)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--noise", type=float, default=1.5, help="Spread around topic centres")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=0, help="0 = sqrt(chunks)")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16, 32])
+    args = parser.parse_args()
+
+    vectors = synthetic_corpus(args.chunks + args.queries, args.dim, args.clusters, args.noise)
+    corpus, queries = vectors[:args.chunks], vectors[args.chunks:]
+    chunks = [{"id": str(i), "document_id": "bench", "chunk_index": i, "content": ""} for i in range(args.chunks)]
+
+    exact = CompanyVectorIndex(args.dim)
+    exact.add(chunks, corpus)
+    truth, exact_ms = timed_search(exact, queries, args.k)
+    print(f"{args.chunks} chunks, dim {args.dim}, k={args.k}")
+    print(f"brute force        p50 {np.percentile(exact_ms, 50):8.2f}ms  p99 {np.percentile(exact_ms, 99):8.2f}ms")
+
+    start = time.perf_counter()
+    ivf = IVFVectorIndex(args.dim, nlist=args.nlist)
+    ivf.add(chunks, corpus)
+    print(f"IVF build ({len(ivf._centroids)} lists) {time.perf_counter() - start:.1f}s")
+
+    for nprobe in args.nprobe:
+        ivf.nprobe = nprobe
+        found, ivf_ms = timed_search(ivf, queries, args.k)
+        recall = np.mean([len(set(a) & set(b)) / len(b) for a, b in zip(found, truth)])
+        print(
+            f"IVF nprobe={nprobe:<4}    p50 {np.percentile(ivf_ms, 50):8.2f}ms  "
+            f"p99 {np.percentile(ivf_ms, 99):8.2f}ms  recall@{args.k} {recall:.3f}"
+        )
+
+if __name__ == "__main__":
+    main()
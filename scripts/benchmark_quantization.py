@@ -0,0 +1,60 @@
+"""
+Memory per chunk, recall and latency of quantized indexes against float32.
+
+Usage:
+    python scripts/benchmark_quantization.py --chunks 100000 --queries 200 --k 10 --rescore 1 4 8
+"""
+import sys
+import time
+import argparse
+from pathlib import Path
+import numpy as np
+from dotenv import load_dotenv
+
+# Add absolute path for root directory
+root_dir = Path(__file__).parent.parent
+sys.path.append(str(root_dir))
+load_dotenv(root_dir / '.env')
+
+from app.retrieval.vector_index import CompanyVectorIndex
+from app.retrieval.quantization import QuantizedVectorIndex
+from benchmark_ann import synthetic_corpus, timed_search
+
+def report(name: str, bytes_per_chunk: float, latencies: np.ndarray, recall: float = None):
+    line = f"{name:<22} {bytes_per_chunk:8.1f} B/chunk  p50 {np.percentile(latencies, 50):7.2f}ms  p99 {np.percentile(latencies, 99):7.2f}ms"
+    if recall is not None:
+        line += f"  recall {recall:.3f}"
+    print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--noise", type=float, default=1.5, help="Spread around topic centres")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--rescore", type=int, nargs="+", default=[1, 4, 8], help="Shortlist size as a multiple of k")
+    args = parser.parse_args()
+
+    vectors = synthetic_corpus(args.chunks + args.queries, args.dim, args.clusters, args.noise)
+    corpus, queries = vectors[:args.chunks], vectors[args.chunks:]
+    chunks = [{"id": str(i), "document_id": "bench", "chunk_index": i, "content": ""} for i in range(args.chunks)]
+
+    exact = CompanyVectorIndex(args.dim)
+    exact.add(chunks, corpus)
+    truth, exact_ms = timed_search(exact, queries, args.k)
+    print(f"{args.chunks} chunks, dim {args.dim}, recall@{args.k}")
+    report("float32", exact.vectors.nbytes / args.chunks, exact_ms)
+
+    for mode in ("int8", "binary"):
+        index = QuantizedVectorIndex(args.dim, mode=mode)
+        index.add(chunks, corpus)
+        for factor in args.rescore:
+            index.rescore_factor = factor
+            found, latencies = timed_search(index, queries, args.k)
+            recall = np.mean([len(set(a) & set(b)) / len(b) for a, b in zip(found, truth)])
+            report(f"{mode} rescore x{factor}", index.memory_bytes() / args.chunks, latencies, recall)
+
+if __name__ == "__main__":
+    main()
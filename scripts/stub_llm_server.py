@@ -0,0 +1,75 @@
+"""
+Local stub model server for exercising the "http" LLM provider, hedging
+and deadlines without calling Gemini.
+
+Every request waits `--latency-ms`, or `--tail-ms` with probability
+`--tail-prob`, then echoes part of the prompt back.
+
+Usage:
+    python scripts/stub_llm_server.py --port 8089 --latency-ms 300 --tail-ms 4000 --tail-prob 0.05
+    LLM_PROVIDER=http LLM_HTTP_URL=http://127.0.0.1:8089 uvicorn app.main:app
+"""
+import json
+import time
+import random
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+def make_handler(args):
+    class StubModelHandler(BaseHTTPRequestHandler):
+        def _delay(self):
+            slow = random.random() < args.tail_prob
+            time.sleep((args.tail_ms if slow else args.latency_ms) / 1000)
+
+        def do_POST(self):
+            if self.path != "/generate":
+                self.send_error(404)
+                return
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if random.random() < args.error_rate:
+                self.send_error(503, "Simulated overload")
+                return
+
+            self._delay()
+            question = body.get("prompt", "").split("Question:")[-1].split("\n")[0].strip()
+            text = f"Stub answer to: {question}"
+
+            self.send_response(200)
+            if body.get("stream"):
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.end_headers()
+                for word in text.split(" "):
+                    self.wfile.write((json.dumps({"text": word + " "}) + "\n").encode("utf-8"))
+                    self.wfile.flush()
+                    time.sleep(args.token_ms / 1000)
+            else:
+                payload = json.dumps({"text": text}).encode("utf-8")
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        def log_message(self, format, *log_args):
+            if args.verbose:
+                super().log_message(format, *log_args)
+
+    return StubModelHandler
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--tail-ms", type=float, default=4000)
+    parser.add_argument("--tail-prob", type=float, default=0.05)
+    parser.add_argument("--token-ms", type=float, default=20, help="Delay between streamed words")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with 503")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(args))
+    print(f"Stub model server on http://{args.host}:{args.port}")
+    server.serve_forever()
+
+if __name__ == "__main__":
+    main()